@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+bench_crawl.py — end-to-end crawler benchmark and regression checks, fully offline
+Usage: python bench/bench_crawl.py [--rate 0.2] [--concurrency 4] [--out FILE] [--compare OLD.json] [-v]
+Starts the fixture hosts (bench/fixture_site.py: fast, slow, 429-limited), then runs
+crawler.main twice (cold, then warm) and save_image_url on fresh / known / 304 URLs,
+against a temp DB and download dir; crawler.db is never touched.
+Reports pages/s, images/s, bytes, dedupe hit rate and peak RSS per phase, writes
+them to bench/results/crawl-<time>.json and exits 1 if a regression check fails.
+"""
+import os, sys, io, json, time, shutil, argparse, platform, resource, subprocess, tempfile, contextlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+import fixture_site  # noqa: E402
+
+def _args():
+    ap = argparse.ArgumentParser(description="Offline crawler benchmark against local fixture sites")
+    ap.add_argument("--rate", type=float, default=0.2, help="GAZA_RATE_LIMIT for the run (default 0.2 s)")
+    ap.add_argument("--concurrency", type=int, default=4, help="GAZA_CONCURRENCY (default 4)")
+    ap.add_argument("--seed", type=int, default=0, help="fixture content seed")
+    ap.add_argument("--out", help="result JSON path (default bench/results/crawl-<time>.json)")
+    ap.add_argument("--compare", help="earlier result JSON to print deltas against")
+    ap.add_argument("-v", "--verbose", action="store_true", help="show crawler output")
+    return ap.parse_args()
+
+def _peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024  # bytes on macOS, KB elsewhere
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, check=False,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+def _snapshot(u, hosts):
+    """Client counters (crawl_stats) per fixture host + server counters."""
+    u.db_writer().flush()
+    stats = u.crawl_stats()
+    with stats._lock:
+        per = {name: dict(stats.domains.get(base.split("//", 1)[1], {})) for name, base in hosts.items()}
+    return per, fixture_site.server_stats(hosts)
+
+def _diff(after: dict, before: dict, keys) -> dict:
+    return {k: after.get(k, 0) - before.get(k, 0) for k in keys}
+
+def _metrics(client: dict, server: dict, wall: float, columns) -> dict:
+    hits = client["skip_dup_hash"] + client["skip_near_dup"] + client["skip_known"] + client["skip_304"]
+    return {
+        "wall_s": round(wall, 3),
+        "pages": int(client["pages"]),
+        "pages_per_s": round(client["pages"] / wall, 2) if wall else 0.0,
+        "images_saved": int(client["images_saved"]),
+        "images_per_s": round(client["images_saved"] / wall, 2) if wall else 0.0,
+        "requests": int(client["requests"]),
+        "bytes_down": int(client["bytes_down"]),
+        "bytes_kept": int(client["bytes_kept"]),
+        "bytes_sent": int(server["bytes_sent"]),
+        "dedupe_hits": int(hits),
+        "dedupe_hit_rate": round(hits / (hits + client["images_saved"]), 3) if hits + client["images_saved"] else 0.0,
+        "skips": {c: int(client[c]) for c in columns if c.startswith("skip_")},
+        "http_status": server["status"],
+        "parse_s": round(client["parse_s"], 3),
+        "pdf_s": round(client["pdf_s"], 3),
+        "sleep_s": round(client["sleep_s"], 3),
+    }
+
+def run_phase(name, fn, u, hosts, verbose: bool) -> dict:
+    from crawlstats import COLUMNS
+    before, sbefore = _snapshot(u, hosts)
+    out = io.StringIO()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stdout if verbose else out):
+        fn()
+    wall = time.perf_counter() - t0
+    after, safter = _snapshot(u, hosts)
+    per_host = {}
+    total_c = dict.fromkeys(COLUMNS, 0)
+    total_s = {"bytes_sent": 0, "status": {}}
+    for h in hosts:
+        c = _diff(after[h], before[h], COLUMNS)
+        s = {"bytes_sent": safter[h]["bytes_sent"] - sbefore[h]["bytes_sent"],
+             "status": {k: v - sbefore[h]["status"].get(k, 0) for k, v in safter[h]["status"].items()
+                        if v - sbefore[h]["status"].get(k, 0)}}
+        per_host[h] = _metrics(c, s, wall, COLUMNS)
+        for k in COLUMNS:
+            total_c[k] += c[k]
+        total_s["bytes_sent"] += s["bytes_sent"]
+        for k, v in s["status"].items():
+            total_s["status"][k] = total_s["status"].get(k, 0) + v
+    res = _metrics(total_c, total_s, wall, COLUMNS)
+    res["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+    res["hosts"] = per_host
+    print(f"{name:<22} {res['wall_s']:7.2f}s {res['pages_per_s']:7.2f} pages/s {res['images_per_s']:7.2f} img/s "
+          f"{res['bytes_sent'] / 1e6:7.2f} MB sent  dedupe {res['dedupe_hit_rate']:.0%}  rss {res['peak_rss_mb']:.0f} MB")
+    return res
+
+def checks(phases: dict, pdfimages: bool) -> dict:
+    exp = fixture_site.expected(pdfimages=pdfimages)
+    cold, warm = phases["crawl_cold"], phases["crawl_warm"]
+    out = {}
+    # the 429 host is reported but not checked: pages refused there are not retried within a run
+    for h in ("fast", "slow"):
+        hm = cold["hosts"][h]
+        out[f"cold_{h}_pages"] = hm["pages"] == exp["pages"]
+        out[f"cold_{h}_images"] = hm["images_saved"] == exp["images"] + exp["pdf_images"]
+        out[f"cold_{h}_dup_hash"] = hm["skips"]["skip_dup_hash"] >= 1
+        out[f"cold_{h}_rejects"] = hm["skips"]["skip_small"] >= 1 and hm["skips"]["skip_low_res"] >= 1
+    out["warm_saves_nothing"] = warm["images_saved"] == 0
+    out["warm_bytes_under_10pct"] = warm["bytes_sent"] <= 0.1 * max(1, cold["bytes_sent"])
+    n = fixture_site.FRESH_IMAGES
+    out["save_fresh_all_saved"] = phases["save_image_url_fresh"]["images_saved"] == n
+    out["save_known_no_requests"] = phases["save_image_url_known"]["requests"] == 0
+    out["save_revalidate_all_304"] = phases["save_image_url_304"]["skips"]["skip_304"] == n
+    return out
+
+def compare(old_path: str, new: dict):
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    print(f"=== vs {os.path.basename(old_path)} ({old.get('git') or '?'} -> {new.get('git') or '?'})")
+    for name, ph in new["phases"].items():
+        was = old.get("phases", {}).get(name)
+        if not was:
+            continue
+        cells = []
+        for key in ("wall_s", "pages_per_s", "images_per_s", "bytes_sent", "peak_rss_mb"):
+            a, b = was.get(key, 0), ph.get(key, 0)
+            cells.append(f"{key} {a}->{b}" + (f" ({b / a:.2f}x)" if a else ""))
+        print(f"{name:<22} " + "  ".join(cells))
+
+def main():
+    args = _args()
+    tmp = tempfile.mkdtemp(prefix="gaza-bench-crawl-")
+    os.environ.update({
+        "GAZA_SCRAPER_DB": os.path.join(tmp, "bench.db"),
+        "GAZA_SCRAPER_DIR": os.path.join(tmp, "dl"),
+        "GAZA_RATE_LIMIT": str(args.rate),
+        "GAZA_MIN_INTERVAL": str(min(args.rate, 0.5)),
+        "GAZA_CONCURRENCY": str(args.concurrency),
+    })
+    print(f"[*] Building fixture sites (Pillow: {fixture_site.Image is not None}) ...")
+    proc, hosts = fixture_site.start(seed=args.seed)
+    try:
+        import utils_2 as u
+        import crawler
+        seeds = os.path.join(tmp, "seeds.txt")
+        with open(seeds, "w", encoding="utf-8") as f:
+            f.write("".join(f"{base}/index.html\n" for base in hosts.values()))
+        crawler.SEEDS_FILE = seeds
+        fast = hosts["fast"]
+        fresh = [f"{fast}/img/fresh_{k}.jpg" for k in range(fixture_site.FRESH_IMAGES)]
+
+        def save_all():
+            for url in fresh:
+                u.save_image_url(url, referrer=f"{fast}/index.html")
+
+        def revalidate_all():
+            u._known = u.KnownImages(max_age=0)  # force the conditional probe
+            save_all()
+
+        phases = {}
+        for name, fn in (("crawl_cold", crawler.main), ("crawl_warm", crawler.main),
+                         ("save_image_url_fresh", save_all), ("save_image_url_known", save_all),
+                         ("save_image_url_304", revalidate_all)):
+            phases[name] = run_phase(name, fn, u, hosts, args.verbose)
+    finally:
+        proc.terminate()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    pdfimages = shutil.which("pdfimages") is not None
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git": _git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"rate": args.rate, "concurrency": args.concurrency, "seed": args.seed,
+                   "pillow": fixture_site.Image is not None, "pdfimages": pdfimages},
+        "phases": phases,
+        "checks": checks(phases, pdfimages),
+    }
+    out = args.out or os.path.join(HERE, "results", f"crawl-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+    failed = [k for k, ok in result["checks"].items() if not ok]
+    print(f"[+] Results written to {out}")
+    if args.compare:
+        compare(args.compare, result)
+    if failed:
+        print(f"[!] Regression checks failed: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"[+] All {len(result['checks'])} regression checks passed")
+
+if __name__ == "__main__":
+    main()
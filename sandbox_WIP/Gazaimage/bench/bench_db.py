@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+bench_db.py — commit throughput: per-event commit (old utils) vs. batched WAL writer
+Usage: python bench/bench_db.py [events] [threads]
+Runs against throwaway DBs in a temp dir; crawler.db is never touched.
+"""
+import os, sys, time, sqlite3, tempfile, threading
+
+TMP = tempfile.mkdtemp(prefix="gaza-bench-")
+os.environ["GAZA_SCRAPER_DB"] = os.path.join(TMP, "writer.db")
+os.environ.setdefault("GAZA_SCRAPER_DIR", os.path.join(TMP, "dl"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import utils_2  # noqa: E402  (needs the env above)
+
+SQL = "INSERT OR REPLACE INTO seen_urls(url, last_seen, last_status, error) VALUES (?,?,?,?)"
+
+def bench_old(n: int, threads: int) -> float:
+    """What utils_2 did before: rollback journal, one commit (fsync) per event, lock-shared connection."""
+    conn = sqlite3.connect(os.path.join(TMP, "old.db"), check_same_thread=False)
+    conn.execute("CREATE TABLE seen_urls(url TEXT PRIMARY KEY, last_seen INTEGER, last_status INTEGER, error TEXT)")
+    lock = threading.Lock()
+    def work(k):
+        for i in range(k, n, threads):
+            with lock:
+                conn.execute(SQL, (f"https://example.org/{i}", int(time.time()), 200, None))
+                conn.commit()
+    t0 = time.perf_counter()
+    _run(work, threads)
+    dt = time.perf_counter() - t0
+    conn.close()
+    return dt
+
+def bench_writer(n: int, threads: int) -> float:
+    def work(k):
+        for i in range(k, n, threads):
+            utils_2.mark_url_seen(f"https://example.org/{i}", status=200)
+    t0 = time.perf_counter()
+    _run(work, threads)
+    utils_2.db_writer().flush()
+    return time.perf_counter() - t0
+
+def _run(fn, threads: int):
+    ts = [threading.Thread(target=fn, args=(k,)) for k in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    old = bench_old(n, threads)
+    new = bench_writer(n, threads)
+    print(f"events={n} threads={threads}")
+    print(f"per-event commit : {n / old:10.0f} events/s  ({old:.3f}s)")
+    print(f"batched WAL      : {n / new:10.0f} events/s  ({new:.3f}s)")
+    print(f"speedup          : {old / new:10.1f}x")
+
+if __name__ == "__main__":
+    main()
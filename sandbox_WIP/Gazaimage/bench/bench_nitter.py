@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+bench_nitter.py — social_scrape_nitter.py against local stand-in mirrors, fully offline
+Usage: python bench/bench_nitter.py [--timeout 3] [--hedge 0.5] [--out FILE] [-v]
+Starts bench/fixture_nitter.py (fast, slow, hanging, 503 and rate-limited mirrors, listed
+worst-first, plus an image CDN) and runs social_scrape_nitter.main cold, warm, and after one
+new tweet per user, against a temp DB and download dir; crawler.db is never touched.
+Checks that the hanging mirror never stalls a run, that mirror health persists and puts the
+fast mirror first, that the cursor limits warm runs to one page per user, and that only
+photos (no HTML) are saved. Writes bench/results/nitter-<time>.json and exits 1 on a failed check.
+"""
+import os, sys, io, json, time, shutil, argparse, platform, tempfile, contextlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+import fixture_nitter  # noqa: E402
+from fixture_site import server_stats  # noqa: E402
+from bench_crawl import _git_rev  # noqa: E402
+
+def _args():
+    ap = argparse.ArgumentParser(description="Offline Nitter scraper benchmark against stand-in mirrors")
+    ap.add_argument("--timeout", type=float, default=3.0, help="GAZA_NITTER_TIMEOUT (default 3 s)")
+    ap.add_argument("--hedge", type=float, default=0.5, help="GAZA_NITTER_HEDGE (default 0.5 s)")
+    ap.add_argument("--out", help="result JSON path (default bench/results/nitter-<time>.json)")
+    ap.add_argument("-v", "--verbose", action="store_true", help="show scraper output")
+    return ap.parse_args()
+
+def run_phase(name, fn, u, hosts, verbose: bool) -> dict:
+    before = server_stats(hosts)
+    saved0 = u.db_query("SELECT COUNT(*) FROM images")[0][0]
+    out = io.StringIO()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stdout if verbose else out):
+        fn()
+    wall = time.perf_counter() - t0
+    u.db_writer().flush()
+    after = server_stats(hosts)
+    res = {
+        "wall_s": round(wall, 3),
+        "images_saved": u.db_query("SELECT COUNT(*) FROM images")[0][0] - saved0,
+        "requests": {h: after[h]["requests"] - before[h]["requests"] for h in hosts},
+    }
+    print(f"{name:<8} {res['wall_s']:6.2f}s  {res['images_saved']:3d} images  requests " +
+          " ".join(f"{h}={n}" for h, n in res["requests"].items()))
+    return res
+
+def main():
+    args = _args()
+    tmp = tempfile.mkdtemp(prefix="gaza-bench-nitter-")
+    proc, hosts = fixture_nitter.start()
+    mirrors = [h for h in fixture_nitter.MIRRORS]  # worst first: hang, error, limited, slow, fast
+    os.environ.update({
+        "GAZA_SCRAPER_DB": os.path.join(tmp, "bench.db"),
+        "GAZA_SCRAPER_DIR": os.path.join(tmp, "dl"),
+        "GAZA_RATE_LIMIT": "0.1",
+        "GAZA_MIN_INTERVAL": "0.05",
+        "GAZA_NITTER_MIRRORS": ",".join(hosts[m] for m in mirrors),
+        "GAZA_NITTER_TIMEOUT": str(args.timeout),
+        "GAZA_NITTER_HEDGE": str(args.hedge),
+        "GAZA_TWIMG_BASE": hosts["twimg"],
+    })
+    try:
+        import utils_2 as u
+        import social_scrape_nitter as sn
+        feeds = os.path.join(tmp, "feeds_x.txt")
+        with open(feeds, "w", encoding="utf-8") as f:
+            f.write("".join(f"{user}\n" for user in fixture_nitter.USERS))
+        sn.FEEDS_FILE = feeds
+
+        phases = {}
+        ranking = {}
+        for name, prep in (("cold", None), ("warm", None), ("new", lambda: fixture_nitter.advance(hosts))):
+            if prep:
+                prep()
+            phases[name] = run_phase(name, sn.main, u, hosts, args.verbose)
+            ranking[name] = [m for b in sn.MirrorPool().ranked() for m in mirrors if hosts[m] == b]
+        health = {m: {"ok": ok, "fail": fail} for b, ok, fail in u.db_query("SELECT base, ok, fail FROM nitter_mirrors")
+                  for m in mirrors if hosts[m] == b}
+        html_files = [f for _, _, files in os.walk(os.path.join(tmp, "dl")) for f in files if f.endswith(".html")]
+    finally:
+        proc.terminate()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    exp = fixture_nitter.expected()
+    cold, warm, new = phases["cold"], phases["warm"], phases["new"]
+    users = len(fixture_nitter.USERS)
+    result_checks = {
+        "cold_all_photos": cold["images_saved"] == exp["images"],
+        # without racing, every fetch would wait out the hanging mirror's timeout
+        "cold_not_stalled": cold["wall_s"] < args.timeout + exp["pages"] * 1.0,
+        "health_persisted": health.get("fast", {}).get("ok", 0) > 0 and health.get("error", {}).get("fail", 0) > 0,
+        "hang_penalised": health.get("hang", {}).get("fail", 0) > 0 and ranking["cold"][-1] != "fast",
+        "fast_ranked_first": ranking["cold"][0] == "fast",
+        "warm_saves_nothing": warm["images_saved"] == 0,
+        "warm_one_page_per_user": warm["requests"]["fast"] == users,
+        "warm_only_fast_mirror": sum(n for h, n in warm["requests"].items() if h not in ("fast", "twimg")) == 0,
+        "warm_no_media_requests": warm["requests"]["twimg"] == 0,
+        "new_posts_saved": new["images_saved"] == exp["new_per_advance"],
+        "no_html_saved": not html_files,
+    }
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git": _git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"timeout": args.timeout, "hedge": args.hedge, "mirrors": mirrors},
+        "phases": phases,
+        "ranking": ranking,
+        "health": health,
+        "checks": result_checks,
+    }
+    out = args.out or os.path.join(HERE, "results", f"nitter-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+    failed = [k for k, ok in result_checks.items() if not ok]
+    print(f"[+] Mirror ranking after the cold run: {', '.join(ranking['cold'])}")
+    print(f"[+] Results written to {out}")
+    if failed:
+        print(f"[!] Checks failed: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"[+] All {len(result_checks)} checks passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+bench_parse.py — HTML extraction: full BeautifulSoup tree (old crawl_page) vs.
+SoupStrainer vs. the single-pass tokenizer in html_extract.py
+Usage: python bench/bench_parse.py [rounds]
+Reads saved pages from bench/fixtures/*.html (save a few BBC / Le Monde pages
+there); without any, synthetic news-style pages are generated.
+Reports pages/sec and peak traced memory per parser.
+"""
+import os, sys, glob, time, random, tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from bs4 import BeautifulSoup  # noqa: E402
+from html_extract import _parse_fast, _parse_soup  # noqa: E402
+
+def _parse_full(html: str):
+    """What crawl_page did before: full tree, then find_all("img") and find_all("a") twice."""
+    soup = BeautifulSoup(html, "html.parser")
+    imgs = [img.get("src") for img in soup.find_all("img")]
+    pdfs = [a["href"] for a in soup.find_all("a", href=True) if a["href"].lower().endswith(".pdf")]
+    links = [a["href"] for a in soup.find_all("a", href=True)]
+    return imgs, pdfs, links
+
+PARSERS = [("bs4 full tree", _parse_full), ("bs4 SoupStrainer", _parse_soup), ("single-pass", _parse_fast)]
+
+def synthetic_page(seed: int, articles: int = 120) -> str:
+    rnd = random.Random(seed)
+    parts = ["<!doctype html><html><head><title>Gaza</title>",
+             '<meta property="og:image" content="https://cdn.example.org/og/gaza-satellite.jpg">',
+             "<script>" + "var x=1;" * 2000 + "</script><style>" + ".c{color:red}" * 1500 + "</style></head><body>"]
+    for i in range(articles):
+        w = rnd.choice([320, 640, 1024])
+        parts.append(
+            f'<div class="card"><a href="/news/{seed}-{i}"><h3>Story {i}</h3></a>'
+            f'<picture><source srcset="/img/{i}-{w}.webp {w}w, /img/{i}-2048.webp 2048w" type="image/webp">'
+            f'<img src="/img/{i}-{w}.jpg" data-src="/img/{i}-2048.jpg" alt="satellite damage {i}" '
+            f'srcset="/img/{i}-{w}.jpg {w}w, /img/{i}-2048.jpg 2048w"></picture>'
+            f'<p>{"lorem ipsum dolor sit amet " * rnd.randint(5, 40)}</p>'
+            f'<ul>{"".join(f"<li><a href=/tag/{j}>tag {j}</a></li>" for j in range(rnd.randint(2, 8)))}</ul>'
+            + (f'<a href="/reports/{i}.pdf">PDF</a>' if i % 17 == 0 else "") + "</div>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+def load_pages():
+    pages = []
+    for fp in sorted(glob.glob(os.path.join(HERE, "fixtures", "*.html"))):
+        with open(fp, "r", encoding="utf-8", errors="replace") as f:
+            pages.append((os.path.basename(fp), f.read()))
+    if not pages:
+        pages = [(f"synthetic-{i}", synthetic_page(i)) for i in range(5)]
+    return pages
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    pages = load_pages()
+    total_kb = sum(len(h) for _, h in pages) / 1024
+    print(f"{len(pages)} pages, {total_kb:.0f} KB total, {rounds} rounds")
+    base = None
+    for name, fn in PARSERS:
+        tracemalloc.start()
+        for _, html in pages:
+            fn(html)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for _, html in pages:
+                fn(html)
+        dt = time.perf_counter() - t0
+        rate = rounds * len(pages) / dt
+        base = base or rate
+        print(f"{name:<18} {rate:8.1f} pages/s  {rate / base:5.1f}x  peak {peak / 1024 / 1024:6.1f} MB")
+
+if __name__ == "__main__":
+    main()
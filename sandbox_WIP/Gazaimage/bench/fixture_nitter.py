@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+fixture_nitter.py — local stand-in Nitter mirrors and image CDN for bench_nitter.py
+- Mirror profiles: "fast", "slow" (delayed), "hang" (never answers in time), "error" (503),
+  "limited" (200 with Nitter's rate-limit error panel)
+- Each mirror serves /<user> (page 1, "Load more" -> ?cursor=p2) in Nitter's timeline markup:
+  a pinned old tweet, a recent retweet of an old tweet, off-topic and video tweets, photos
+- A "twimg" host serves /media/<id>?format=jpg&name=orig for those photos
+- GET /__advance posts one new photo tweet per user on every mirror; /__stats as in fixture_site
+Usage: python bench/fixture_nitter.py  (serves until Ctrl-C and prints the base URLs)
+"""
+import json, time, random, threading, multiprocessing
+from urllib.parse import quote
+
+from fixture_site import Image, _Server, _Handler, _noise_image, _jpeg, _synthetic_jpeg
+
+# name -> (response delay seconds, status, rate-limit panel)
+MIRRORS = {"hang": (30.0, 200, False), "error": (0.0, 503, False), "limited": (0.0, 200, True),
+           "slow": (0.6, 200, False), "fast": (0.0, 200, False)}
+USERS = ("gaza_osint", "sat_watch")
+PER_PAGE = 6
+BASE_ID = 1_700_000_000_000_000_000
+
+_state = {"generation": 0}  # new tweets posted via /__advance (shared by all hosts in the child)
+
+def _tweets(ui: int, user: str, generation: int):
+    """Newest-first (pinned first) tweet dicts for one user."""
+    base = BASE_ID + ui * 1_000_000
+    out = [{"id": base + 1, "pinned": True, "text": "Pinned: Gaza satellite overview", "media": [f"u{ui}_pin"]},
+           {"id": base + 2, "retweet": True, "text": "Drone footage of strike damage", "media": [f"u{ui}_rt"]}]
+    for g in range(generation, 0, -1):
+        out.insert(1, {"id": base + 1000 + g, "text": f"New aerial imagery of Gaza #{g}", "media": [f"u{ui}_new{g}"]})
+    for k in range(10, 0, -1):
+        t = {"id": base + 100 + k, "text": f"Satellite imagery update {k} over Gaza", "media": []}
+        if k % 4 == 0:
+            t["text"] = f"Weather and football results {k}"  # off-topic: its photo is skipped
+        if k % 2 == 0 or k == 7:
+            t["media"] = [f"u{ui}_{k}a"] + ([f"u{ui}_{k}b"] if k == 6 else [])
+        if k == 5:
+            t["video"] = True
+        out.append(t)
+    return out
+
+def expected(generation: int = 0) -> dict:
+    """Photos a cold scrape of every user should save, and per user on each /__advance."""
+    total = 0
+    for ui, user in enumerate(USERS):
+        for t in _tweets(ui, user, generation):
+            if t["media"] and any(k in t["text"].lower() for k in ("gaza", "drone", "satellite", "aerial")):
+                total += len(t["media"])
+    return {"images": total, "pages": len(USERS) * 2, "new_per_advance": len(USERS)}
+
+def _item(user: str, t: dict) -> str:
+    who = t.get("retweet") and "someone_else" or user
+    head = ('<div class="pinned"><span>Pinned Tweet</span></div>' if t.get("pinned") else "") + \
+           ('<div class="retweet-header"><span>' + user + ' retweeted</span></div>' if t.get("retweet") else "")
+    media = "".join(f'<div class="attachment image"><a class="still-image" href="/pic/orig/{quote("media/" + m + ".jpg", safe="")}" '
+                    f'target="_blank"><img src="/pic/{quote("media/" + m + ".jpg?name=small", safe="")}" alt=""></a></div>'
+                    for m in t["media"])
+    if t.get("video"):
+        media += ('<div class="attachment video-container"><img src="/pic/amplify_video_thumb%2F1%2Fimg%2Fx.jpg">'
+                  '</div>')
+    return (f'<div class="timeline-item " data-username="{who}">'
+            f'<a class="tweet-link" href="/{who}/status/{t["id"]}#m"></a>'
+            f'<div class="tweet-body"><div>{head}<div class="tweet-header"><a class="username" href="/{who}">@{who}</a>'
+            f'</div></div><div class="tweet-content media-body" dir="auto">{t["text"]}</div>'
+            f'<div class="attachments"><div class="gallery-row">{media}</div></div>'
+            f'<div class="tweet-stats"><span class="tweet-stat"><div class="icon-container">3</div></span></div>'
+            f'</div></div>')
+
+def timeline(user: str, page: int, generation: int) -> bytes:
+    ui = USERS.index(user)
+    tweets = _tweets(ui, user, generation)
+    chunk = tweets[:PER_PAGE + generation] if page == 1 else tweets[PER_PAGE + generation:]
+    items = "".join(_item(user, t) for t in chunk)
+    newest = f'<div class="timeline-item show-more"><a href="/{user}">Load newest</a></div>' if page > 1 else ""
+    more = f'<div class="show-more"><a href="?cursor=p{page + 1}">Load more</a></div>' if page == 1 else ""
+    return (f'<!DOCTYPE html><html><head><title>{user} | nitter</title></head><body><nav></nav>'
+            f'<div class="container"><div class="profile-tabs"><div class="timeline-container">'
+            f'<div class="timeline">{newest}{items}{more}</div></div></div></div></body></html>').encode()
+
+RATE_LIMITED = (b'<!DOCTYPE html><html><body><div class="container"><div class="error-panel">'
+                b'<span>Instance has been rate limited.<br>Use another instance or try again later.</span>'
+                b'</div></div></body></html>')
+
+class _NitterHandler(_Handler):
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        if path == "/__stats":
+            return super().do_GET()
+        if path == "/__advance":
+            with self.server.lock:
+                _state["generation"] += 1
+            self._send(200, {"Content-Type": "text/plain"}, b"ok")
+            return
+        if self.server.name == "twimg":
+            return self._media(path)
+        delay, status, limited = MIRRORS[self.server.name]
+        if delay:
+            time.sleep(delay)
+        if status != 200:
+            self._send(status, {"Content-Type": "text/plain"}, b"unavailable")
+            return
+        if limited:
+            self._send(200, {"Content-Type": "text/html; charset=utf-8"}, RATE_LIMITED)
+            return
+        user = path.strip("/")
+        if user not in USERS:
+            self._send(404, {"Content-Type": "text/plain"}, b"not found")
+            return
+        page = 2 if "cursor=p2" in query else 1
+        self._send(200, {"Content-Type": "text/html; charset=utf-8"}, timeline(user, page, _state["generation"]))
+
+    def _media(self, path: str):
+        if not path.startswith("/media/"):
+            self._send(404, {"Content-Type": "text/plain"}, b"not found")
+            return
+        name = path.rsplit("/", 1)[-1]
+        with self.server.lock:
+            body = self.server.images.get(name)
+            if body is None:
+                body = self.server.images[name] = self._make(name)
+        self._send(200, {"Content-Type": "image/jpeg"}, body)
+
+    def _make(self, name: str) -> bytes:
+        rnd = random.Random(name)
+        if Image is not None:
+            return _jpeg(_noise_image(rnd, 1024, 768))
+        return _synthetic_jpeg(rnd, 1024, 768, 150_000 + rnd.randrange(50_000))
+
+def _serve(names, ready):
+    servers = []
+    for name in names:
+        srv = _Server(("127.0.0.1", 0), _NitterHandler)
+        srv.name = name
+        srv.images = {}
+        srv.lock = threading.Lock()
+        srv.stats = {"requests": 0, "bytes_sent": 0, "status": {}}
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        servers.append((name, srv.server_address[1]))
+    ready.put(servers)
+    threading.Event().wait()
+
+def start(mirrors=tuple(MIRRORS)):
+    """Mirrors + the twimg host in a child process; returns (process, {name: base url})."""
+    ctx = multiprocessing.get_context("fork")
+    ready = ctx.Queue()
+    proc = ctx.Process(target=_serve, args=(list(mirrors) + ["twimg"], ready), daemon=True)
+    proc.start()
+    hosts = {name: f"http://127.0.0.1:{port}" for name, port in ready.get(timeout=60)}
+    return proc, hosts
+
+def advance(hosts: dict):
+    from urllib.request import urlopen
+    with urlopen(hosts["fast"] + "/__advance", timeout=10) as r:
+        r.read()
+
+if __name__ == "__main__":
+    proc, hosts = start()
+    for name, base in hosts.items():
+        print(f"{name:<8} {base}" + (f"/{USERS[0]}" if name != "twimg" else ""))
+    print(json.dumps(expected()))
+    try:
+        proc.join()
+    except KeyboardInterrupt:
+        pass
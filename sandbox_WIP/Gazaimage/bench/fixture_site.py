@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+fixture_site.py — local stand-in sites for the crawler benchmarks
+- One HTTP server per host profile: "fast", "slow" (delayed responses), "limited"
+  (429 + Retry-After beyond a few requests per second)
+- Each host: an index, image-heavy pages, a PDF with embedded images, duplicate
+  and near-duplicate images, a too-small and a too-low-res image
+- Every resource has an ETag/Last-Modified and honours If-None-Match and Range
+- GET /__stats returns per-host request/byte/status counters as JSON
+Usage: python bench/fixture_site.py  (serves until Ctrl-C and prints the seed URLs)
+Image and PDF bodies are real JPEG/PDF when Pillow is installed, synthetic JPEG headers otherwise.
+"""
+import io, json, time, random, hashlib, threading, multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from collections import deque
+from email.utils import formatdate
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# name -> (response delay seconds, requests allowed per second before a 429; 0 = unlimited)
+PROFILES = {"fast": (0.0, 0), "slow": (0.25, 0), "limited": (0.0, 3)}
+PAGES = 4             # linked pages per host
+IMAGES_PER_PAGE = 3   # page p shows images p*2 .. p*2+2, so neighbours share one
+FRESH_IMAGES = 20     # /img/fresh_<k>.jpg, not linked from any page (for save_image_url runs)
+LAST_MODIFIED = formatdate(1700000000, usegmt=True)
+
+def image_count() -> int:
+    return (PAGES - 1) * 2 + IMAGES_PER_PAGE
+
+def expected(pillow: bool = None, pdfimages: bool = False) -> dict:
+    """What one cold crawl of one host should save, for the regression checks."""
+    pillow = Image is not None if pillow is None else pillow
+    return {
+        "pages": 1 + PAGES,
+        # the copy, small and thumb images are rejected; the re-encoded one too (near-dup) with Pillow
+        "images": image_count() + (0 if pillow else 1),
+        "pdf_images": 2 if (pillow and pdfimages) else 0,
+    }
+
+def _synthetic_jpeg(rnd: random.Random, w: int, h: int, size: int) -> bytes:
+    """SOI, APP0, SOF0 (carries w x h) and random filler: passes the sniff and size probes, not a decoder."""
+    sof = b"\xff\xc0\x00\x11\x08" + h.to_bytes(2, "big") + w.to_bytes(2, "big") + b"\x03\x01\x22\x00\x02\x11\x01\x03\x11\x01"
+    head = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00" + sof
+    return head + rnd.randbytes(max(0, size - len(head) - 2)) + b"\xff\xd9"
+
+def _noise_image(rnd: random.Random, w: int, h: int):
+    # blocky noise: structure survives a resize (for dHash) yet compresses poorly (big files)
+    small = Image.frombytes("RGB", (w // 8, h // 8), rnd.randbytes((w // 8) * (h // 8) * 3))
+    img = small.resize((w, h), Image.NEAREST)
+    grain = Image.frombytes("RGB", (w, h), rnd.randbytes(w * h * 3))
+    return Image.blend(img, grain, 0.25)
+
+def _jpeg(img, quality: int = 90) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+def build_host(name: str, seed: int = 0) -> dict:
+    """path -> (content type, body) for one host."""
+    rnd = random.Random(f"{name}-{seed}")
+    files = {}
+    imgs = []
+    for k in range(image_count() + FRESH_IMAGES):
+        if Image is not None:
+            pic = _noise_image(rnd, 1024, 768)
+            body = _jpeg(pic)
+        else:
+            pic, body = None, _synthetic_jpeg(rnd, 1024, 768, 150_000 + rnd.randrange(50_000))
+        imgs.append((pic, body))
+        path = f"/img/gaza_sat_{k}.jpg" if k < image_count() else f"/img/fresh_{k - image_count()}.jpg"
+        files[path] = ("image/jpeg", body)
+    files["/img/gaza_sat_copy.jpg"] = ("image/jpeg", imgs[0][1])  # same bytes, new URL
+    if Image is not None:
+        files["/img/gaza_sat_reencoded.jpg"] = ("image/jpeg", _jpeg(imgs[1][0], quality=70))
+        files["/img/gaza_sat_thumb.jpg"] = ("image/jpeg", _jpeg(_noise_image(rnd, 320, 240), quality=100))
+        pdf = io.BytesIO()
+        pages = [_noise_image(rnd, 1000, 800) for _ in range(2)]
+        pages[0].save(pdf, "PDF", save_all=True, append_images=pages[1:], resolution=100)
+        files["/doc/gaza_damage_report.pdf"] = ("application/pdf", pdf.getvalue())
+    else:
+        files["/img/gaza_sat_reencoded.jpg"] = ("image/jpeg", _synthetic_jpeg(rnd, 1024, 768, 120_000))
+        files["/img/gaza_sat_thumb.jpg"] = ("image/jpeg", _synthetic_jpeg(rnd, 320, 240, 120_000))
+        files["/doc/gaza_damage_report.pdf"] = ("application/pdf", b"%PDF-1.4\n" + rnd.randbytes(4096) + b"\n%%EOF\n")
+    files["/img/gaza_sat_small.jpg"] = ("image/jpeg", _synthetic_jpeg(rnd, 1024, 768, 20_000))
+
+    extras = ["gaza_sat_copy", "gaza_sat_reencoded", "gaza_sat_thumb", "gaza_sat_small"]
+    for p in range(PAGES):
+        cards = []
+        for k in range(p * 2, p * 2 + IMAGES_PER_PAGE):
+            cards.append(f'<figure><img src="/img/gaza_sat_{k}.jpg" width="1024" alt="satellite image {k}">'
+                         f'<figcaption>Damage assessment {k}</figcaption></figure>')
+        if p < len(extras):
+            cards.append(f'<img src="/img/{extras[p]}.jpg" alt="satellite">')
+        others = "".join(f'<li><a href="/page/{q}.html">Page {q}</a></li>' for q in range(PAGES) if q != p)
+        files[f"/page/{p}.html"] = ("text/html; charset=utf-8",
+                                    f"<!doctype html><html><head><title>{name} {p}</title></head><body>"
+                                    f"{''.join(cards)}<ul>{others}</ul>"
+                                    f"<p>{'lorem ipsum dolor sit amet ' * 200}</p></body></html>".encode())
+    links = "".join(f'<li><a href="/page/{p}.html">Assessment {p}</a></li>' for p in range(PAGES))
+    files["/index.html"] = ("text/html; charset=utf-8",
+                            f"<!doctype html><html><head><title>{name}</title>"
+                            f'<meta property="og:image" content="/img/gaza_sat_0.jpg"></head><body>'
+                            f'<ul>{links}</ul><a href="/doc/gaza_damage_report.pdf">Report (PDF)</a></body></html>'.encode())
+    return files
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # clients closing early (Range probes, aborted streams) are expected
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _count(self, status: int, sent: int):
+        st = self.server.stats
+        with self.server.lock:
+            st["requests"] += 1
+            st["bytes_sent"] += sent
+            st["status"][str(status)] = st["status"].get(str(status), 0) + 1
+
+    def _send(self, status: int, headers: dict, body: bytes = b""):
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        # counted before writing: a client that aborts a streamed body still cost the server this much
+        self._count(status, len(body) if self.command != "HEAD" else 0)
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/__stats":
+            with self.server.lock:
+                body = json.dumps(self.server.stats).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        delay, per_second = self.server.profile
+        if per_second:
+            with self.server.lock:
+                now = time.monotonic()
+                hits = self.server.hits
+                while hits and hits[0] <= now - 1.0:
+                    hits.popleft()
+                too_fast = len(hits) >= per_second
+                if not too_fast:
+                    hits.append(now)
+            if too_fast:
+                self._send(429, {"Retry-After": "1", "Content-Type": "text/plain"}, b"slow down")
+                return
+        if delay:
+            time.sleep(delay)
+        entry = self.server.files.get(path)
+        if entry is None:
+            self._send(404, {"Content-Type": "text/plain"}, b"not found")
+            return
+        ctype, body = entry
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+        headers = {"Content-Type": ctype, "ETag": etag, "Last-Modified": LAST_MODIFIED, "Accept-Ranges": "bytes"}
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, {"ETag": etag})
+            return
+        rng = self.headers.get("Range", "")
+        if rng.startswith("bytes="):
+            first, _, last = rng[6:].partition("-")
+            start = int(first or 0)
+            end = min(int(last) if last else len(body) - 1, len(body) - 1)
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+            self._send(206, headers, body[start:end + 1])
+            return
+        self._send(200, headers, body)
+
+def _serve(profiles, seed: int, ready):
+    servers = []
+    for name in profiles:
+        srv = _Server(("127.0.0.1", 0), _Handler)
+        srv.files = build_host(name, seed)
+        srv.profile = PROFILES[name]
+        srv.lock = threading.Lock()
+        srv.hits = deque()  # request times in the last second
+        srv.stats = {"requests": 0, "bytes_sent": 0, "status": {}}
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        servers.append((name, srv.server_address[1]))
+    ready.put(servers)
+    threading.Event().wait()
+
+def start(profiles=tuple(PROFILES), seed: int = 0):
+    """Start the fixture hosts in a child process; returns (process, {profile: base url})."""
+    ctx = multiprocessing.get_context("fork")  # the child gets the host data without pickling
+    ready = ctx.Queue()
+    proc = ctx.Process(target=_serve, args=(list(profiles), seed, ready), daemon=True)
+    proc.start()
+    hosts = {name: f"http://127.0.0.1:{port}" for name, port in ready.get(timeout=120)}
+    return proc, hosts
+
+def server_stats(hosts: dict) -> dict:
+    """{profile: counters} fetched from each host's /__stats."""
+    from urllib.request import urlopen
+    out = {}
+    for name, base in hosts.items():
+        with urlopen(base + "/__stats", timeout=10) as r:
+            out[name] = json.loads(r.read())
+    return out
+
+if __name__ == "__main__":
+    proc, hosts = start()
+    for name, base in hosts.items():
+        print(f"{name:<8} {base}/index.html")
+    try:
+        proc.join()
+    except KeyboardInterrupt:
+        pass
@@ -2,99 +2,297 @@
 """
 crawler.py — curated domain scraper for Gaza High‑Res Imagery (v2)
 - Reads seed URLs from seeds.txt
-- Extracts inline <img> > MIN_IMAGE_BYTES and images from linked PDFs
-- Same-domain shallow crawl (depth=1) with polite pacing
+- Extracts the widest variant of each inline image > MIN_IMAGE_BYTES and images from linked PDFs
+- Same-domain crawl (depth=1 by default) with polite pacing
+- Bounded worker pool, one rate-limit slot per domain
+- Frontier persisted in crawler.db; a killed run resumes where it stopped
+- Pages are fetched conditionally; unchanged ones (304 or same body hash) aren't re-parsed,
+  but the images, PDFs and links stored from their last parse are queued again
 """
-import os, time, re
+import os, time, re, socket
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait as wait_futures
 from urllib.parse import urljoin, urlparse
-import requests
-from bs4 import BeautifulSoup
 
-from utils import (HEADERS, RATE_LIMIT_SECONDS, is_new_url, mark_url_seen,
-                   save_image_url, extract_images_from_pdf)
+from utils_2 import (domain_limiter, known_images, crawl_stats, save_crawl_stats, note_failure, http_session, mark_url_seen, hash_bytes,
+                     page_due, page_hash, page_targets, record_page_targets, record_page_visit,
+                     save_image_url, record_image_aliases, conditional_headers, ingest_pdf_response, wait_pdf_jobs,
+                     frontier_resume, frontier_push, frontier_claim, frontier_done,
+                     frontier_renew, frontier_leased_elsewhere, LEASE_SECONDS)
+from html_extract import parse_page, image_groups
 
 BASE_DIR = os.path.dirname(__file__)
 SEEDS_FILE = os.path.join(BASE_DIR, "seeds.txt")
 
 KEYWORDS = re.compile(r"(maxar|skysat|planet|unosat|satellite|gaza|damage|before[- ]after|2023|2024|2025)", re.I)
 MAX_LINKS_PER_PAGE = 25
-
-_last_request = {}  # domain -> last ts
+# GAZA_CONCURRENCY=1 fetches one URL at a time
+CONCURRENCY = int(os.environ.get("GAZA_CONCURRENCY", "4"))
+PER_DOMAIN_CONCURRENCY = int(os.environ.get("GAZA_PER_DOMAIN", "1"))
+MAX_DEPTH = int(os.environ.get("GAZA_MAX_DEPTH", "1"))
+FRONTIER_ORDER = os.environ.get("GAZA_FRONTIER_ORDER", "bfs")  # bfs | priority
+FRONTIER_BATCH = 100
+# starting revisit interval for a page; adapted per URL from how often it changes
+RECRAWL_TTL = float(os.environ.get("GAZA_RECRAWL_HOURS", "168")) * 3600
+# worker mode: GAZA_SHARD=i/n runs this process as worker i of n on a shared crawler.db
+SHARD = tuple(int(x) for x in os.environ.get("GAZA_SHARD", "0/1").split("/"))
+WORKER_ID = os.environ.get("GAZA_WORKER_ID") or f"{socket.gethostname()}:{SHARD[0]}/{SHARD[1]}"
+IDLE_POLL_SECONDS = 2.0  # wait for other workers that may still add rows to our shard
 
 def _pause_for_domain(url: str):
-    dom = urlparse(url).netloc
-    last = _last_request.get(dom, 0)
-    wait = RATE_LIMIT_SECONDS - (time.time() - last)
-    if wait > 0:
-        time.sleep(wait)
-    _last_request[dom] = time.time()
-
-def _get(url: str, timeout=20):
-    _pause_for_domain(url)
-    return requests.get(url, headers=HEADERS, timeout=timeout)
-
-def process_pdf(pdf_url: str, referrer: str):
+    domain_limiter().wait(url)
+
+def _get(url: str, timeout=20, pace=True, headers=None):
+    if pace:
+        _pause_for_domain(url)
+    return http_session(url).get(url, timeout=timeout, headers=headers)
+
+def fetch_page(url: str, depth: int, pace=True):
+    """Conditional GET of a page. Returns (targets, visit): targets is
+    extract_targets() output, or None when the page failed or is unchanged
+    (304, or same body hash as last time); visit holds the record_page_visit
+    args (validators included), to be stored once the page's targets have been queued."""
+    stats = crawl_stats()
+    stats.add(url, "pages")
+    r = _get(url, timeout=30, pace=pace, headers=conditional_headers(url))
+    if r.status_code == 304:
+        stats.add(url, "skip_304")
+        print(f"[=] Unchanged page {url} (304)")
+        return None, (url, None, False, RECRAWL_TTL)
+    if r.status_code != 200:
+        mark_url_seen(url, status=r.status_code, error=f"HTTP {r.status_code}")
+        return None, None
+    stats.add(url, "bytes_down", len(r.content))
+    validators = (r.headers.get("ETag"), r.headers.get("Last-Modified"), len(r.content))
+    h = hash_bytes(r.content)
+    if h == page_hash(url):
+        stats.add(url, "skip_same_page")
+        print(f"[=] Unchanged page {url} (same body)")
+        return None, (url, h, False, RECRAWL_TTL, validators)
+    with stats.timed(url, "parse_s"):
+        targets = extract_targets(url, r.text, depth)
+    return targets, (url, h, True, RECRAWL_TTL, validators)
+
+def process_pdf(pdf_url: str, referrer: str, pace=True, wait=True):
+    """Conditional, streamed PDF fetch; extraction runs in the PDF process pool.
+    With wait=False (concurrent crawl) this returns once the job is queued."""
     try:
-        r = _get(pdf_url, timeout=60)
-        if r.status_code == 200 and r.content and len(r.content) > 1024:
-            count = extract_images_from_pdf(r.content, referrer=referrer)
-            if count:
-                print(f"[+] Extracted {count} images from PDF: {pdf_url}")
+        if pace:
+            _pause_for_domain(pdf_url)
+        with http_session(pdf_url).get(pdf_url, headers=conditional_headers(pdf_url),
+                                       timeout=60, stream=True) as r:
+            if r.status_code == 200:
+                ingest_pdf_response(r, pdf_url, referrer=referrer, wait=wait)
+            elif r.status_code == 304:
+                crawl_stats().add(pdf_url, "skip_304")
     except Exception as e:
+        note_failure(pdf_url)
         print(f"[!] PDF fetch failed {pdf_url}: {e}")
 
-def crawl_page(url: str, depth: int = 1):
-    try:
-        r = _get(url, timeout=30)
-        status = r.status_code
-        if status != 200:
-            mark_url_seen(url, status=status, error=f"HTTP {status}")
-            return
-        soup = BeautifulSoup(r.text, "html.parser")
+def extract_targets(url: str, html: str, depth: int):
+    """Parse a page once; return ([(image url, alias urls)], pdf urls, same-domain links)."""
+    page = parse_page(html)
 
-        # 1) Inline images
-        seen = set()
-        for img in soup.find_all("img"):
-            src = img.get("src") or ""
-            if not src:
-                continue
-            full = urljoin(url, src)
-            if full in seen:
+    # 1) Inline images: widest variant per image (srcset, <picture>, lazy attrs, og:image)
+    images = []
+    for best, aliases, alt in image_groups(url, page):
+        # crude keyword filter to prefer satellite crops
+        if KEYWORDS.search(alt) or any(KEYWORDS.search(u) for u in [best] + aliases):
+            images.append((best, aliases))
+
+    # 2) Linked PDFs (damage assessments often embed crops)
+    pdfs = []
+    for href in page.hrefs:
+        if href.lower().endswith(".pdf"):
+            pdfs.append(urljoin(url, href))
+
+    # 3) Shallow same-domain crawl
+    nxt = []
+    if depth > 0:
+        domain = urlparse(url).netloc
+        seenl = set()
+        for href in page.hrefs:
+            link = urljoin(url, href)
+            if link in seenl or urlparse(link).netloc != domain or not link.startswith("http"):
                 continue
-            seen.add(full)
-            # crude keyword filter to prefer satellite crops
-            if KEYWORDS.search(full) or KEYWORDS.search(img.get("alt") or ""):
-                save_image_url(full, referrer=url)
-
-        # 2) Linked PDFs (damage assessments often embed crops)
-        for a in soup.find_all("a", href=True):
-            href = a["href"]
-            if href.lower().endswith(".pdf"):
-                pdf_url = urljoin(url, href)
-                process_pdf(pdf_url, referrer=url)
-
-        # 3) Shallow same-domain crawl
-        if depth > 0:
-            domain = urlparse(url).netloc
-            links = []
-            for a in soup.find_all("a", href=True):
-                link = urljoin(url, a["href"])
-                if urlparse(link).netloc == domain and link.startswith("http"):
-                    links.append(link)
-            # de-dup and cap
-            nxt = []
-            seenl = set()
-            for l in links:
-                if l not in seenl and len(nxt) < MAX_LINKS_PER_PAGE:
-                    seenl.add(l)
-                    nxt.append(l)
-            for link in nxt:
-                crawl_page(link, depth=depth-1)
-
-        mark_url_seen(url, status=200)
+            seenl.add(link)
+            nxt.append(link)
+            if len(nxt) >= MAX_LINKS_PER_PAGE:
+                break
+    return images, pdfs, nxt
+
+# -------- Concurrent crawl --------
+# A task is (kind, url, depth, referrer); kind is "page", "image" or "pdf".
+
+def _run_task(task):
+    """Worker body; returns (child tasks, page visit or None). Pacing is done
+    by the scheduler, so no sleeps in here."""
+    kind, url, depth, referrer = task
+    if kind == "image":
+        save_image_url(url, referrer=referrer)
+        return [], None
+    if kind == "pdf":
+        process_pdf(url, referrer=referrer, pace=False, wait=False)
+        return [], None
+    try:
+        targets, visit = fetch_page(url, depth, pace=False)
+        if targets is None:
+            if visit is None:
+                return [], None
+            # unchanged: queue what its last parse found; known images and PDFs cost
+            # no request or a 304, and page_due drops links not due for a revisit
+            return [(kind, u, depth - 1 if kind == "page" else 0, url) for kind, u in page_targets(url)
+                    if kind != "page" or depth > 0], visit
+        images, pdfs, links = targets
+        for full, aliases in images:
+            record_image_aliases(full, aliases, referrer=url)
+        record_page_targets(url, [("image", u) for u, _ in images] + [("pdf", u) for u in pdfs] +
+                            [("page", u) for u in links])
     except Exception as e:
+        note_failure(url)
         mark_url_seen(url, status=599, error=str(e))
         print(f"[!] Crawl error {url}: {e}")
+        return [], None
+    children = [("image", u, 0, url) for u, _ in images]
+    children += [("pdf", u, 0, url) for u in pdfs]
+    children += [("page", u, depth - 1, url) for u in links]
+    return children, visit
+
+def _priority(kind: str, url: str) -> int:
+    # only consulted with GAZA_FRONTIER_ORDER=priority: finish payloads first,
+    # then pages whose URL already looks on-topic
+    if kind != "page":
+        return 2
+    return 1 if KEYWORDS.search(url) else 0
+
+class DomainScheduler:
+    """Per-domain queues fed from the persistent frontier into a bounded thread pool.
+
+    Each domain gets its own slot: at most `per_domain` requests in flight,
+    spaced by the adaptive DomainLimiter. Other hosts keep downloading
+    while one host waits out its delay; only the scheduler thread sleeps.
+    Only a batch of claimed frontier rows is held in memory at a time; they
+    are leased to this worker and the leases are renewed while it runs.
+    """
+
+    def __init__(self, concurrency: int = CONCURRENCY, per_domain: int = PER_DOMAIN_CONCURRENCY,
+                 limiter=None, order: str = FRONTIER_ORDER, recrawl_ttl: float = RECRAWL_TTL,
+                 owner: str = WORKER_ID, shard=SHARD):
+        self.concurrency = max(1, concurrency)
+        self.per_domain = max(1, per_domain)
+        self.limiter = limiter or domain_limiter()
+        self.order = order
+        self.recrawl_ttl = recrawl_ttl
+        self.queues = {}     # domain -> deque of claimed tasks
+        self.inflight = {}   # domain -> running task count
+        self.exhausted = False
+        self.owner = owner
+        self.shard = shard
+        self.running_urls = set()
+        self.renewed_at = time.time()
+        self.blocked_since = {}  # domain -> when its next task was only waiting on the limiter
+
+    def add(self, tasks, check_ttl: bool = True):
+        rows = []
+        for kind, url, depth, referrer in tasks:
+            if check_ttl and kind == "page" and not page_due(url, self.recrawl_ttl):
+                continue
+            rows.append((kind, url, depth, referrer, _priority(kind, url)))
+        if rows:
+            frontier_push(rows)
+            self.exhausted = False
+
+    def _buffered(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+    def _refill(self):
+        if self.exhausted or self._buffered() >= self.concurrency * 2:
+            return
+        rows = frontier_claim(FRONTIER_BATCH, order=self.order, owner=self.owner, shard=self.shard)
+        if not rows:
+            self.exhausted = True
+        for task in rows:
+            dom = urlparse(task[1]).netloc
+            self.queues.setdefault(dom, deque()).append(task)
+
+    def _renew_leases(self):
+        if time.time() - self.renewed_at < LEASE_SECONDS / 3:
+            return
+        held = [t[1] for q in self.queues.values() for t in q] + list(self.running_urls)
+        frontier_renew(held, owner=self.owner)
+        self.renewed_at = time.time()
+
+    def _ready_domains(self, now: float):
+        for dom, q in self.queues.items():
+            if q and self.inflight.get(dom, 0) < self.per_domain and self.limiter.next_time(dom) <= now:
+                yield dom
+
+    def _next_wakeup(self, now: float):
+        waits = [self.limiter.next_time(dom) - now for dom, q in self.queues.items()
+                 if q and self.inflight.get(dom, 0) < self.per_domain]
+        return max(0.0, min(waits)) if waits else None
+
+    def run(self):
+        running = {}  # future -> (domain, url)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while True:
+                self._refill()
+                self._renew_leases()
+                if not running and not self._buffered():
+                    if self.shard[1] > 1 and frontier_leased_elsewhere(self.owner):
+                        time.sleep(IDLE_POLL_SECONDS)
+                        self.exhausted = False
+                        continue
+                    break
+                now = time.time()
+                for dom, q in self.queues.items():
+                    if q and self.inflight.get(dom, 0) < self.per_domain:
+                        self.blocked_since.setdefault(dom, now)
+                for dom in list(self._ready_domains(now)):
+                    if len(running) >= self.concurrency:
+                        break
+                    task = self.queues[dom].popleft()
+                    # time a ready task waited for its rate-limit slot
+                    crawl_stats().add(dom, "sleep_s", now - self.blocked_since.pop(dom, now))
+                    self.limiter.reserve(dom)
+                    self.inflight[dom] = self.inflight.get(dom, 0) + 1
+                    running[pool.submit(_run_task, task)] = (dom, task[1])
+                    self.running_urls.add(task[1])
+                timeout = None if len(running) >= self.concurrency else self._next_wakeup(time.time())
+                if not running:
+                    if timeout:
+                        time.sleep(timeout)
+                    continue
+                done, _ = wait_futures(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    dom, url = running.pop(fut)
+                    self.running_urls.discard(url)
+                    self.inflight[dom] -= 1
+                    try:
+                        children, visit = fut.result()
+                        self.add(children)
+                        # after the push: the writer commits in order, so a stored
+                        # hash never outlives children lost to a crash
+                        if visit:
+                            record_page_visit(*visit)
+                    except Exception as e:
+                        print(f"[!] Worker error ({dom}): {e}")
+                    frontier_done(url)
+
+def crawl_frontier(seeds, depth: int = MAX_DEPTH, concurrency: int = CONCURRENCY):
+    """Crawl from the persistent frontier; resumes an interrupted run first."""
+    pending = frontier_resume(owner=WORKER_ID)
+    if pending:
+        print(f"[*] Resuming crawl ({WORKER_ID}): {pending} pending URLs")
+    sched = DomainScheduler(concurrency=concurrency)
+    # seeds are always fetched (conditionally); linked pages wait out their revisit interval
+    sched.add([("page", seed, depth, seed) for seed in seeds], check_ttl=False)
+    sched.run()
+    wait_pdf_jobs()
+    sched.limiter.save()
+    print(f"[*] Known-image cache: {known_images().stats()}")
+    save_crawl_stats()
+    print(f"[*] Crawl stats saved as run {crawl_stats().run_id} (python crawlstats.py)")
 
 def main():
     if not os.path.exists(SEEDS_FILE):
@@ -102,8 +300,7 @@ def main():
         return
     with open(SEEDS_FILE, "r", encoding="utf-8") as f:
         seeds = [ln.strip() for ln in f if ln.strip() and not ln.strip().startswith("#")]
-    for seed in seeds:
-        crawl_page(seed, depth=1)
+    crawl_frontier(seeds)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+crawlstats.py — per-domain crawl instrumentation and its report CLI
+- CrawlStats: request counts, latency histogram, bytes, skip counters and timers per domain
+- utils_2 keeps one per process and saves it to the crawl_stats table (one row per run + domain)
+- CLI: `python crawlstats.py` ranks the domains (and their seeds) of the last run by time spent
+"""
+import os, json, time, argparse, threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)  # seconds; one more bucket for slower
+COUNTERS = (
+    "requests", "errors", "pages", "images_saved",
+    "bytes_down",       # body bytes read (pages, image probes/downloads, PDFs)
+    "bytes_kept",       # bytes of images written to DOWNLOAD_DIR
+    "skip_304",         # conditional GET answered 304
+    "skip_known",       # known-image cache hit, no request at all
+    "skip_same_page",   # page body hash unchanged, not parsed
+    "skip_dup_hash",    # image/PDF content hash already stored
+    "skip_near_dup",    # image within GAZA_PHASH_DISTANCE of a saved one
+    "skip_small",       # below GAZA_MIN_BYTES
+    "skip_low_res",     # below GAZA_MIN_WIDTH x GAZA_MIN_HEIGHT
+    "phash_skipped",    # saved without a near-dup check: non-JPEG over GAZA_PHASH_MAX_PIXELS
+)
+TIMERS = ("latency_s", "parse_s", "pdf_s", "sleep_s")
+COLUMNS = COUNTERS + TIMERS
+
+def _domain(url: str) -> str:
+    return urlparse(url).netloc or url
+
+class CrawlStats:
+    """Thread-safe accumulator for one run; keys are domains (URLs are reduced to their host)."""
+
+    def __init__(self, run_id: str = None):
+        self.run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.started_at = int(time.time())
+        self.domains = {}
+        self._lock = threading.Lock()
+
+    def _row(self, dom: str) -> dict:
+        row = self.domains.get(dom)
+        if row is None:
+            row = dict.fromkeys(COLUMNS, 0)
+            row["latency_hist"] = [0] * (len(LATENCY_BUCKETS) + 1)
+            self.domains[dom] = row
+        return row
+
+    def add(self, url: str, field: str, n=1):
+        with self._lock:
+            self._row(_domain(url))[field] += n
+
+    def request(self, url: str, seconds: float, error: bool = False):
+        with self._lock:
+            row = self._row(_domain(url))
+            row["requests"] += 1
+            row["errors"] += int(error)
+            row["latency_s"] += seconds
+            i = next((k for k, b in enumerate(LATENCY_BUCKETS) if seconds <= b), len(LATENCY_BUCKETS))
+            row["latency_hist"][i] += 1
+
+    @contextmanager
+    def timed(self, url: str, field: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(url, field, time.perf_counter() - t0)
+
+    def rows(self):
+        """(run_id, domain, started_at, updated_at, *COLUMNS, latency_hist json) per domain."""
+        now = int(time.time())
+        with self._lock:
+            return [(self.run_id, dom, self.started_at, now, *(row[c] for c in COLUMNS), json.dumps(row["latency_hist"]))
+                    for dom, row in self.domains.items()]
+
+# -------- CLI --------
+
+def _percentile(hist, q: float) -> str:
+    """Upper bound of the bucket holding the q-th request, e.g. '<=0.5s'."""
+    total = sum(hist)
+    if not total:
+        return "-"
+    seen = 0
+    for i, n in enumerate(hist):
+        seen += n
+        if seen >= q * total:
+            return f"<={LATENCY_BUCKETS[i]:g}s" if i < len(LATENCY_BUCKETS) else f">{LATENCY_BUCKETS[-1]:g}s"
+    return "-"
+
+def _seed_domains(path: str) -> dict:
+    seeds = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for ln in f:
+                ln = ln.strip()
+                if ln and not ln.startswith("#"):
+                    seeds.setdefault(_domain(ln), ln)
+    return seeds
+
+def _mb(n) -> str:
+    return f"{(n or 0) / 1e6:.1f}"
+
+def main():
+    ap = argparse.ArgumentParser(description="Rank crawl cost per domain/seed from crawl_stats in crawler.db")
+    ap.add_argument("--run", help="run id to report (default: the latest)")
+    ap.add_argument("--all", action="store_true", help="sum every recorded run")
+    ap.add_argument("--sort", default="time", choices=("time", "bytes", "requests", "errors"))
+    ap.add_argument("--limit", type=int, default=30)
+    ap.add_argument("--runs", action="store_true", help="list recorded runs and exit")
+    args = ap.parse_args()
+    import utils_2 as u
+
+    if args.runs:
+        for run_id, started, doms, reqs, down in u.db_query(
+                """SELECT run_id, MIN(started_at), COUNT(*), SUM(requests), SUM(bytes_down)
+                   FROM crawl_stats GROUP BY run_id ORDER BY MIN(started_at) DESC"""):
+            print(f"{run_id}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(started))}  "
+                  f"{doms} domains  {int(reqs or 0)} requests  {_mb(down)} MB")
+        return
+    if args.all:
+        where, params, label = "", (), "all runs"
+    else:
+        run_id = args.run or next(iter(u.db_query(
+            "SELECT run_id FROM crawl_stats ORDER BY started_at DESC, updated_at DESC LIMIT 1")), [None])[0]
+        if run_id is None:
+            print("No crawl stats recorded yet. Run crawler.py first.")
+            return
+        where, params, label = "WHERE run_id=?", (run_id,), f"run {run_id}"
+    sums = ", ".join(f"SUM({c})" for c in COLUMNS)
+    rows = u.db_query(f"SELECT domain, {sums} FROM crawl_stats {where} GROUP BY domain", params)
+    hists = {}
+    for dom, hist in u.db_query(f"SELECT domain, latency_hist FROM crawl_stats {where}", params):
+        acc = hists.setdefault(dom, [0] * (len(LATENCY_BUCKETS) + 1))
+        for i, n in enumerate(json.loads(hist or "[]")):
+            acc[i] += n
+
+    stats = []
+    for dom, *vals in rows:
+        s = dict(zip(COLUMNS, (v or 0 for v in vals)))
+        s["time"] = s["latency_s"] + s["parse_s"] + s["pdf_s"] + s["sleep_s"]
+        stats.append((dom, s))
+    key = {"time": "time", "bytes": "bytes_down", "requests": "requests", "errors": "errors"}[args.sort]
+    stats.sort(key=lambda t: -t[1][key])
+    seeds = _seed_domains(os.path.join(os.path.dirname(os.path.abspath(u.__file__)), "seeds.txt"))
+
+    print(f"=== Crawl cost by domain, {label} (sorted by {args.sort})")
+    print(f"{'domain':<32} {'time s':>8} {'req':>5} {'err':>4} {'p50':>7} {'p90':>7} {'MB down':>8} {'MB kept':>8} "
+          f"{'parse':>6} {'pdf':>6} {'sleep':>7}  skips 304/known/page/hash/near/small/lowres")
+    for dom, s in stats[:args.limit]:
+        hist = hists.get(dom, [])
+        skips = "/".join(str(int(s[c])) for c in ("skip_304", "skip_known", "skip_same_page", "skip_dup_hash",
+                                                 "skip_near_dup", "skip_small", "skip_low_res"))
+        print(f"{dom[:32]:<32} {s['time']:8.1f} {int(s['requests']):5d} {int(s['errors']):4d} "
+              f"{_percentile(hist, 0.5):>7} {_percentile(hist, 0.9):>7} {_mb(s['bytes_down']):>8} {_mb(s['bytes_kept']):>8} "
+              f"{s['parse_s']:6.1f} {s['pdf_s']:6.1f} {s['sleep_s']:7.1f}  {skips}")
+        if dom in seeds:
+            print(f"  seed: {seeds[dom]}")
+    tot = {c: sum(s[c] for _, s in stats) for c in COLUMNS}
+    kept = 100.0 * tot["bytes_kept"] / tot["bytes_down"] if tot["bytes_down"] else 0.0
+    skipped = sum(tot[c] for c in COUNTERS if c.startswith("skip_"))
+    print(f"--- {len(stats)} domains, {int(tot['requests'])} requests, {_mb(tot['bytes_down'])} MB down, "
+          f"{_mb(tot['bytes_kept'])} MB kept ({kept:.0f}%), {int(tot['images_saved'])} images saved, {int(skipped)} skips")
+
+if __name__ == "__main__":
+    main()
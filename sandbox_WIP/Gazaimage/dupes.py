@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+dupes.py — perceptual-hash near-duplicate detection for saved imagery
+- dHash (64-bit) so re-encoded / resized / recompressed copies hash alike
+- BK-tree for hamming-distance lookups, loaded from crawler.db on first use
+- CLI: `python dupes.py` lists duplicate clusters; `--backfill` hashes older rows
+Needs Pillow (pip install pillow); without it near-dup checks are skipped.
+"""
+import os, sys, argparse
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+def dhash(src, size: int = 8):
+    """dHash of an image path or file object as a 16-char hex string, or None
+    when Pillow is missing or the image can't be decoded."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(src) as img:
+            img.draft("L", (size * 8, size * 8))  # JPEG: decode at reduced scale
+            small = img.convert("L").resize((size + 1, size), Image.LANCZOS)
+            px = list(small.getdata())
+    except Exception:
+        return None
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = px[row * (size + 1) + col]
+            right = px[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:0{size * size // 4}x}"
+
+def hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+class BKTree:
+    """Burkhard-Keller tree over hex hashes; node = [hash, payloads, {dist: child}]."""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, h: str, payload):
+        self.size += 1
+        if self.root is None:
+            self.root = [h, [payload], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(h, node[0])
+            if d == 0:
+                node[1].append(payload)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, [payload], {}]
+                return
+            node = child
+
+    def find(self, h: str, max_dist: int):
+        """All (distance, hash, payload) within max_dist, nearest first."""
+        out = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= max_dist:
+                out.extend((d, node[0], p) for p in node[1])
+            for cd, child in node[2].items():
+                if d - max_dist <= cd <= d + max_dist:
+                    stack.append(child)
+        out.sort(key=lambda t: t[0])
+        return out
+
+# -------- CLI --------
+
+def _clusters(u, max_dist: int):
+    """Group saved images (and linked near-dups) into clusters of >1 member."""
+    rows = u.db_query("SELECT hash, phash, filename, image_url FROM images WHERE phash IS NOT NULL")
+    info = {h: (fn, url) for h, _, fn, url in rows}
+    parent = {h: h for h in info}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    tree = BKTree()
+    for h, ph, _, _ in rows:
+        for _, _, other in tree.find(ph, max_dist):
+            parent[find(h)] = find(other)
+        tree.add(ph, h)
+    groups = {}
+    for h in info:
+        groups.setdefault(find(h), []).append((h, None))
+    links = u.db_query("SELECT hash, dup_of, distance, image_url FROM near_dupes")
+    for h, dup_of, dist, url in links:
+        if dup_of in parent:
+            groups.setdefault(find(dup_of), []).append((h, dist))
+            info.setdefault(h, ("(not saved)", url))
+    return [(members, info) for members in groups.values() if len(members) > 1]
+
+def backfill(u) -> int:
+    rows = u.db_query("SELECT hash, filename FROM images WHERE phash IS NULL")
+    done = 0
+    for h, fn in rows:
+        path = os.path.join(u.DOWNLOAD_DIR, fn or "")
+        if not fn or not os.path.exists(path):
+            continue
+        ph = dhash(path)
+        if ph:
+            u.db_writer().execute("UPDATE images SET phash=? WHERE hash=?", (ph, h))
+            done += 1
+    u.db_writer().flush()
+    return done
+
+def main():
+    ap = argparse.ArgumentParser(description="List near-duplicate image clusters in crawler.db")
+    ap.add_argument("--distance", type=int, default=None, help="max hamming distance (default GAZA_PHASH_DISTANCE)")
+    ap.add_argument("--backfill", action="store_true", help="compute phash for saved images that lack one")
+    args = ap.parse_args()
+    if args.backfill and Image is None:
+        print("[!] Pillow not installed. Install with: pip install pillow")
+        sys.exit(1)
+    import utils_2 as u
+    if args.backfill:
+        print(f"[+] Backfilled phash for {backfill(u)} images")
+    dist = u.PHASH_DISTANCE if args.distance is None else args.distance
+    clusters = _clusters(u, max(0, dist))
+    clusters.sort(key=lambda c: -len(c[0]))
+    for i, (members, info) in enumerate(clusters, 1):
+        print(f"=== Cluster {i}: {len(members)} images")
+        for h, d in members:
+            fn, url = info[h]
+            tag = "saved " if d is None else f"dup d={d}"
+            print(f"  {tag:<8} {h[:12]} {fn}  <{url}>")
+    if not clusters:
+        print("No near-duplicate clusters found.")
+
+if __name__ == "__main__":
+    main()
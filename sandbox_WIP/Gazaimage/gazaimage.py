@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+gazaimage.py — one entry point for all scrapers, run in a single process
+Usage: python gazaimage.py STAGE [STAGE ...] [--dry-run]
+  crawl    crawler.py (seeds.txt)           social   social_scrape_termux.py (snscrape)
+  nitter   social_scrape_nitter.py          browser  social_scrape.py (Playwright; not in "all")
+  all      crawl social nitter              migrate-db  fold utils.py's scraper.db into crawler.db
+- Stages run in the order given and share one DB writer, HTTP session pool, rate limiter
+  and crawl_stats run; a stage whose dependency is missing is skipped, the rest still run
+- Nothing heavy is imported until a stage needs it (requests/Pillow with utils_2,
+  snscrape with social, Playwright with browser)
+- scraper.db is migrated once on first start; the schema is only touched when SCHEMA_VERSION changes
+- Prints interpreter startup, import and run time per stage (--dry-run: imports only)
+"""
+import time
+
+T0 = time.perf_counter()
+
+import os, argparse, importlib  # noqa: E402
+
+STAGES = {
+    "crawl": "crawler",
+    "social": "social_scrape_termux",
+    "nitter": "social_scrape_nitter",
+    "browser": "social_scrape",
+}
+ALL = ("crawl", "social", "nitter")
+
+def process_age():
+    """Seconds since this process started (Linux/Android /proc), or None elsewhere."""
+    try:
+        with open("/proc/self/stat") as f:
+            started = int(f.read().rsplit(")", 1)[1].split()[19])  # field 22: start time in clock ticks
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - started / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+BOOT = process_age()  # interpreter startup before this module ran
+
+def load_stage(name: str):
+    """(module or None, import seconds)."""
+    t0 = time.perf_counter()
+    try:
+        mod = importlib.import_module(STAGES[name])
+    except ImportError as e:
+        print(f"[!] {name}: skipped, {e}")
+        mod = None
+    except SystemExit:
+        print(f"[!] {name}: skipped")  # social_scrape_termux exits at import without snscrape
+        mod = None
+    return mod, time.perf_counter() - t0
+
+def run_stage(name: str, u, dry_run: bool = False):
+    mod, imported = load_stage(name)
+    if mod is None:
+        return
+    ran = 0.0
+    if not dry_run:
+        print(f"=== {name} ({mod.__name__}.py)")
+        t0 = time.perf_counter()
+        try:
+            mod.main()
+        except Exception as e:
+            print(f"[!] {name} failed: {e}")
+        ran = time.perf_counter() - t0
+        u.db_writer().flush()  # commit the stage's writes before the next one starts
+    print(f"[=] {name}: import {imported:.2f}s" + (f", run {ran:.1f}s" if ran else ""))
+
+def _args():
+    ap = argparse.ArgumentParser(description="Gaza imagery scrapers in one process")
+    ap.add_argument("stages", nargs="+", choices=[*STAGES, "all", "migrate-db"], metavar="STAGE",
+                    help=f"{', '.join(STAGES)}, all ({' '.join(ALL)}) or migrate-db")
+    ap.add_argument("--dry-run", action="store_true", help="import the stages and report startup times only")
+    return ap.parse_args()
+
+def main():
+    args = _args()
+    stages = []
+    for s in args.stages:
+        for name in (ALL if s == "all" else (s,)):
+            if name not in stages:
+                stages.append(name)
+    t0 = time.perf_counter()
+    import utils_2 as u  # DB connection, schema check, writer
+    u.migrate_legacy_db()
+    setup = time.perf_counter() - t0
+    boot = f"interpreter {BOOT:.2f}s, " if BOOT is not None else ""
+    print(f"[=] Startup: {boot}utils_2 + DB {setup:.2f}s, ready {time.perf_counter() - T0:.2f}s after launch")
+    for name in stages:
+        if name != "migrate-db":
+            run_stage(name, u, args.dry_run)
+    print(f"=== Done in {time.perf_counter() - T0 + (BOOT or 0):.1f}s")
+
+if __name__ == "__main__":
+    main()
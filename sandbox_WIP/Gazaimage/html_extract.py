@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+html_extract.py — single-pass link/image extraction for crawler.py
+- Streams the page through html.parser's tokenizer; no tree is built
+- Collects <img>/<source> attributes (src, srcset, data-*), <a href> and og:image in one pass
+- Falls back to BeautifulSoup (SoupStrainer on the same tags) if the tokenizer chokes
+- Groups image variants and picks the widest candidate per image
+"""
+import os, re
+from collections import namedtuple
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+
+# imgs: attr dicts of <img> and <picture><source> (sources carry "_picture": True)
+PageTargets = namedtuple("PageTargets", "imgs hrefs og_images")
+
+PARSER = os.environ.get("GAZA_HTML_PARSER", "fast")  # fast | soup
+
+_OG_KEYS = ("og:image", "og:image:url", "og:image:secure_url", "twitter:image")
+
+class _TargetParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.imgs = []
+        self.hrefs = []
+        self.og_images = []
+        self._picture = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            for k, v in attrs:
+                if k == "href" and v:
+                    self.hrefs.append(v)
+                    break
+        elif tag == "img":
+            self.imgs.append({k: v or "" for k, v in attrs})
+        elif tag == "source" and self._picture:
+            d = {k: v or "" for k, v in attrs}
+            d["_picture"] = True
+            self.imgs.append(d)
+        elif tag == "picture":
+            self._picture += 1
+        elif tag == "meta":
+            d = dict(attrs)
+            if (d.get("property") or d.get("name") or "").lower() in _OG_KEYS and d.get("content"):
+                self.og_images.append(d["content"])
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag == "picture":
+            self._picture -= 1
+
+    def handle_endtag(self, tag):
+        if tag == "picture" and self._picture:
+            self._picture -= 1
+
+def _parse_fast(html: str) -> PageTargets:
+    p = _TargetParser()
+    p.feed(html)
+    p.close()
+    return PageTargets(p.imgs, p.hrefs, p.og_images)
+
+def _parse_soup(html: str) -> PageTargets:
+    from bs4 import BeautifulSoup, SoupStrainer
+    soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer(["img", "a", "meta", "picture"]))
+    imgs, hrefs, og = [], [], []
+    for el in soup.find_all(["img", "a", "meta", "source"]):
+        if el.name == "a":
+            if el.get("href"):
+                hrefs.append(el["href"])
+        elif el.name == "img":
+            imgs.append({k: (" ".join(v) if isinstance(v, list) else v or "") for k, v in el.attrs.items()})
+        elif el.name == "source":
+            if el.find_parent("picture") is not None:
+                d = {k: (" ".join(v) if isinstance(v, list) else v or "") for k, v in el.attrs.items()}
+                d["_picture"] = True
+                imgs.append(d)
+        elif (el.get("property") or el.get("name") or "").lower() in _OG_KEYS and el.get("content"):
+            og.append(el["content"])
+    return PageTargets(imgs, hrefs, og)
+
+def parse_page(html: str, parser: str = None) -> PageTargets:
+    """Everything crawler.extract_targets needs from a page, in one pass."""
+    if (parser or PARSER) == "soup":
+        return _parse_soup(html)
+    try:
+        return _parse_fast(html)
+    except Exception:
+        return _parse_soup(html)
+
+# -------- Image candidate selection --------
+# One <img> (plus its <picture> sources, srcset entries and lazy-load
+# attributes) is one group of variants. Separate <img>s are only merged when
+# they share a URL, and og:image joins the group holding the same image with
+# only its size tokens (WxH, @2x, w_/width_ segments) removed. Numbered names
+# (-01.jpg) and date paths (/2024/01/) are different images, not sizes.
+# Each group yields its widest candidate; the rest are recorded as aliases.
+
+_LAZY_ATTRS = ("data-src", "data-original", "data-lazy-src", "data-full-src", "data-hi-res-src")
+_LAZY_SRCSET = ("data-srcset", "data-lazy-srcset")
+_SIZE_TOKENS = re.compile(r"(@\d(?:\.\d)?x(?=\.\w+$)|[-_.]\d{2,5}x\d{2,5}(?=[-_./]|$)|/(?:w|width)_\d{2,5}(?:,[^/]*)?(?=/))", re.I)
+# explicit widths only: 1200x800, w_1200 / width_1200 path segments, ?w=1200 / ?width=1200
+_WIDTH_HINT = re.compile(r"(?:[-_.](\d{2,5})x\d{2,5}(?=[-_./]|$)|/(?:w|width)_(\d{2,5})(?=[,/])|[?&](?:w|width)=(\d{2,5})(?=&|$))", re.I)
+
+def _parse_srcset(srcset: str, base_width: int):
+    """[(url, width)] from a srcset; x-descriptors scale the img width attribute.
+    URLs end at whitespace and may contain commas (Cloudinary w_400,c_fill/...)."""
+    out = []
+    pos, n = 0, len(srcset)
+    while pos < n:
+        while pos < n and (srcset[pos].isspace() or srcset[pos] == ","):
+            pos += 1
+        start = pos
+        while pos < n and not srcset[pos].isspace():
+            pos += 1
+        url, desc = srcset[start:pos], ""
+        if url.endswith(","):
+            url = url.rstrip(",")  # "a.jpg, b.jpg 2x": no descriptor
+        else:
+            end = srcset.find(",", pos)
+            end = n if end < 0 else end
+            desc, pos = srcset[pos:end], end + 1
+        if not url:
+            continue
+        width = 0
+        bits = desc.split()
+        if bits:
+            d = bits[0].lower()
+            try:
+                if d.endswith("w"):
+                    width = int(float(d[:-1]))
+                elif d.endswith("x"):
+                    width = int(float(d[:-1]) * (base_width or 1000))
+            except ValueError:
+                pass
+        out.append((url, width))
+    return out
+
+def _width_hint(url: str) -> int:
+    """Pixel width spelled out by a size token in the URL (-1200x800.jpg, /w_1200/, ?w=1200);
+    bare numbers are ignored, they are as often years or counters as widths."""
+    hints = [int(n) for m in _WIDTH_HINT.findall(url) for n in m if n]
+    hints = [h for h in hints if 16 <= h <= 16000]
+    return max(hints) if hints else 0
+
+def variant_key(url: str) -> str:
+    """URL with size tokens and query stripped, so variants of one image compare equal."""
+    p = urlparse(url)
+    return f"{p.netloc}{_SIZE_TOKENS.sub('', p.path)}".lower()
+
+def _int_attr(v) -> int:
+    try:
+        return int(str(v).strip().rstrip("px") or 0)
+    except ValueError:
+        return 0
+
+def image_groups(base_url: str, targets: PageTargets):
+    """[(best_url, [alias urls], alt text)] for every image on the page."""
+    groups = []   # [ {url: score}, alt ]
+    current = None
+    for d in targets.imgs:
+        # <picture><source> entries precede their <img>; collect until it arrives
+        if current is None:
+            current = {}
+        base_w = _int_attr(d.get("width"))
+        for attr in ("srcset",) + _LAZY_SRCSET:
+            for u, w in _parse_srcset(d.get(attr) or "", base_w):
+                current[u] = max(current.get(u, 0), w or _width_hint(u))
+        for attr in _LAZY_ATTRS:
+            u = d.get(attr)
+            if u:
+                current[u] = max(current.get(u, 0), _width_hint(u) or 1)
+        src = d.get("src")
+        if src:
+            current[src] = max(current.get(src, 0), base_w or _width_hint(src))
+        if not d.get("_picture"):
+            groups.append([current, d.get("alt") or ""])
+            current = None
+    for og in targets.og_images:
+        groups.append([{og: _width_hint(og) or 1200}, ""])
+
+    # absolutize, drop inline placeholders, merge <img> groups sharing a URL;
+    # og:image (last in groups) may also match by variant key
+    n_img = len(groups) - len(targets.og_images)
+    by_url, by_key = {}, {}   # url / variant key -> index into out
+    out = []
+    for gi, (cands, alt) in enumerate(groups):
+        full = {}
+        for u, w in cands.items():
+            if u.startswith("data:"):
+                continue
+            full[urljoin(base_url, u)] = w
+        if not full:
+            continue
+        idx = next((by_url[u] for u in full if u in by_url), None)
+        if idx is None and gi >= n_img:
+            idx = next((by_key[variant_key(u)] for u in full if variant_key(u) in by_key), None)
+        if idx is None:
+            idx = len(out)
+            out.append([{}, alt])
+        for u, w in full.items():
+            out[idx][0][u] = max(out[idx][0].get(u, 0), w)
+            by_url.setdefault(u, idx)
+            by_key.setdefault(variant_key(u), idx)
+        out[idx][1] = out[idx][1] or alt
+    result = []
+    for cands, alt in out:
+        best = max(cands, key=lambda u: cands[u])
+        result.append((best, [u for u in cands if u != best], alt))
+    return result
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+imgprobe.py — pixel dimensions from the first bytes of an image, no decoding
+- JPEG (SOFn marker), PNG (IHDR), GIF, WebP (VP8/VP8L/VP8X), TIFF (first IFD)
+- Returns None when the header isn't recognised or isn't inside `head`
+Used with a Range request so low-res files are rejected before download.
+"""
+import struct
+
+def _jpeg(b: bytes):
+    i = 2
+    n = len(b)
+    while i + 4 <= n:
+        if b[i] != 0xFF:
+            i += 1
+            continue
+        marker = b[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # no length field
+            i += 2
+            continue
+        seg_len = struct.unpack(">H", b[i + 2:i + 4])[0]
+        # SOF0..SOF15 except DHT(C4), JPG(C8), DAC(CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if i + 9 > n:
+                return None
+            h, w = struct.unpack(">HH", b[i + 5:i + 9])
+            return w, h
+        i += 2 + seg_len
+    return None
+
+def _png(b: bytes):
+    if len(b) >= 24 and b[12:16] == b"IHDR":
+        return struct.unpack(">II", b[16:24])
+    return None
+
+def _gif(b: bytes):
+    if len(b) >= 10:
+        return struct.unpack("<HH", b[6:10])
+    return None
+
+def _webp(b: bytes):
+    chunk = b[12:16]
+    if chunk == b"VP8 " and len(b) >= 30:
+        w, h = struct.unpack("<HH", b[26:30])
+        return w & 0x3FFF, h & 0x3FFF
+    if chunk == b"VP8L" and len(b) >= 25:
+        bits = int.from_bytes(b[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(b) >= 30:
+        return int.from_bytes(b[24:27], "little") + 1, int.from_bytes(b[27:30], "little") + 1
+    return None
+
+def _tiff(b: bytes):
+    e = "<" if b[:2] == b"II" else ">"
+    if len(b) < 8:
+        return None
+    off = struct.unpack(e + "I", b[4:8])[0]
+    if off + 2 > len(b):
+        return None
+    count = struct.unpack(e + "H", b[off:off + 2])[0]
+    w = h = None
+    for k in range(count):
+        p = off + 2 + 12 * k
+        if p + 12 > len(b):
+            break
+        tag, typ = struct.unpack(e + "HH", b[p:p + 4])
+        if tag in (256, 257):
+            val = struct.unpack(e + ("H" if typ == 3 else "I"), b[p + 8:p + (10 if typ == 3 else 12)])[0]
+            if tag == 256:
+                w = val
+            else:
+                h = val
+    return (w, h) if w and h else None
+
+def image_dimensions(head: bytes):
+    """(width, height) from the leading bytes of an image file, or None."""
+    try:
+        if head[:3] == b"\xff\xd8\xff":
+            return _jpeg(head)
+        if head[:8] == b"\x89PNG\r\n\x1a\n":
+            return _png(head)
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return _gif(head)
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return _webp(head)
+        if head[:4] in (b"II*\x00", b"MM\x00*"):
+            return _tiff(head)
+    except struct.error:
+        return None
+    return None
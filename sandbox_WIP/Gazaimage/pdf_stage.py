@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+pdf_stage.py — pdfimages worker side of the PDF pipeline
+- `pdfimages -list` first, so only images above the pixel/byte thresholds are extracted
+- extracts just the pages holding those images, drops the rest unread
+- stdlib only: runs inside a ProcessPoolExecutor worker (see utils_2.submit_pdf)
+- workers and pdfimages get SIGTERM when their parent dies (Linux/Android), so a killed
+  crawler leaves no orphans behind
+"""
+import os, re, glob, time, signal, ctypes, subprocess
+from collections import namedtuple
+
+PdfImage = namedtuple("PdfImage", "page rank type width height size")
+
+_SIZE_UNITS = {"B": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+_OUT_NAME = re.compile(r"-(\d+)-(\d+)\.\w+$")
+
+def die_with_parent():
+    """PR_SET_PDEATHSIG: SIGTERM this process when its parent exits; no-op off Linux.
+    Pool initializer, and preexec_fn for pdfimages."""
+    try:
+        ctypes.CDLL(None, use_errno=True).prctl(1, signal.SIGTERM)  # 1 = PR_SET_PDEATHSIG
+    except (OSError, AttributeError):
+        pass
+
+def _run(args, **kw):
+    if os.name == "posix":
+        kw["preexec_fn"] = die_with_parent  # workers are single-threaded, so this is safe
+    return subprocess.run(args, check=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kw)
+
+def _parse_size(tok: str) -> int:
+    m = re.match(r"([\d.]+)([BKMG])$", tok)
+    if not m:
+        return 0
+    return int(float(m.group(1)) * _SIZE_UNITS[m.group(2)])
+
+def list_pdf_images(pdf_path: str):
+    """Rows of `pdfimages -list` as PdfImage; rank is the position on its page.
+    Returns None when pdfimages is not installed."""
+    try:
+        out = _run(["pdfimages", "-list", pdf_path], text=True).stdout
+    except FileNotFoundError:
+        return None
+    rows = []
+    ranks = {}
+    for ln in out.splitlines()[2:]:  # header + dashes
+        f = ln.split()
+        if len(f) < 6 or not f[0].isdigit():
+            continue
+        page = int(f[0])
+        rank = ranks.get(page, 0)
+        ranks[page] = rank + 1
+        try:
+            w, h = int(f[3]), int(f[4])
+        except ValueError:
+            w = h = 0
+        rows.append(PdfImage(page, rank, f[2], w, h, _parse_size(f[-2])))
+    return rows
+
+def _page_ranges(pages):
+    """[1, 2, 3, 7] -> [(1, 3), (7, 7)]"""
+    ranges = []
+    for p in sorted(pages):
+        if ranges and p == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], p)
+        else:
+            ranges.append((p, p))
+    return ranges
+
+def extract_large_images(pdf_path: str, out_dir: str, min_pixels: int, min_bytes: int = 0):
+    """Extract embedded images of at least min_pixels (width*height) and
+    min_bytes (stream size) into out_dir; returns their paths, or None when
+    pdfimages is missing."""
+    rows = list_pdf_images(pdf_path)
+    if rows is None:
+        return None
+    keep = {(r.page, r.rank) for r in rows
+            if r.type == "image" and r.width * r.height >= min_pixels and r.size >= min_bytes}
+    if not keep:
+        return []
+    prefix = os.path.join(out_dir, "pdfimg")
+    for first, last in _page_ranges({p for p, _ in keep}):
+        # -all keeps original encodings; -p puts the page number in file names
+        _run(["pdfimages", "-all", "-p", "-f", str(first), "-l", str(last), pdf_path, prefix])
+    by_page = {}
+    for fp in glob.glob(prefix + "-*"):
+        m = _OUT_NAME.search(fp)
+        if m:
+            by_page.setdefault(int(m.group(1)), []).append((int(m.group(2)), fp))
+    kept = []
+    for page, files in by_page.items():
+        # image numbers run across the whole call; order within a page matches -list
+        for rank, (_, fp) in enumerate(sorted(files)):
+            if (page, rank) in keep:
+                kept.append(fp)
+            else:
+                os.remove(fp)
+    return kept
+
+def timed_extract_large_images(pdf_path: str, out_dir: str, min_pixels: int, min_bytes: int = 0):
+    """extract_large_images() plus the seconds it took in this worker, for crawl stats."""
+    t0 = time.perf_counter()
+    paths = extract_large_images(pdf_path, out_dir, min_pixels, min_bytes)
+    return paths, time.perf_counter() - t0
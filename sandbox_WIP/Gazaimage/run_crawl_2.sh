@@ -7,5 +7,15 @@ export GAZA_SCRAPER_DIR="/storage/emulated/0/Pictures/gaza_scraped"
 # optional tuning:
 # export GAZA_MIN_BYTES=80000
 # export GAZA_RATE_LIMIT=2.0
-python crawler.py
-python social_scrape_termux.py
+# export GAZA_CONCURRENCY=4     # worker threads; 1 = one request at a time
+# export GAZA_PER_DOMAIN=1
+# export GAZA_MAX_DEPTH=1
+# export GAZA_FRONTIER_ORDER=bfs   # or: priority
+# export GAZA_RECRAWL_HOURS=168     # starting revisit interval per page
+# export GAZA_REVISIT_MIN_HOURS=6   # learned interval stays within these
+# export GAZA_REVISIT_MAX_HOURS=720
+# export GAZA_REVALIDATE_HOURS=72   # known image URLs skip the network this long
+# export GAZA_STORAGE_VIEW=symlink    # browsable view/<provider>/<YYYY-MM>/ (not on /storage/emulated)
+# export GAZA_DB_BATCH=200        # DB commit every N writes ...
+# export GAZA_DB_FLUSH=1.0        # ... or every N seconds
+python gazaimage.py crawl social   # one process: shared DB writer + HTTP pool
@@ -2,63 +2,181 @@
 """
 social_scrape.py — JS feed grabber (X/Bluesky) for Gaza imagery (v2)
 - Reads feeds from feeds.csv (name,url)
-- Uses Playwright to render and scrape recent <img> CDN URLs
-- Avoids double-download by calling utils.save_image_url once
+- One headless Chromium per run; feeds load in parallel in separate contexts (async Playwright)
+- Fonts, CSS, video and analytics requests are blocked; pages are read once media shows up
+- Capture mode: the browser is pointed at the original-size CDN image and its response
+  body goes straight into utils_2.save_image_from_bytes (one transfer per image)
+- Images the browser didn't load fall back to utils_2.save_image_url
 """
-import os, csv, time
-from urllib.parse import urlparse
-from playwright.sync_api import sync_playwright
+import os, csv, time, asyncio
+from urllib.parse import urlparse, urlunparse, parse_qsl
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
 
-from utils import save_image_url
+from utils_2 import (save_image_url, save_image_from_bytes, domain_limiter, known_images, crawl_stats,
+                     detect_ext_from_content_type)
 
 BASE_DIR = os.path.dirname(__file__)
 FEEDS_FILE = os.path.join(BASE_DIR, "feeds.csv")
 
-def grab_feed_images(url: str, max_images: int = 15):
+SOCIAL_CONCURRENCY = int(os.environ.get("GAZA_SOCIAL_CONCURRENCY", "2"))  # browser contexts at once
+CAPTURE = os.environ.get("GAZA_SOCIAL_CAPTURE", "1") != "0"  # 0 = collect srcs, download with requests
+MAX_IMAGES = 15
+MEDIA_PATTERNS = ("pbs.twimg.com/media", ".cdn.bsky.app/img/", "/media/")
+MEDIA_SELECTOR = 'img[src*="pbs.twimg.com/media"], img[src*="cdn.bsky.app/img"]'
+BLOCK_TYPES = {"font", "stylesheet", "media"}
+BLOCK_URLS = ("google-analytics.com", "googletagmanager.com", "doubleclick.net", "analytics.twitter.com",
+              "ads-twitter.com", "scorecardresearch.com", "/i/jot", "/1.1/jot/", "sentry.io", "statsig")
+
+def is_feed_media(url: str) -> bool:
+    """Post images on the X / Bluesky CDNs (not avatars or banners)."""
+    p = urlparse(url)
+    if p.netloc == "pbs.twimg.com":
+        return p.path.startswith("/media/")
+    if p.netloc.endswith("cdn.bsky.app"):
+        return p.path.startswith(("/img/feed_thumbnail/", "/img/feed_fullsize/"))
+    return False
+
+def original_media_url(url: str) -> str:
+    """Largest variant of a CDN media URL: twimg name=orig, bsky feed_fullsize; others unchanged."""
+    p = urlparse(url)
+    if p.netloc == "pbs.twimg.com" and p.path.startswith("/media/"):
+        path = p.path.rsplit(":", 1)[0] if ":" in p.path.rsplit("/", 1)[-1] else p.path  # legacy ID.jpg:large
+        base, ext = os.path.splitext(path)
+        fmt = dict(parse_qsl(p.query)).get("format") or ext[1:] or "jpg"
+        return f"https://pbs.twimg.com{base}?format={fmt}&name=orig"
+    if p.netloc.endswith("cdn.bsky.app") and p.path.startswith("/img/feed_thumbnail/"):
+        return urlunparse(p._replace(path=p.path.replace("/img/feed_thumbnail/", "/img/feed_fullsize/", 1)))
+    return url
+
+def _media_name(url: str, ct: str) -> str:
+    """ID.jpg for /media/ID?format=jpg, cid.jpeg for .../cid@jpeg."""
+    p = urlparse(url)
+    base = os.path.basename(p.path).replace("@", ".")
+    if "." in base:
+        return base
+    fmt = dict(parse_qsl(p.query)).get("format")
+    return base + ("." + fmt if fmt else detect_ext_from_content_type(ct))
+
+async def _route(route):
+    req = route.request
+    if req.resource_type in BLOCK_TYPES or any(s in req.url for s in BLOCK_URLS):
+        await route.abort()
+    elif CAPTURE and req.resource_type == "image" and is_feed_media(req.url):
+        orig = original_media_url(req.url)
+        if known_images().fresh(orig):
+            await route.abort()  # saved recently; don't transfer it at all
+        elif orig != req.url:
+            await route.continue_(url=orig)  # the page renders the original, we keep its bytes
+        else:
+            await route.continue_()
+    else:
+        await route.continue_()
+
+async def grab_feed_images(browser, url: str, max_images: int = MAX_IMAGES):
+    """(media src urls, {original url: (body, content type)} captured from the browser)."""
     imgs = []
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
+    captured = {}
+    pending = set()
+
+    async def _keep_body(resp):
         try:
-            page.goto(url, wait_until="networkidle", timeout=60000)
+            body = await resp.body()
+        except Exception:
+            return  # redirected, aborted or evicted from the cache
+        if len(captured) < max_images:
+            captured.setdefault(original_media_url(resp.url), (body, resp.headers.get("content-type", "")))
+
+    def _on_response(resp):
+        if resp.status == 200 and resp.request.resource_type == "image" and is_feed_media(resp.url):
+            task = asyncio.ensure_future(_keep_body(resp))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+    context = await browser.new_context()
+    try:
+        await context.route("**/*", _route)
+        page = await context.new_page()
+        if CAPTURE:
+            page.on("response", _on_response)
+        try:
+            await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+            try:
+                await page.wait_for_selector(MEDIA_SELECTOR, timeout=15000)
+            except PlaywrightTimeout:
+                pass  # no media rendered yet; still scroll once below
             # light scroll to load more
-            page.mouse.wheel(0, 2000)
-            page.wait_for_timeout(1500)
+            await page.mouse.wheel(0, 2000)
+            await page.wait_for_timeout(1500)
         except Exception as e:
             print(f"[!] Timeout loading {url}: {e}")
-            browser.close()
-            return imgs
-        # Collect visible <img> tags that look like media
-        handles = page.locator("img").element_handles()
-        for h in handles:
-            src = h.get_attribute("src") or ""
-            if not src:
+            return imgs, captured
+        # Collect <img> srcs that look like media, in one round-trip
+        srcs = await page.eval_on_selector_all("img", "els => els.map(e => e.getAttribute('src') || '')")
+        if pending:
+            await asyncio.gather(*list(pending), return_exceptions=True)
+    finally:
+        await context.close()
+    for src in srcs:
+        if src and any(s in src for s in MEDIA_PATTERNS) and src not in imgs:
+            imgs.append(src)
+            if len(imgs) >= max_images:
+                break
+    return imgs, captured
+
+def _save_all(img_urls, captured: dict, referrer: str):
+    stats = crawl_stats()
+    known = known_images()
+    for img_url, (body, ct) in captured.items():
+        stats.add(img_url, "bytes_down", len(body))
+        save_image_from_bytes(body, img_url, referrer, suggested_name=_media_name(img_url, ct))
+        known.touch(img_url)
+    limiter = domain_limiter()
+    for img_url in img_urls:
+        if CAPTURE and is_feed_media(img_url):
+            img_url = original_media_url(img_url)
+            if img_url in captured:
                 continue
-            if any(s in src for s in ["pbs.twimg.com/media", ".cdn.bsky.app/img/", "/media/"]):
-                imgs.append(src)
-                if len(imgs) >= max_images:
-                    break
-        browser.close()
-    return imgs
+        # not rendered by the browser (lazy-loaded, or capture off): fetch it ourselves
+        limiter.wait(img_url)
+        save_image_url(img_url, referrer=referrer)
+
+async def scan_feed(browser, slots: asyncio.Semaphore, name: str, url: str):
+    try:
+        async with slots:
+            t0 = time.perf_counter()
+            imgs, captured = await grab_feed_images(browser, url, max_images=MAX_IMAGES)
+            print(f"=== Scanned {name or url}: {len(imgs)} images ({len(captured)} captured) "
+                  f"in {time.perf_counter() - t0:.1f}s")
+        # saving runs in a thread so the slot goes to the next feed meanwhile
+        await asyncio.to_thread(_save_all, imgs, captured, url)
+    except Exception as exc:
+        print(f"[!] {name} error: {exc}")
+
+async def scan_feeds(feeds):
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            slots = asyncio.Semaphore(max(1, SOCIAL_CONCURRENCY))
+            await asyncio.gather(*(scan_feed(browser, slots, name, url) for name, url in feeds))
+        finally:
+            await browser.close()
+
+def read_feeds(path: str = FEEDS_FILE):
+    feeds = []
+    with open(path, "r", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith("#"):
+                continue
+            name, url = (row + [""])[:2]
+            if url:
+                feeds.append((name, url))
+    return feeds
 
 def main():
     if not os.path.exists(FEEDS_FILE):
         print(f"[!] feeds.csv not found at {FEEDS_FILE}")
         return
-    with open(FEEDS_FILE, "r", encoding="utf-8") as f:
-        r = csv.reader(f)
-        for row in r:
-            if not row or row[0].startswith("#"):
-                continue
-            name, url = (row + [""])[:2]
-            if not url:
-                continue
-            print(f"=== Scanning {name or url} …")
-            try:
-                for img_url in grab_feed_images(url, max_images=15):
-                    save_image_url(img_url, referrer=url)
-            except Exception as exc:
-                print(f"[!] {name} error: {exc}")
+    asyncio.run(scan_feeds(read_feeds()))
 
 if __name__ == "__main__":
     main()
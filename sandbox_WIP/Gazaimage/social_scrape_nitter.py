@@ -1,29 +1,334 @@
-# social_scrape_nitter.py
-import os, requests
-from utils import init_db, file_seen
+#!/usr/bin/env python3
+"""
+social_scrape_nitter.py — X/Twitter timelines through Nitter mirrors, no API keys or browser
+- Mirrors are raced: the best-scored one is asked first, the next joins after GAZA_NITTER_HEDGE
+  seconds (or as soon as one fails); the first healthy timeline wins
+- Per-mirror latency and failure streak are kept in crawler.db (nitter_mirrors), so the next
+  run starts with the fastest mirror; every request has a GAZA_NITTER_TIMEOUT
+- Timelines are parsed for tweets; photo links are mapped back to pbs.twimg.com originals and
+  saved via utils_2.save_image_url (probe, stream, dedupe, DB)
+- Shares the per-account cursor with social_scrape_termux.py (social_cursors, source "x")
+"""
+import os, re, time, queue, base64, threading
+from collections import namedtuple
+from html.parser import HTMLParser
+from urllib.parse import urlparse, unquote, quote
 
-SAVE_DIR = "/storage/emulated/0/Pictures/gaza_scraped"
-FEEDS = [line.strip().lstrip("@") for line in open("feeds_x.txt") if line.strip() and not line.startswith("#")]
-NITTER_BASES = ["https://nitter.net", "https://nitter.it", "https://nitter.moomoo.me"]
+import requests
+from utils_2 import (save_image_url, domain_limiter, http_session, note_failure, db_query, db_writer,
+                     get_cursor, set_cursor, now_i)
+
+BASE_DIR = os.path.dirname(__file__)
+FEEDS_FILE = os.path.join(BASE_DIR, "feeds_x.txt")
+
+NITTER_BASES = [b.strip().rstrip("/") for b in os.environ.get(
+    "GAZA_NITTER_MIRRORS", "https://nitter.net,https://nitter.it,https://nitter.moomoo.me").split(",") if b.strip()]
+TIMEOUT = float(os.environ.get("GAZA_NITTER_TIMEOUT", "10"))     # per request (connect, read)
+HEDGE_SECONDS = float(os.environ.get("GAZA_NITTER_HEDGE", "2"))  # before the next mirror joins the race
+MAX_PAGES = int(os.environ.get("GAZA_NITTER_PAGES", "2"))        # timeline pages per account
+MAX_IMAGES_PER_USER = int(os.environ.get("GAZA_MAX_IMAGES", "15"))
+TWIMG_BASE = os.environ.get("GAZA_TWIMG_BASE", "https://pbs.twimg.com").rstrip("/")
 KEYWORDS = ["Gaza", "Palestine", "satellite", "drone", "aerial", "imagery", "IDF", "strike", "damage"]
 
-def main():
-    init_db()
-    os.makedirs(SAVE_DIR, exist_ok=True)
-    for feed in FEEDS:
-        for base in NITTER_BASES:
-            url = f"{base}/{feed}"
+Tweet = namedtuple("Tweet", "id pinned retweet text media")
+
+_STATUS = re.compile(r"/status/(\d+)")
+
+# -------- Timeline parsing --------
+
+class _TimelineParser(HTMLParser):
+    """Tweets (div.timeline-item) and the 'Load more' cursor link of a Nitter timeline."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tweets = []
+        self.more = None
+        self._item = None     # tweet being read
+        self._depth = 0       # open <div>s inside it
+        self._text_at = None  # depth of its div.tweet-content
+        self._in_more = False
+
+    def handle_starttag(self, tag, attrs):
+        a = dict(attrs)
+        cls = (a.get("class") or "").split()
+        if tag == "div":
+            if self._item is None:
+                if "show-more" in cls:
+                    self._in_more = True  # "Load more" / "Load newest"; not a tweet
+                elif "timeline-item" in cls:
+                    self._item = {"id": 0, "pinned": False, "retweet": False, "text": [], "media": []}
+                    self._depth = 1
+                return
+            self._depth += 1
+            if "pinned" in cls:
+                self._item["pinned"] = True
+            elif "retweet-header" in cls:
+                self._item["retweet"] = True
+            elif "tweet-content" in cls and self._text_at is None:
+                self._text_at = self._depth
+        elif tag == "a":
+            href = a.get("href") or ""
+            if self._item is None:
+                if self._in_more and "cursor=" in href:
+                    self.more = href
+            elif "tweet-link" in cls and not self._item["id"]:
+                m = _STATUS.search(href)
+                if m:
+                    self._item["id"] = int(m.group(1))
+            elif "still-image" in cls and href:
+                self._item["media"].append(href)  # photos only; video/GIF posters have no still-image link
+
+    def handle_endtag(self, tag):
+        if tag != "div":
+            return
+        if self._item is None:
+            self._in_more = False
+            return
+        if self._text_at == self._depth:
+            self._text_at = None
+        self._depth -= 1
+        if not self._depth:
+            it = self._item
+            if it["id"]:
+                self.tweets.append(Tweet(it["id"], it["pinned"], it["retweet"], " ".join(it["text"]).strip(),
+                                         it["media"]))
+            self._item = None
+
+    def handle_data(self, data):
+        if self._text_at is not None:
+            self._item["text"].append(data.strip())
+
+def parse_timeline(html: str):
+    """([Tweet], 'Load more' href or None) from a Nitter profile page."""
+    p = _TimelineParser()
+    p.feed(html)
+    p.close()
+    return p.tweets, p.more
+
+def looks_like_timeline(html: str) -> bool:
+    # rate-limited / broken mirrors answer 200 with an error panel instead of a timeline
+    return 'class="timeline' in html and "error-panel" not in html
+
+def media_url(href: str):
+    """pbs.twimg.com original for a Nitter /pic/ link (plain or base64 'enc'), or None."""
+    path = urlparse(href).path
+    if not path.startswith("/pic/"):
+        return None
+    rest = path[len("/pic/"):]
+    if rest.startswith("orig/"):
+        rest = rest[len("orig/"):]
+    if rest.startswith("enc/"):
+        enc = rest[len("enc/"):]
+        try:
+            rest = base64.urlsafe_b64decode(enc + "=" * (-len(enc) % 4)).decode()
+        except (ValueError, UnicodeDecodeError):
+            return None
+    else:
+        rest = unquote(rest)
+    rest = rest.split("?", 1)[0].split("pbs.twimg.com/", 1)[-1]
+    if not rest.startswith("media/"):
+        return None  # avatars, banners, card and video thumbnails
+    name, ext = os.path.splitext(rest[len("media/"):])
+    if not name or "/" in name:
+        return None
+    return f"{TWIMG_BASE}/media/{name}?format={ext[1:] or 'jpg'}&name=orig"
+
+def is_relevant(text: str) -> bool:
+    t = text.lower()
+    return any(k.lower() in t for k in KEYWORDS)
+
+# -------- Mirror pool --------
+
+class MirrorPool:
+    """Nitter mirrors ranked by health, raced per request.
+
+    A mirror's score is its latency EWMA (untried: TIMEOUT / 2) plus one
+    TIMEOUT per consecutive failure, so a dead mirror drops behind every
+    working one but is still tried when nothing else answers. Scores are
+    loaded from and saved to the nitter_mirrors table.
+    """
+
+    ALPHA = 0.3  # weight of the newest latency sample
+
+    def __init__(self, bases=None, timeout: float = TIMEOUT, hedge: float = HEDGE_SECONDS):
+        self.bases = list(bases or NITTER_BASES)
+        self.timeout = timeout
+        self.hedge = hedge
+        self.health = {}  # base -> {latency, ok, fail, streak, last_ok}
+        self._lock = threading.Lock()
+        for base, latency, ok, fail, streak, last_ok in db_query(
+                "SELECT base, latency, ok, fail, streak, last_ok FROM nitter_mirrors"):
+            if base in self.bases:
+                self.health[base] = {"latency": latency, "ok": ok, "fail": fail, "streak": streak, "last_ok": last_ok}
+
+    def score(self, base: str) -> float:
+        with self._lock:
+            h = self.health.get(base)
+            if not h:
+                return self.timeout / 2
+            latency = h["latency"] if h["latency"] is not None else self.timeout / 2
+            return latency + h["streak"] * self.timeout
+
+    def ranked(self):
+        return sorted(self.bases, key=self.score)
+
+    def _begin(self, base: str):
+        # counted as a failure until it answers: a mirror that hangs past the end of the run is still penalised
+        with self._lock:
+            h = self.health.setdefault(base, {"latency": None, "ok": 0, "fail": 0, "streak": 0, "last_ok": None})
+            h["fail"] += 1
+            h["streak"] += 1
+
+    def observe(self, base: str, ok: bool, latency: float):
+        if not ok:
+            return  # already counted by _begin
+        with self._lock:
+            h = self.health[base]
+            h["latency"] = latency if h["latency"] is None else (1 - self.ALPHA) * h["latency"] + self.ALPHA * latency
+            h["ok"] += 1
+            h["fail"] -= 1
+            h["streak"] = 0
+            h["last_ok"] = now_i()
+
+    def _attempt(self, base: str, path: str, results: queue.Queue):
+        # always queues exactly one (base, html-or-None): fetch() counts on it
+        html = None
+        try:
+            url = base + path
+            delay = domain_limiter().reserve(urlparse(url).netloc) - time.time()
+            if delay > self.timeout:
+                return  # backing off after a 429; not counted against its health
+            if delay > 0:
+                time.sleep(delay)
+            self._begin(base)
+            t0 = time.perf_counter()
             try:
-                r = requests.get(url)
-                if any(k.lower() in r.text.lower() for k in KEYWORDS):
-                    fname = os.path.join(SAVE_DIR, f"{feed}.html")
-                    if not file_seen(url, r.content):
-                        with open(fname, "wb") as f:
-                            f.write(r.content)
-                        print(f"Saved {fname}")
+                r = http_session(url).get(url, timeout=self.timeout)
+                if r.status_code == 200 and looks_like_timeline(r.text):
+                    html = r.text
+            except requests.RequestException:
+                note_failure(url)
+            self.observe(base, html is not None, time.perf_counter() - t0)
+        except Exception as e:
+            html = None
+            print(f"[!] Nitter {base}: {e}")
+        finally:
+            results.put((base, html))
+
+    def fetch(self, path: str):
+        """(mirror, html) of the first healthy answer for path, or (None, None)."""
+        order = self.ranked()
+        results = queue.Queue()
+        started = running = 0
+        # an attempt waits at most `timeout` for its rate-limit slot, then `timeout` per request
+        straggler_wait = self.timeout * 2 + 1
+        while started < len(order) or running:
+            if running and (started == len(order) or self.hedge > 0):
+                try:
+                    base, html = results.get(timeout=self.hedge if started < len(order) else straggler_wait)
+                except queue.Empty:
+                    if started == len(order):
+                        break  # stuck attempts keep running in the background; give up on this path
+                    base = None  # best mirror is slow: let the next one race it
+                else:
+                    running -= 1
+                    if html is not None:
+                        return base, html
+                    if started == len(order):
+                        continue
+            # losers keep running in the background and still update their health
+            threading.Thread(target=self._attempt, args=(order[started], path, results), daemon=True).start()
+            started += 1
+            running += 1
+        return None, None
+
+    def save(self):
+        with self._lock:
+            rows = [(b, h["latency"], h["ok"], h["fail"], h["streak"], h["last_ok"], now_i())
+                    for b, h in self.health.items()]
+        if rows:
+            db_writer().executemany("""INSERT OR REPLACE INTO nitter_mirrors(base, latency, ok, fail, streak, last_ok, updated_at)
+                                       VALUES (?,?,?,?,?,?,?)""", rows)
+
+    def summary(self) -> str:
+        cells = []
+        for base in self.ranked():
+            h = self.health.get(base)
+            if not h:
+                cells.append(f"{base} untried")
+                continue
+            lat = f"{h['latency']:.2f}s" if h["latency"] is not None else "-"
+            cells.append(f"{base} {lat} ok {h['ok']}/{h['ok'] + h['fail']}")
+        return ", ".join(cells)
+
+# -------- Scraping --------
+
+def load_users(path: str):
+    users = []
+    if not os.path.exists(path):
+        return users
+    with open(path, "r", encoding="utf-8") as f:
+        for ln in f:
+            ln = ln.strip()
+            if ln and not ln.startswith("#"):
+                users.append(ln.lstrip("@"))
+    return users
+
+def scan_user(pool: MirrorPool, user: str):
+    since = get_cursor("x", user)
+    newest = since or 0
+    path = "/" + quote(user)
+    tweets = images = pages = 0
+    limiter = domain_limiter()
+    while path and pages < MAX_PAGES and images < MAX_IMAGES_PER_USER:
+        base, html = pool.fetch(path)
+        if html is None:
+            # cursor not advanced: the tweets we didn't reach are retried next run
+            print(f"[!] @{user}: no Nitter mirror answered")
+            return
+        pages += 1
+        items, more = parse_timeline(html)
+        reached = False
+        for t in items:
+            if since and t.id <= since:
+                if t.pinned or t.retweet:
+                    continue  # old pinned tweet / retweet of an old tweet; newer ones follow
+                reached = True  # everything from here on was handled by an earlier run
+                break
+            tweets += 1
+            if not t.retweet:
+                newest = max(newest, t.id)
+            if not t.media or not is_relevant(t.text):
+                continue
+            ref = f"https://x.com/{user}/status/{t.id}"
+            for href in t.media:
+                url = media_url(href)
+                if not url:
+                    continue
+                limiter.wait(url)
+                save_image_url(url, referrer=ref)
+                images += 1
+                if images >= MAX_IMAGES_PER_USER:
+                    break
+            if images >= MAX_IMAGES_PER_USER:
                 break
-            except Exception as e:
-                print(f"Error fetching {url}: {e}")
+        path = None if reached or not more else "/" + quote(user) + "?" + more.split("?", 1)[-1]
+    if newest and newest != since:
+        set_cursor("x", user, newest)
+    print(f"=== @{user}: {tweets} new tweets, {images} images ({pages} pages)")
+
+def main():
+    users = load_users(FEEDS_FILE)
+    if not users:
+        print(f"[!] No users found in {FEEDS_FILE}. Add one handle per line (e.g., obretix).")
+        return
+    pool = MirrorPool()
+    print(f"=== Scanning {len(users)} users via {len(pool.bases)} Nitter mirrors …")
+    for user in users:
+        scan_user(pool, user)
+    pool.save()
+    db_writer().flush()
+    print(f"[=] Mirrors: {pool.summary()}")
 
 if __name__ == "__main__":
     main()
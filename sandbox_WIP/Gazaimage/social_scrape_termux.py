@@ -3,11 +3,14 @@
 social_scrape_termux.py — X/Twitter-only social scraper for Termux
 - Avoids Playwright/Chromium.
 - Uses snscrape to fetch latest media URLs from specified usernames.
-- Saves via utils.save_image_url (dedupe + DB + provider tagging).
+- Saves via utils_2.save_image_url (dedupe + DB + provider tagging).
+- Remembers the newest tweet id per user (social_cursors) and stops at known tweets.
+- Users are scanned in parallel by a small thread pool; all DB writes share the one writer.
 """
 import os, sys
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
-from utils import save_image_url
+from utils_2 import save_image_url, domain_limiter, get_cursor, set_cursor
 try:
     import snscrape.modules.twitter as sntwitter
 except Exception as e:
@@ -19,6 +22,7 @@ FEEDS_FILE = os.path.join(BASE_DIR, "feeds_x.txt")
 
 MAX_TWEETS_PER_USER = int(os.environ.get("GAZA_MAX_TWEETS", "40"))
 MAX_IMAGES_PER_USER = int(os.environ.get("GAZA_MAX_IMAGES", "15"))
+SOCIAL_WORKERS = int(os.environ.get("GAZA_SOCIAL_WORKERS", "3"))  # users scanned at once
 
 def load_users(path: str) -> List[str]:
     users = []
@@ -32,36 +36,55 @@ def load_users(path: str) -> List[str]:
             users.append(ln.lstrip("@"))
     return users
 
+def scan_user(user: str):
+    since = get_cursor("x", user)
+    newest = since or 0
+    images_seen = 0
+    tweets = 0
+    limiter = domain_limiter()
+    try:
+        scraper = sntwitter.TwitterUserScraper(user)
+        for i, tweet in enumerate(scraper.get_items()):
+            if i >= MAX_TWEETS_PER_USER or images_seen >= MAX_IMAGES_PER_USER:
+                break
+            if since and tweet.id <= since:
+                if i == 0:
+                    continue  # may be an old pinned tweet, which comes first; newer ones follow it
+                break  # everything from here on was handled by an earlier run
+            tweets += 1
+            newest = max(newest, tweet.id)
+            media = getattr(tweet, "media", None)
+            if not media:
+                continue
+            # Permalink (referrer)
+            ref = f"https://x.com/{user}/status/{tweet.id}"
+            for m in media:
+                # Photos only; GIF/video skipped for now
+                if isinstance(m, sntwitter.Photo):
+                    url = getattr(m, "fullUrl", None) or getattr(m, "url", None)
+                    if url:
+                        limiter.wait(url)
+                        save_image_url(url, referrer=ref)
+                        images_seen += 1
+                        if images_seen >= MAX_IMAGES_PER_USER:
+                            break
+    except Exception as exc:
+        # cursor not advanced: the tweets we didn't reach are retried next run
+        print(f"[!] @{user} error: {exc}")
+        return
+    if newest and newest != since:
+        set_cursor("x", user, newest)
+    print(f"=== @{user}: {tweets} new tweets, {images_seen} images")
+
 def main():
     users = load_users(FEEDS_FILE)
     if not users:
         print(f"[!] No users found in {FEEDS_FILE}. Add one handle per line (e.g., obretix).")
         return
 
-    for user in users:
-        print(f"=== Scanning @{user} …")
-        images_seen = 0
-        try:
-            scraper = sntwitter.TwitterUserScraper(user)
-            for i, tweet in enumerate(scraper.get_items()):
-                if i >= MAX_TWEETS_PER_USER or images_seen >= MAX_IMAGES_PER_USER:
-                    break
-                media = getattr(tweet, "media", None)
-                if not media:
-                    continue
-                # Permalink (referrer)
-                ref = f"https://x.com/{user}/status/{tweet.id}"
-                for m in media:
-                    # Photos only; GIF/video skipped for now
-                    if isinstance(m, sntwitter.Photo):
-                        url = getattr(m, "fullUrl", None) or getattr(m, "url", None)
-                        if url:
-                            save_image_url(url, referrer=ref)
-                            images_seen += 1
-                            if images_seen >= MAX_IMAGES_PER_USER:
-                                break
-        except Exception as exc:
-            print(f"[!] @{user} error: {exc}")
+    print(f"=== Scanning {len(users)} users ({SOCIAL_WORKERS} at a time) …")
+    with ThreadPoolExecutor(max_workers=max(1, SOCIAL_WORKERS)) as pool:
+        list(pool.map(scan_user, users))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+storage.py — content-addressed image store under DOWNLOAD_DIR
+- Files live at objects/<h[:2]>/<h[2:4]>/<sha256><ext>; images.filename holds that relative path
+- Writes are atomic: temp file in DOWNLOAD_DIR, fsync, rename into place
+- Optional browsable view (GAZA_STORAGE_VIEW=symlink|hardlink): view/<provider>/<YYYY-MM>/<h[:8]>_<name>
+- CLI: `python storage.py migrate` moves a flat DOWNLOAD_DIR (and its DB rows) into the store;
+  `python storage.py view` (re)builds the browsable view
+GAZA_STORAGE=flat keeps the old <h[:8]>_<name> files directly in DOWNLOAD_DIR.
+"""
+import os, time, argparse, tempfile, threading
+
+LAYOUT = os.environ.get("GAZA_STORAGE", "sharded")   # sharded | flat
+VIEW = os.environ.get("GAZA_STORAGE_VIEW", "")       # "" | symlink | hardlink
+OBJECTS = "objects"
+VIEW_DIR = "view"
+
+_view_ok = True
+_lock = threading.Lock()
+
+def _ext(name: str) -> str:
+    ext = os.path.splitext(name or "")[1].lower()
+    return ext if 1 < len(ext) <= 6 and ext[1:].isalnum() else ""
+
+def object_path(h: str, name: str, layout: str = None) -> str:
+    """Path of an image relative to DOWNLOAD_DIR. name only contributes its extension
+    (sharded) or the readable part of the file name (flat)."""
+    if (layout or LAYOUT) == "flat":
+        return f"{h[:8]}_{name}"
+    return os.path.join(OBJECTS, h[:2], h[2:4], h + _ext(name))
+
+def is_object_path(rel: str) -> bool:
+    return bool(rel) and rel.replace(os.sep, "/").startswith(OBJECTS + "/")
+
+def _hide_objects(root: str):
+    # with a view, keep Android's media scanner off objects/ so images aren't indexed twice
+    marker = os.path.join(root, OBJECTS, ".nomedia")
+    if not os.path.exists(marker):
+        os.makedirs(os.path.dirname(marker), exist_ok=True)
+        open(marker, "a").close()
+
+def _prepare(root: str, rel: str) -> str:
+    dst = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if VIEW and is_object_path(rel):
+        _hide_objects(root)
+    return dst
+
+def store_file(tmp_path: str, root: str, h: str, name: str) -> str:
+    """Atomically move a fully written temp file (same filesystem as root) to its
+    content address; returns the relative path. An existing object wins."""
+    rel = object_path(h, name)
+    dst = _prepare(root, rel)
+    if os.path.exists(dst):
+        os.remove(tmp_path)
+        return rel
+    os.chmod(tmp_path, 0o644)  # mkstemp creates 0600
+    os.replace(tmp_path, dst)
+    return rel
+
+def store_bytes(content: bytes, root: str, h: str, name: str) -> str:
+    """Write content via a temp file + fsync + rename; returns the relative path."""
+    fd, tmp = tempfile.mkstemp(prefix=".part-", dir=root)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+    except Exception:
+        os.remove(tmp)
+        raise
+    return store_file(tmp, root, h, name)
+
+def view_name(h: str, name: str) -> str:
+    return f"{h[:8]}_{name}"
+
+def link_view(root: str, rel: str, provider: str, name: str, when: float = None, mode: str = None) -> str:
+    """Link an object into view/<provider>/<YYYY-MM>/; returns the link's relative path or None.
+    Filesystems without links (Android shared storage) turn the view off with one warning."""
+    global _view_ok
+    mode = mode or VIEW
+    if not mode or not _view_ok or not is_object_path(rel):
+        return None
+    month = time.strftime("%Y-%m", time.localtime(when or time.time()))
+    link_dir = os.path.join(root, VIEW_DIR, provider or "web", month)
+    link = os.path.join(link_dir, name)
+    target = os.path.join(root, rel)
+    try:
+        os.makedirs(link_dir, exist_ok=True)
+        if os.path.lexists(link):
+            if os.path.realpath(link) == os.path.realpath(target) or (
+                    mode == "hardlink" and os.path.samefile(link, target)):
+                return os.path.relpath(link, root)
+            base, ext = os.path.splitext(name)
+            link = os.path.join(link_dir, f"{base}_{os.path.basename(rel)[8:16]}{ext}")
+            if os.path.lexists(link):
+                return os.path.relpath(link, root)
+        if mode == "hardlink":
+            os.link(target, link)
+        else:
+            os.symlink(os.path.relpath(target, link_dir), link)
+    except OSError as e:
+        with _lock:
+            if _view_ok:
+                _view_ok = False
+                print(f"[!] Storage view disabled ({mode} failed: {e})")
+        return None
+    return os.path.relpath(link, root)
+
+# -------- CLI --------
+
+def _readable_name(h: str, fn: str) -> str:
+    """'1a2b3c4d_photo.jpg' -> 'photo.jpg' for flat rows written by earlier versions."""
+    base = os.path.basename(fn)
+    return base[9:] if base.startswith(h[:8] + "_") else base
+
+def migrate(u, dry_run: bool = False, verify: bool = False, view: str = None) -> dict:
+    """Move flat files named in images.filename into the sharded store and update the rows."""
+    root = u.DOWNLOAD_DIR
+    counts = {"moved": 0, "already": 0, "missing": 0, "mismatch": 0, "linked": 0}
+    rows = u.db_query("SELECT hash, filename, provider, created_at FROM images WHERE filename IS NOT NULL")
+    if view and not dry_run:
+        _hide_objects(root)
+    for h, fn, prov, created in rows:
+        if is_object_path(fn):
+            counts["already"] += 1
+            continue
+        src = os.path.join(root, fn)
+        if not os.path.exists(src):
+            counts["missing"] += 1
+            continue
+        if verify and u.hash_file(src) != h:
+            print(f"[!] Hash mismatch, left in place: {fn}")
+            counts["mismatch"] += 1
+            continue
+        name = _readable_name(h, fn)
+        rel = object_path(h, name, layout="sharded")
+        counts["moved"] += 1
+        if dry_run:
+            print(f"[*] would move {fn} -> {rel}")
+            continue
+        dst = _prepare(root, rel)
+        if os.path.exists(dst):
+            os.remove(src)
+        else:
+            os.replace(src, dst)
+        u.db_writer().execute("UPDATE images SET filename=? WHERE hash=?", (rel, h))
+        if link_view(root, rel, prov, view_name(h, name), created, mode=view):
+            counts["linked"] += 1
+    u.db_writer().flush()
+    return counts
+
+def rebuild_view(u, mode: str) -> int:
+    linked = 0
+    for h, fn, url, prov, created in u.db_query(
+            "SELECT hash, filename, image_url, provider, created_at FROM images WHERE filename IS NOT NULL"):
+        if is_object_path(fn) and os.path.exists(os.path.join(u.DOWNLOAD_DIR, fn)):
+            if link_view(u.DOWNLOAD_DIR, fn, prov, view_name(h, u.image_basename(url or "")), created, mode=mode):
+                linked += 1
+    return linked
+
+def main():
+    ap = argparse.ArgumentParser(description="Content-addressed image store maintenance")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    m = sub.add_parser("migrate", help="move flat DOWNLOAD_DIR files into objects/ and update crawler.db")
+    m.add_argument("--dry-run", action="store_true")
+    m.add_argument("--verify", action="store_true", help="re-hash each file before moving it")
+    m.add_argument("--view", choices=("symlink", "hardlink"), default=VIEW or None, help="also link into view/")
+    v = sub.add_parser("view", help="(re)build view/<provider>/<YYYY-MM>/ links for stored images")
+    v.add_argument("--mode", choices=("symlink", "hardlink"), default=VIEW or "symlink")
+    args = ap.parse_args()
+    import utils_2 as u
+    if args.cmd == "migrate":
+        c = migrate(u, dry_run=args.dry_run, verify=args.verify, view=args.view)
+        print(f"[+] {'Would move' if args.dry_run else 'Moved'} {c['moved']} files; {c['already']} already sharded, "
+              f"{c['missing']} missing on disk, {c['mismatch']} hash mismatches, {c['linked']} view links")
+        left = [] if args.dry_run else [f for f in os.listdir(u.DOWNLOAD_DIR)
+                if os.path.isfile(os.path.join(u.DOWNLOAD_DIR, f)) and not f.startswith(".")]
+        if left:
+            print(f"[*] {len(left)} files in {u.DOWNLOAD_DIR} are not in crawler.db and were left alone")
+    else:
+        print(f"[+] Linked {rebuild_view(u, args.mode)} images into {os.path.join(u.DOWNLOAD_DIR, VIEW_DIR)}")
+
+if __name__ == "__main__":
+    main()
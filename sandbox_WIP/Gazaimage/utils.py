@@ -1,28 +1,15 @@
 # utils.py
-# Handles DB, deduplication, ETag checks, PDF parsing, provider tagging
-import os
-import sqlite3
-import hashlib
-import requests
-from datetime import datetime
-
-DB_PATH = os.path.join(os.path.dirname(__file__), 'scraper.db')
+# Old entry points kept for scripts that still import them. Everything lives
+# in crawler.db now (utils_2.py); scraper.db is folded in on first use.
+from utils_2 import migrate_legacy_db, hash_bytes, page_hash, record_page_visit, REVISIT_MAX
 
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('CREATE TABLE IF NOT EXISTS files (hash TEXT PRIMARY KEY, url TEXT, date TEXT)')
-    conn.commit()
-    conn.close()
+    migrate_legacy_db()
 
 def file_seen(url, content):
-    file_hash = hashlib.sha256(content).hexdigest()
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('SELECT 1 FROM files WHERE hash=?', (file_hash,))
-    exists = c.fetchone() is not None
-    if not exists:
-        c.execute('INSERT INTO files VALUES (?, ?, ?)', (file_hash, url, datetime.utcnow().isoformat()))
-    conn.commit()
-    conn.close()
-    return exists
+    """True if url was last seen with exactly this content; records it otherwise."""
+    file_hash = hash_bytes(content)
+    if page_hash(url) == file_hash:
+        return True
+    record_page_visit(url, file_hash, True, REVISIT_MAX)
+    return False
@@ -2,12 +2,28 @@
 """
 utils.py — shared helpers for Gaza High‑Res Imagery Scraper (v2)
 - Centralizes DB, dedupe, save, and metadata logic.
-- Adds HEAD-based skip via ETag/Last-Modified tracking.
+- DB in WAL mode; all writes go through one batching writer thread.
+- Adds conditional-GET skip via ETag/Last-Modified tracking.
+- Keep-alive session pool per domain.
 - Adds provider tagging and PDF image ingestion.
+- Near-duplicates (dHash within GAZA_PHASH_DISTANCE) are linked, not saved.
+- Per-domain request/byte/skip/timing stats saved to crawl_stats (see crawlstats.py).
+- Images stored content-addressed under DOWNLOAD_DIR/objects/ (see storage.py).
+- Schema set up once per SCHEMA_VERSION; utils.py's scraper.db is folded in by migrate_legacy_db().
 """
-import os, sqlite3, time, hashlib, mimetypes, tempfile, subprocess, glob
+import os, io, sqlite3, time, hashlib, zlib, mimetypes, tempfile, shutil, threading, queue, atexit, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from urllib.parse import urlparse
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
 import requests
+from requests.adapters import HTTPAdapter
+
+from dupes import dhash, BKTree
+from pdf_stage import timed_extract_large_images, die_with_parent
+from imgprobe import image_dimensions
+from crawlstats import CrawlStats, COLUMNS as STATS_COLUMNS
+from storage import store_bytes, store_file, link_view, view_name
 
 # -------- Config (override via env if desired) --------
 DOWNLOAD_DIR = os.environ.get("GAZA_SCRAPER_DIR", "/home/comrade/Pictures/scraper")
@@ -15,78 +31,776 @@ DB_PATH = os.environ.get("GAZA_SCRAPER_DB", os.path.join(os.path.dirname(__file_
 HEADERS = {"User-Agent": os.environ.get("GAZA_SCRAPER_UA", "Mozilla/5.0 (compatible; GazaImageBot/2.0; +contact@example.com)")}
 MIN_IMAGE_BYTES = int(os.environ.get("GAZA_MIN_BYTES", "80000"))  # ~80 KB default
 RATE_LIMIT_SECONDS = float(os.environ.get("GAZA_RATE_LIMIT", "2.0"))
+POOL_MAXSIZE = int(os.environ.get("GAZA_POOL_SIZE", "4"))  # keep-alive connections per domain
+DB_BATCH_SIZE = int(os.environ.get("GAZA_DB_BATCH", "200"))        # commit after this many writes ...
+DB_FLUSH_SECONDS = float(os.environ.get("GAZA_DB_FLUSH", "1.0"))   # ... or after this long
+# WAL needs all processes on one host; use DELETE for a DB on a network share
+DB_JOURNAL = os.environ.get("GAZA_DB_JOURNAL", "WAL")
+LEASE_SECONDS = int(os.environ.get("GAZA_LEASE_SECONDS", "600"))    # frontier lease before another worker may reclaim
+PHASH_DISTANCE = int(os.environ.get("GAZA_PHASH_DISTANCE", "6"))   # dHash bits; <0 disables near-dup check
+PHASH_MAX_PIXELS = int(os.environ.get("GAZA_PHASH_MAX_PIXELS", "24000000"))  # larger non-JPEGs skip the dHash
+ADAPTIVE_RATE = os.environ.get("GAZA_ADAPTIVE_RATE", "1") != "0"   # 0 = fixed GAZA_RATE_LIMIT per domain
+MIN_INTERVAL = float(os.environ.get("GAZA_MIN_INTERVAL", "0.5"))    # fastest pacing a healthy host earns
+MAX_INTERVAL = float(os.environ.get("GAZA_MAX_INTERVAL", "60"))     # slowest after repeated errors
+LATENCY_TARGET = float(os.environ.get("GAZA_LATENCY_TARGET", "2.0"))  # slower responses ease off
+MIN_WIDTH = int(os.environ.get("GAZA_MIN_WIDTH", "640"))           # pixel filter, read from file headers
+MIN_HEIGHT = int(os.environ.get("GAZA_MIN_HEIGHT", "480"))
+RANGE_PROBE = os.environ.get("GAZA_RANGE_PROBE", "1") != "0"       # Range-fetch headers before downloading
+PROBE_BYTES = int(os.environ.get("GAZA_PROBE_BYTES", "32768"))
+PDF_WORKERS = int(os.environ.get("GAZA_PDF_WORKERS", "2"))          # pdfimages process pool size
+PDF_MIN_PIXELS = int(os.environ.get("GAZA_PDF_MIN_PIXELS", "250000"))  # skip embedded images below w*h
+PDF_MIN_BYTES = int(os.environ.get("GAZA_PDF_MIN_BYTES", "0"))      # ... or below this stream size
+# per-page revisit interval: halves when a page changed, doubles when it didn't
+REVISIT_MIN = float(os.environ.get("GAZA_REVISIT_MIN_HOURS", "6")) * 3600
+REVISIT_MAX = float(os.environ.get("GAZA_REVISIT_MAX_HOURS", "720")) * 3600
+# image URLs fetched within this window are skipped without any request; 0 = always revalidate
+REVALIDATE_SECONDS = float(os.environ.get("GAZA_REVALIDATE_HOURS", "72")) * 3600
+# bump when a table, column or crawlstats.COLUMNS entry is added to _ensure_schema
+SCHEMA_VERSION = 5
+# utils.py's old DB (files: hash, url, date); folded into DB_PATH by migrate_legacy_db()
+LEGACY_DB_PATH = os.path.join(os.path.dirname(__file__), "scraper.db")
 
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
 # -------- DB setup --------
-_conn = sqlite3.connect(DB_PATH)
+def _connect(path: str = DB_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    conn.execute(f"PRAGMA journal_mode={DB_JOURNAL}")
+    conn.execute("PRAGMA synchronous=NORMAL")  # WAL + NORMAL: no fsync per commit
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+# Read connection, shared by worker threads behind _db_lock. Writes go
+# through the DBWriter thread below (WAL lets readers run alongside it).
+_conn = _connect()
+_db_lock = threading.RLock()
 _cur = _conn.cursor()
-_cur.execute("""CREATE TABLE IF NOT EXISTS seen_urls(
-    url TEXT PRIMARY KEY,
-    last_seen INTEGER,
-    last_status INTEGER,
-    error TEXT
-)""")
-_cur.execute("""CREATE TABLE IF NOT EXISTS images(
-    hash TEXT PRIMARY KEY,
-    filename TEXT,
-    image_url TEXT,
-    source_url TEXT,
-    provider TEXT,
-    downloaded INTEGER,
-    created_at INTEGER
-)""")
-_cur.execute("""CREATE TABLE IF NOT EXISTS resources(
-    url TEXT PRIMARY KEY,
-    etag TEXT,
-    last_modified TEXT,
-    content_length INTEGER,
-    last_checked INTEGER
-)""")
-# best-effort schema upgrade if older DB exists
-try:
-    _cur.execute("ALTER TABLE images ADD COLUMN image_url TEXT")
-except sqlite3.OperationalError:
-    pass
-try:
-    _cur.execute("ALTER TABLE images ADD COLUMN provider TEXT")
-except sqlite3.OperationalError:
-    pass
-try:
-    _cur.execute("ALTER TABLE images ADD COLUMN created_at INTEGER")
-except sqlite3.OperationalError:
-    pass
-_conn.commit()
+
+def _ensure_schema(cur) -> bool:
+    """Create tables and add missing columns, once per SCHEMA_VERSION (kept in PRAGMA
+    user_version) instead of on every import. Returns True if anything ran."""
+    if cur.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return False
+    cur.execute("""CREATE TABLE IF NOT EXISTS seen_urls(
+        url TEXT PRIMARY KEY,
+        last_seen INTEGER,
+        last_status INTEGER,
+        error TEXT
+    )""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS images(
+        hash TEXT PRIMARY KEY,
+        filename TEXT,
+        image_url TEXT,
+        source_url TEXT,
+        provider TEXT,
+        downloaded INTEGER,
+        created_at INTEGER
+    )""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS resources(
+        url TEXT PRIMARY KEY,
+        etag TEXT,
+        last_modified TEXT,
+        content_length INTEGER,
+        last_checked INTEGER
+    )""")
+    # crawl frontier: survives a killed run so the next start resumes from here
+    cur.execute("""CREATE TABLE IF NOT EXISTS frontier(
+        url TEXT PRIMARY KEY,
+        kind TEXT,
+        depth INTEGER,
+        referrer TEXT,
+        priority INTEGER DEFAULT 0,
+        state TEXT DEFAULT 'queued',
+        enqueued_at INTEGER
+    )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS frontier_state ON frontier(state, priority, depth)")
+    for col in ("lease_owner TEXT", "lease_until INTEGER", "domain_hash INTEGER"):
+        try:
+            cur.execute(f"ALTER TABLE frontier ADD COLUMN {col}")
+        except sqlite3.OperationalError:
+            pass
+    # images, PDFs and same-domain links of each parsed page: an unchanged page re-queues them
+    cur.execute("""CREATE TABLE IF NOT EXISTS page_targets(
+        parent TEXT,
+        kind TEXT,
+        child TEXT,
+        PRIMARY KEY(parent, child)
+    )""")
+    cur.execute("DROP TABLE IF EXISTS page_links")  # links only (schema 2), superseded by page_targets
+    # pages: body hash of the last 200 and the learned revisit interval (seconds)
+    for col in ("content_hash TEXT", "revisit_interval INTEGER", "last_changed INTEGER"):
+        try:
+            cur.execute(f"ALTER TABLE seen_urls ADD COLUMN {col}")
+        except sqlite3.OperationalError:
+            pass
+    # near-duplicates (by perceptual hash) that were linked instead of saved
+    cur.execute("""CREATE TABLE IF NOT EXISTS near_dupes(
+        hash TEXT PRIMARY KEY,
+        dup_of TEXT,
+        distance INTEGER,
+        image_url TEXT,
+        source_url TEXT,
+        created_at INTEGER
+    )""")
+    # smaller/alternate variants of an image we chose not to fetch
+    cur.execute("""CREATE TABLE IF NOT EXISTS image_aliases(
+        alias_url TEXT PRIMARY KEY,
+        image_url TEXT,
+        source_url TEXT,
+        created_at INTEGER
+    )""")
+    # learned request interval per domain (adaptive rate limiter)
+    cur.execute("""CREATE TABLE IF NOT EXISTS domain_rates(
+        domain TEXT PRIMARY KEY,
+        interval REAL,
+        updated_at INTEGER
+    )""")
+    # PDFs already run through pdfimages, by content hash
+    cur.execute("""CREATE TABLE IF NOT EXISTS pdf_cache(
+        hash TEXT PRIMARY KEY,
+        url TEXT,
+        images INTEGER,
+        processed_at INTEGER
+    )""")
+    # newest post id already processed per social account (incremental scrapes)
+    cur.execute("""CREATE TABLE IF NOT EXISTS social_cursors(
+        source TEXT,
+        account TEXT,
+        last_id INTEGER,
+        updated_at INTEGER,
+        PRIMARY KEY(source, account)
+    )""")
+    # Nitter mirror health (social_scrape_nitter.py): latency EWMA and failure streak
+    cur.execute("""CREATE TABLE IF NOT EXISTS nitter_mirrors(
+        base TEXT PRIMARY KEY,
+        latency REAL,
+        ok INTEGER DEFAULT 0,
+        fail INTEGER DEFAULT 0,
+        streak INTEGER DEFAULT 0,
+        last_ok INTEGER,
+        updated_at INTEGER
+    )""")
+    # per run + domain crawl instrumentation (crawlstats.py)
+    cur.execute(f"""CREATE TABLE IF NOT EXISTS crawl_stats(
+        run_id TEXT,
+        domain TEXT,
+        started_at INTEGER,
+        updated_at INTEGER,
+        {", ".join(c + " REAL DEFAULT 0" for c in STATS_COLUMNS)},
+        latency_hist TEXT,
+        PRIMARY KEY(run_id, domain)
+    )""")
+    for col in STATS_COLUMNS:  # counters added to crawlstats.COLUMNS after the table was created
+        try:
+            cur.execute(f"ALTER TABLE crawl_stats ADD COLUMN {col} REAL DEFAULT 0")
+        except sqlite3.OperationalError:
+            pass
+    # best-effort schema upgrade if older DB exists
+    try:
+        cur.execute("ALTER TABLE images ADD COLUMN image_url TEXT")
+    except sqlite3.OperationalError:
+        pass
+    try:
+        cur.execute("ALTER TABLE images ADD COLUMN provider TEXT")
+    except sqlite3.OperationalError:
+        pass
+    try:
+        cur.execute("ALTER TABLE images ADD COLUMN created_at INTEGER")
+    except sqlite3.OperationalError:
+        pass
+    try:
+        cur.execute("ALTER TABLE images ADD COLUMN phash TEXT")
+    except sqlite3.OperationalError:
+        pass
+    try:
+        cur.execute("ALTER TABLE images ADD COLUMN width INTEGER")
+    except sqlite3.OperationalError:
+        pass
+    try:
+        cur.execute("ALTER TABLE images ADD COLUMN height INTEGER")
+    except sqlite3.OperationalError:
+        pass
+    cur.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    return True
+
+if _ensure_schema(_cur):
+    _conn.commit()
+
+def _iso_to_epoch(value: str):
+    try:
+        return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+def migrate_legacy_db(path: str = LEGACY_DB_PATH) -> int:
+    """Fold utils.py's scraper.db into this DB once: each URL's newest `files` row becomes a
+    seen_urls row (content_hash = that hash) unless the URL is already known. The old file
+    is renamed to scraper.db.migrated. Returns the number of rows carried over."""
+    if not os.path.exists(path) or os.path.abspath(path) == os.path.abspath(DB_PATH):
+        return 0
+    old = sqlite3.connect(path)
+    try:
+        rows = old.execute("SELECT url, hash, MAX(date) FROM files WHERE url IS NOT NULL GROUP BY url").fetchall()
+    except sqlite3.OperationalError:
+        rows = []  # no files table: nothing to carry over
+    finally:
+        old.close()
+    rows = [(url, _iso_to_epoch(date), h) for url, h, date in rows]
+
+    def carry_over(conn):
+        conn.executemany("""INSERT OR IGNORE INTO seen_urls(url, last_seen, last_status, content_hash)
+                            VALUES (?,?,200,?)""", rows)
+        conn.commit()
+
+    db_writer().call(carry_over)
+    os.replace(path, path + ".migrated")
+    print(f"[+] Migrated {len(rows)} URLs from {os.path.basename(path)} into {os.path.basename(DB_PATH)}")
+    return len(rows)
+
+# -------- Single writer --------
+class DBWriter:
+    """One thread owns the write connection and commits in batches.
+
+    execute()/executemany() queue a write and return immediately; call()
+    runs fn(conn) on the writer thread and waits for its result, for
+    read-modify-write steps that must see queued writes. flush() blocks
+    until everything queued so far is committed. Safe from any thread.
+    A failed write is logged and skipped; if the thread itself dies, every
+    waiting and later call()/flush() raises instead of blocking.
+    """
+
+    def __init__(self, path: str = DB_PATH, batch_size: int = DB_BATCH_SIZE,
+                 flush_seconds: float = DB_FLUSH_SECONDS):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self._q = queue.Queue()
+        self._lock = threading.Lock()
+        self._dead = None  # the exception that stopped the thread
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        with self._lock:
+            if self._dead is not None:
+                raise RuntimeError(f"DB writer stopped: {self._dead!r}")
+            self._q.put(item)
+
+    def execute(self, sql: str, params=()):
+        self._put(("sql", sql, params))
+
+    def executemany(self, sql: str, rows):
+        self._put(("many", sql, list(rows)))
+
+    def call(self, fn):
+        done = threading.Event()
+        box = {}
+        self._put(("call", fn, (done, box)))
+        done.wait()
+        if "error" in box:
+            raise box["error"]
+        return box.get("result")
+
+    def flush(self):
+        self.call(lambda conn: conn.commit())
+
+    def close(self):
+        if self._thread.is_alive():
+            self._q.put(("stop", None, None))
+            self._thread.join()
+
+    def _run(self):
+        try:
+            self._loop()
+        except BaseException as e:
+            print(f"[!] DB writer stopped: {e!r}")
+            with self._lock:
+                self._dead = e
+            while True:  # nothing is queued after _dead is set; fail whoever is still waiting
+                try:
+                    kind, _, extra = self._q.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "call":
+                    done, box = extra
+                    box["error"] = RuntimeError(f"DB writer stopped: {e!r}")
+                    done.set()
+
+    def _loop(self):
+        conn = _connect(self.path)
+        pending = 0
+        last_commit = time.time()
+        while True:
+            timeout = max(0.0, self.flush_seconds - (time.time() - last_commit)) if pending else None
+            try:
+                kind, arg, extra = self._q.get(timeout=timeout)
+            except queue.Empty:
+                kind = None
+            if kind == "stop":
+                conn.commit()
+                conn.close()
+                return
+            try:
+                if kind == "sql":
+                    conn.execute(arg, extra)
+                    pending += 1
+                elif kind == "many":
+                    conn.executemany(arg, extra)
+                    pending += len(extra)
+                elif kind == "call":
+                    done, box = extra
+                    try:
+                        box["result"] = arg(conn)
+                    except Exception as e:
+                        box["error"] = e
+                    finally:
+                        done.set()
+                    pending += 1
+            except Exception as e:
+                print(f"[!] DB write failed: {e!r}")
+            if pending and (pending >= self.batch_size or time.time() - last_commit >= self.flush_seconds):
+                conn.commit()
+                pending = 0
+                last_commit = time.time()
+            elif not pending:
+                last_commit = time.time()
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def db_writer() -> DBWriter:
+    """The process-wide writer; started on first use, flushed at exit."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = DBWriter()
+            atexit.register(_writer.close)
+    return _writer
+
+# -------- Adaptive per-domain rate limiter --------
+def parse_retry_after(value: str):
+    """Seconds from a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class DomainLimiter:
+    """Per-domain request spacing that adapts (AIMD on the request rate).
+
+    Fast healthy responses add ~0.05 req/s to a host's rate, down to
+    MIN_INTERVAL between requests. Responses slower than LATENCY_TARGET
+    back off 1.25x. 429/503/5xx and network errors double the interval
+    (up to MAX_INTERVAL), and Retry-After blocks the host until it expires.
+    Learned intervals are stored in domain_rates so the next run starts
+    warm. With GAZA_ADAPTIVE_RATE=0 every host keeps RATE_LIMIT_SECONDS.
+    """
+
+    RATE_STEP = 0.05       # req/s added per healthy response
+    SLOW_FACTOR = 1.25
+    ERROR_FACTOR = 2.0
+
+    def __init__(self, base: float = RATE_LIMIT_SECONDS, adaptive: bool = ADAPTIVE_RATE):
+        self.base = base
+        self.adaptive = adaptive
+        self.interval = {}  # domain -> seconds between request starts
+        self.next_at = {}   # domain -> earliest next request start
+        self._lock = threading.Lock()
+        if adaptive:
+            db_writer()  # registered first so its atexit close runs after save()
+            for dom, iv in db_query("SELECT domain, interval FROM domain_rates"):
+                self.interval[dom] = min(MAX_INTERVAL, max(MIN_INTERVAL, iv))
+            atexit.register(self.save)
+
+    def _interval(self, dom: str) -> float:
+        return self.interval.get(dom, self.base) if self.adaptive else self.base
+
+    def next_time(self, dom: str) -> float:
+        with self._lock:
+            return self.next_at.get(dom, 0.0)
+
+    def reserve(self, dom: str) -> float:
+        """Claim the domain's next slot; returns its start time."""
+        with self._lock:
+            start = max(time.time(), self.next_at.get(dom, 0.0))
+            self.next_at[dom] = start + self._interval(dom)
+            return start
+
+    def wait(self, url: str):
+        """Sleep until this thread may hit the url's domain."""
+        delay = self.reserve(urlparse(url).netloc) - time.time()
+        if delay > 0:
+            time.sleep(delay)
+            crawl_stats().add(url, "sleep_s", delay)
+
+    def observe(self, dom: str, status: int, latency: float = None, retry_after: float = None):
+        if not self.adaptive:
+            return
+        with self._lock:
+            iv = self._interval(dom)
+            if status in (429, 503) or status >= 500:
+                iv *= self.ERROR_FACTOR
+            elif latency is not None and latency > LATENCY_TARGET:
+                iv *= self.SLOW_FACTOR
+            elif status < 400:
+                iv = 1.0 / (1.0 / iv + self.RATE_STEP)
+            iv = min(MAX_INTERVAL, max(MIN_INTERVAL, iv))
+            self.interval[dom] = iv
+            if retry_after:
+                self.next_at[dom] = max(self.next_at.get(dom, 0.0), time.time() + min(retry_after, 3600))
+
+    def save(self):
+        if not self.adaptive or not self.interval:
+            return
+        with self._lock:
+            rows = [(dom, iv, now_i()) for dom, iv in self.interval.items()]
+        db_writer().executemany("INSERT OR REPLACE INTO domain_rates(domain, interval, updated_at) VALUES (?,?,?)", rows)
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def domain_limiter() -> DomainLimiter:
+    """The process-wide limiter; learned rates are loaded on first use."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = DomainLimiter()
+    return _limiter
+
+def note_failure(url: str):
+    """Count a timeout/connection error against the url's domain."""
+    domain_limiter().observe(urlparse(url).netloc, 599)
+    crawl_stats().add(url, "errors")
+
+def _observe_response(r, *args, **kwargs):
+    domain_limiter().observe(urlparse(r.url).netloc, r.status_code, r.elapsed.total_seconds(),
+                             parse_retry_after(r.headers.get("Retry-After")))
+    crawl_stats().request(r.url, r.elapsed.total_seconds(), error=r.status_code >= 400)
+
+# -------- Crawl stats --------
+_stats = None
+_stats_lock = threading.Lock()
+
+def crawl_stats() -> CrawlStats:
+    """The process-wide stats for this run; saved at exit and by save_crawl_stats()."""
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            db_writer()  # registered first, so it is closed after the stats are saved
+            _stats = CrawlStats()
+            atexit.register(save_crawl_stats)
+    return _stats
+
+def save_crawl_stats():
+    rows = crawl_stats().rows()
+    if rows:
+        cols = ", ".join(STATS_COLUMNS)
+        marks = ",".join("?" * (len(STATS_COLUMNS) + 5))
+        db_writer().executemany(f"""INSERT OR REPLACE INTO crawl_stats(run_id, domain, started_at, updated_at, {cols}, latency_hist)
+                                    VALUES ({marks})""", rows)
+
+# -------- HTTP sessions --------
+_sessions = {}  # domain -> requests.Session
+_sessions_lock = threading.Lock()
+
+def http_session(url: str) -> requests.Session:
+    """Shared keep-alive session for the url's domain (reuses TCP+TLS connections)."""
+    dom = urlparse(url).netloc
+    with _sessions_lock:
+        s = _sessions.get(dom)
+        if s is None:
+            s = requests.Session()
+            s.headers.update(HEADERS)
+            s.hooks["response"].append(_observe_response)  # feeds the adaptive limiter
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _sessions[dom] = s
+    return s
 
 def now_i():
     return int(time.time())
 
+def db_query(sql: str, params=()):
+    """Read-only query on the shared read connection; returns all rows."""
+    with _db_lock:
+        return _conn.execute(sql, params).fetchall()
+
 def hash_bytes(b: bytes) -> str:
     return hashlib.sha256(b).hexdigest()
 
-def is_new_url(url: str) -> bool:
-    _cur.execute("SELECT 1 FROM seen_urls WHERE url=?", (url,))
-    return _cur.fetchone() is None
-
 def mark_url_seen(url: str, status: int = 200, error: str = None):
-    _cur.execute("INSERT OR REPLACE INTO seen_urls(url, last_seen, last_status, error) VALUES (?,?,?,?)",
-                 (url, now_i(), status, error))
-    _conn.commit()
+    # upsert, so a failed visit keeps the page's hash and revisit interval
+    db_writer().execute("""INSERT INTO seen_urls(url, last_seen, last_status, error) VALUES (?,?,?,?)
+                           ON CONFLICT(url) DO UPDATE SET last_seen=excluded.last_seen,
+                               last_status=excluded.last_status, error=excluded.error""",
+                        (url, now_i(), status, error))
+
+def page_due(url: str, default_interval: float) -> bool:
+    """True if a page was never fetched, last failed, or its revisit interval
+    (default_interval until one has been learned) has passed."""
+    with _db_lock:
+        _cur.execute("SELECT last_seen, last_status, revisit_interval FROM seen_urls WHERE url=?", (url,))
+        row = _cur.fetchone()
+    if row is None:
+        return True
+    last_seen, last_status, interval = row
+    return last_status != 200 or (last_seen or 0) + (interval or default_interval) <= now_i()
+
+def page_hash(url: str):
+    """Body hash stored by the last successful fetch of a page, or None."""
+    with _db_lock:
+        _cur.execute("SELECT content_hash FROM seen_urls WHERE url=?", (url,))
+        row = _cur.fetchone()
+    return row[0] if row else None
+
+def record_page_visit(url: str, content_hash: str, changed: bool, default_interval: float, validators=None):
+    """Mark a page fetched OK and adapt its revisit interval: halved (down to
+    REVISIT_MIN) when the body changed, doubled (up to REVISIT_MAX) when it
+    didn't. content_hash None (a 304) keeps the stored hash. validators
+    (etag, last_modified, length) are stored here too, so the next conditional
+    GET can only answer 304 once the page's targets have been queued."""
+    ts = now_i()
+    if validators and (validators[0] or validators[1]):
+        record_resource_head(url, *validators)
+    if changed:
+        update = "MAX(?, COALESCE(seen_urls.revisit_interval, ?) / 2)", REVISIT_MIN
+    else:
+        update = "MIN(?, COALESCE(seen_urls.revisit_interval, ?) * 2)", REVISIT_MAX
+    db_writer().execute(f"""INSERT INTO seen_urls(url, last_seen, last_status, error, content_hash, revisit_interval, last_changed)
+                            VALUES (?,?,200,NULL,?,?,?)
+                            ON CONFLICT(url) DO UPDATE SET last_seen=excluded.last_seen, last_status=200, error=NULL,
+                                content_hash=COALESCE(excluded.content_hash, seen_urls.content_hash),
+                                revisit_interval=CAST({update[0]} AS INTEGER),
+                                last_changed=CASE WHEN ? THEN excluded.last_changed ELSE seen_urls.last_changed END""",
+                        (url, ts, content_hash, int(default_interval), ts, int(update[1]), int(default_interval), int(changed)))
+
+def record_page_targets(url: str, targets):
+    """Replace the stored (kind, url) targets ("image", "pdf", "page") of a page that was just parsed."""
+    w = db_writer()
+    w.execute("DELETE FROM page_targets WHERE parent=?", (url,))
+    w.executemany("INSERT OR IGNORE INTO page_targets(parent, kind, child) VALUES (?,?,?)",
+                  [(url, kind, child) for kind, child in targets])
+
+def page_targets(url: str):
+    """(kind, url) targets stored by the last parse of a page, for when it comes back unchanged."""
+    return db_query("SELECT kind, child FROM page_targets WHERE parent=? ORDER BY rowid", (url,))
+
+_recent_hashes = set()  # saved by this process; may not be committed yet
 
 def image_already_saved(h: str) -> bool:
-    _cur.execute("SELECT 1 FROM images WHERE hash=?", (h,))
-    return _cur.fetchone() is not None
+    with _db_lock:
+        if h in _recent_hashes:
+            return True
+        _cur.execute("SELECT 1 FROM images WHERE hash=? UNION ALL SELECT 1 FROM near_dupes WHERE hash=?", (h, h))
+        return _cur.fetchone() is not None
+
+class KnownImages:
+    """In-memory map of image URL -> when it was last fetched or revalidated.
+
+    Loaded once from images/near_dupes (only rows inside the revalidation
+    window), so "already have this URL and it's fresh" costs no request.
+    Older entries fall through to the conditional probe in save_image_url.
+    """
+
+    def __init__(self, max_age: float = REVALIDATE_SECONDS):
+        self.max_age = max_age
+        self.checked = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if max_age <= 0:
+            return
+        since = now_i() - int(max_age)
+        with _db_lock:
+            rows = _conn.execute("""SELECT i.image_url, MAX(COALESCE(r.last_checked, 0), COALESCE(i.created_at, 0)) AS ts
+                                    FROM images i LEFT JOIN resources r ON r.url = i.image_url
+                                    WHERE i.image_url IS NOT NULL AND ts >= ?
+                                    UNION ALL
+                                    SELECT image_url, created_at FROM near_dupes
+                                    WHERE image_url IS NOT NULL AND created_at >= ?""", (since, since)).fetchall()
+        for url, ts in rows:
+            if ts > self.checked.get(url, 0):
+                self.checked[url] = ts
+
+    def fresh(self, url: str) -> bool:
+        with self._lock:
+            ok = self.max_age > 0 and self.checked.get(url, 0) >= now_i() - self.max_age
+            if ok:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return ok
+
+    def touch(self, url: str):
+        if self.max_age > 0:
+            with self._lock:
+                self.checked[url] = now_i()
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = 100.0 * self.hits / total if total else 0.0
+        return f"{self.hits} hits, {self.misses} misses ({rate:.0f}% skipped), {len(self.checked)} urls"
+
+_known = None
+
+def known_images() -> KnownImages:
+    """The process-wide known-image cache, loaded on first use."""
+    global _known
+    with _db_lock:
+        if _known is None:
+            _known = KnownImages()
+        return _known
+
+def record_image_aliases(image_url: str, aliases, referrer: str):
+    """Remember variants (srcset/lazy/og:image) that were skipped in favour of image_url."""
+    if aliases:
+        ts = now_i()
+        db_writer().executemany("INSERT OR REPLACE INTO image_aliases(alias_url, image_url, source_url, created_at) VALUES (?,?,?,?)",
+                                [(a, image_url, referrer, ts) for a in aliases])
 
 def record_resource_head(url: str, etag: str, last_mod: str, length: int):
-    _cur.execute("INSERT OR REPLACE INTO resources(url, etag, last_modified, content_length, last_checked) VALUES (?,?,?,?,?)",
-                 (url, etag, last_mod, length if length is not None else None, now_i()))
-    _conn.commit()
+    db_writer().execute("INSERT OR REPLACE INTO resources(url, etag, last_modified, content_length, last_checked) VALUES (?,?,?,?,?)",
+                        (url, etag, last_mod, length if length is not None else None, now_i()))
 
 def get_resource_head(url: str):
-    _cur.execute("SELECT etag, last_modified, content_length FROM resources WHERE url=?", (url,))
-    row = _cur.fetchone()
+    with _db_lock:
+        _cur.execute("SELECT etag, last_modified, content_length FROM resources WHERE url=?", (url,))
+        row = _cur.fetchone()
     return row if row else (None, None, None)
 
+def get_cursor(source: str, account: str):
+    """Newest post id processed for a social account, or None."""
+    with _db_lock:
+        _cur.execute("SELECT last_id FROM social_cursors WHERE source=? AND account=?", (source, account.lower()))
+        row = _cur.fetchone()
+    return row[0] if row else None
+
+def set_cursor(source: str, account: str, last_id: int):
+    db_writer().execute("INSERT OR REPLACE INTO social_cursors(source, account, last_id, updated_at) VALUES (?,?,?,?)",
+                        (source, account.lower(), int(last_id), now_i()))
+
+# -------- Frontier --------
+# Rows move queued -> running -> done. A running row carries a lease
+# (owner + expiry); rows whose lease expired, or that belong to a restarted
+# worker with the same id, are claimed again. Several crawler processes can
+# share one DB: each claims only the domains of its shard (domain_hash % n),
+# so per-host politeness stays with a single process.
+
+FRONTIER_ORDERS = {
+    "bfs": "depth DESC, rowid",
+    "priority": "priority DESC, depth DESC, rowid",
+}
+
+def domain_hash(url: str) -> int:
+    return zlib.crc32(urlparse(url).netloc.lower().encode())
+
+def frontier_resume(owner: str = None) -> int:
+    """Prepare the frontier for a run; returns the number of pending rows.
+    Rows leased by `owner` (this worker before a restart) are re-queued; a
+    finished previous run (nothing queued or leased) is cleared so seeds start fresh."""
+    def _resume(conn):
+        conn.execute("UPDATE frontier SET state='queued', lease_owner=NULL WHERE state='running' AND lease_owner IS ?",
+                     (owner,))
+        pending = conn.execute("SELECT COUNT(*) FROM frontier WHERE state IN ('queued', 'running')").fetchone()[0]
+        if not pending:
+            conn.execute("DELETE FROM frontier")
+        conn.commit()
+        return pending
+    return db_writer().call(_resume)
+
+def frontier_push(tasks):
+    """Queue (kind, url, depth, referrer, priority) tuples; known urls are ignored."""
+    ts = now_i()
+    db_writer().executemany("""INSERT OR IGNORE INTO frontier(url, kind, depth, referrer, priority, state, enqueued_at, domain_hash)
+                               VALUES (?,?,?,?,?,'queued',?,?)""",
+                            [(url, kind, depth, ref, prio, ts, domain_hash(url)) for kind, url, depth, ref, prio in tasks])
+
+def frontier_claim(limit: int, order: str = "bfs", owner: str = None, lease: int = LEASE_SECONDS,
+                   shard=(0, 1)):
+    """Lease up to limit claimable rows of this shard and return them as (kind, url, depth, referrer).
+    Runs on the writer thread so it sees pushes that are not committed yet; the
+    BEGIN IMMEDIATE keeps two processes from leasing the same rows."""
+    order_by = FRONTIER_ORDERS.get(order, FRONTIER_ORDERS["bfs"])
+    index, count = shard
+    def _claim(conn):
+        now = now_i()
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(f"""SELECT kind, url, depth, referrer FROM frontier
+                                    WHERE (state='queued' OR (state='running' AND lease_until < ?))
+                                      AND COALESCE(domain_hash, 0) % ? = ?
+                                    ORDER BY {order_by} LIMIT ?""", (now, count, index, limit)).fetchall()
+            conn.executemany("UPDATE frontier SET state='running', lease_owner=?, lease_until=? WHERE url=?",
+                             [(owner, now + lease, r[1]) for r in rows])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return rows
+    return db_writer().call(_claim)
+
+def frontier_renew(urls, owner: str = None, lease: int = LEASE_SECONDS):
+    """Extend this worker's leases on rows it still holds."""
+    until = now_i() + lease
+    db_writer().executemany("UPDATE frontier SET lease_until=? WHERE url=? AND state='running' AND lease_owner IS ?",
+                            [(until, u, owner) for u in urls])
+
+def frontier_leased_elsewhere(owner: str = None) -> int:
+    """Live leases held by other workers; their results may still add rows to our shard."""
+    def _count(conn):
+        return conn.execute("SELECT COUNT(*) FROM frontier WHERE state='running' AND lease_until >= ? AND lease_owner IS NOT ?",
+                            (now_i(), owner)).fetchone()[0]
+    return db_writer().call(_count)
+
+def frontier_done(url: str):
+    db_writer().execute("UPDATE frontier SET state='done', lease_owner=NULL, lease_until=NULL WHERE url=?", (url,))
+
+# -------- Perceptual near-dup index --------
+_phash_tree = None
+
+def _phash_index() -> BKTree:
+    """BK-tree of saved images' dHash, loaded from the DB on first use."""
+    global _phash_tree
+    with _db_lock:
+        if _phash_tree is None:
+            _phash_tree = BKTree()
+            for h, ph in _conn.execute("SELECT hash, phash FROM images WHERE phash IS NOT NULL"):
+                _phash_tree.add(ph, h)
+        return _phash_tree
+
+def find_near_duplicate(ph: str):
+    """(distance, sha256 of saved image) of the nearest match within PHASH_DISTANCE, or None."""
+    if not ph or PHASH_DISTANCE < 0:
+        return None
+    tree = _phash_index()
+    with _db_lock:
+        hits = tree.find(ph, PHASH_DISTANCE)
+    return (hits[0][0], hits[0][2]) if hits else None
+
+def _near_dup_hash(src, head: bytes, dims, image_url: str):
+    """dhash(src), or None when the image is a non-JPEG over PHASH_MAX_PIXELS:
+    Pillow only draft-decodes JPEG, anything else would be decoded at full size."""
+    if dims and dims[0] * dims[1] > PHASH_MAX_PIXELS and not head.startswith(b"\xff\xd8\xff"):
+        crawl_stats().add(image_url, "phash_skipped")
+        print(f"[*] {image_url} is {dims[0]}x{dims[1]}, near-duplicate check skipped")
+        return None
+    return dhash(src)
+
+def _link_near_duplicate(h: str, match, image_url: str, referrer: str):
+    dist, dup_of = match
+    db_writer().execute("""INSERT OR REPLACE INTO near_dupes(hash, dup_of, distance, image_url, source_url, created_at)
+                           VALUES (?,?,?,?,?,?)""", (h, dup_of, dist, image_url, referrer, now_i()))
+    crawl_stats().add(image_url, "skip_near_dup")
+    print(f"[=] Near-duplicate {image_url} (d={dist} of {dup_of[:8]}), not saved")
+
 def sanitize_filename(name: str) -> str:
     keep = "._-()[]{}"
     safe = "".join(ch if ch.isalnum() or ch in keep else "_" for ch in name)
@@ -118,86 +832,403 @@ def provider_from(referrer: str, img_url: str = "") -> str:
         return "AlJazeera"
     return "web"
 
+def image_basename(image_url: str, suggested_name: str = None) -> str:
+    """Sanitized readable name of an image: sets the stored object's extension and
+    the view/ link name (storage.py)."""
+    base = suggested_name or os.path.basename(urlparse(image_url).path) or "unnamed"
+    return sanitize_filename(base)
+
+def _record_image(h: str, fname: str, image_url: str, referrer: str, provider: str = None, phash: str = None,
+                  dims=None, name: str = None) -> str:
+    """DB row for a stored image (fname relative to DOWNLOAD_DIR), plus its view link if enabled."""
+    prov = provider or provider_from(referrer, image_url)
+    with _db_lock:
+        _recent_hashes.add(h)
+        if phash and PHASH_DISTANCE >= 0:
+            _phash_index().add(phash, h)
+    w, hgt = dims or (None, None)
+    db_writer().execute("""INSERT OR REPLACE INTO images(hash, filename, image_url, source_url, provider, downloaded, created_at, phash, width, height)
+                           VALUES (?,?,?,?,?,?,?,?,?,?)""",
+                        (h, fname, image_url, referrer, prov, 1, now_i(), phash, w, hgt))
+    link_view(DOWNLOAD_DIR, fname, prov, view_name(h, name or os.path.basename(fname)))
+    print(f"[+] Saved {image_url} as {fname} [{prov}]")
+    return prov
+
 def save_image_from_bytes(content: bytes, image_url: str, referrer: str, suggested_name: str = None, provider: str = None):
+    stats = crawl_stats()
     if not content or len(content) < MIN_IMAGE_BYTES:
+        stats.add(image_url, "skip_small")
+        return None
+    dims = image_dimensions(content[:PROBE_BYTES])
+    if too_few_pixels(dims):
+        stats.add(image_url, "skip_low_res")
         return None
     h = hash_bytes(content)
     if image_already_saved(h):
+        stats.add(image_url, "skip_dup_hash")
         return None
-    # filename
-    base = suggested_name or os.path.basename(urlparse(image_url).path) or "unnamed"
-    base = sanitize_filename(base)
-    # add extension if missing
-    if "." not in os.path.basename(base):
-        # best-effort: derive from URL or leave without ext
-        pass
-    fname = f"{h[:8]}_{base}"
+    ph = _near_dup_hash(io.BytesIO(content), content, dims, image_url)
+    match = find_near_duplicate(ph)
+    if match:
+        _link_near_duplicate(h, match, image_url, referrer)
+        return None
+    name = image_basename(image_url, suggested_name)
+    fname = store_bytes(content, DOWNLOAD_DIR, h, name)
     path = os.path.join(DOWNLOAD_DIR, fname)
-    with open(path, "wb") as f:
-        f.write(content)
-    prov = provider or provider_from(referrer, image_url)
-    _cur.execute("""INSERT OR REPLACE INTO images(hash, filename, image_url, source_url, provider, downloaded, created_at)
-                    VALUES (?,?,?,?,?,?,?)""",
-                 (h, fname, image_url, referrer, prov, 1, now_i()))
-    _conn.commit()
-    print(f"[+] Saved {image_url} as {fname} [{prov}]")
+    _record_image(h, fname, image_url, referrer, provider, phash=ph, dims=dims, name=name)
+    stats.add(image_url, "images_saved")
+    stats.add(image_url, "bytes_kept", len(content))
     return path
 
+IMAGE_MAGIC = (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n", b"GIF87a", b"GIF89a", b"II*\x00", b"MM\x00*", b"BM")
+STREAM_CHUNK = 64 * 1024
+
+def sniff_image(head: bytes) -> bool:
+    """Magic-byte check on the first bytes of a body (JPEG/PNG/GIF/TIFF/BMP/WebP/AVIF/HEIC)."""
+    if head.startswith(IMAGE_MAGIC):
+        return True
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return True
+    return head[4:8] == b"ftyp"
+
+def _finalize_image_file(tmp_path: str, h: str, size: int, image_url: str, referrer: str,
+                         suggested_name: str = None, provider: str = None, dims=None):
+    """Dedupe a fully written file, then rename it into the store (storage.py) or delete it."""
+    stats = crawl_stats()
+    try:
+        if size < MIN_IMAGE_BYTES:
+            stats.add(image_url, "skip_small")
+            return None
+        if image_already_saved(h):
+            stats.add(image_url, "skip_dup_hash")
+            return None
+        with open(tmp_path, "rb") as f:
+            head = f.read(PROBE_BYTES)
+        dims = dims or image_dimensions(head)
+        ph = _near_dup_hash(tmp_path, head, dims, image_url)
+        match = find_near_duplicate(ph)
+        if match:
+            _link_near_duplicate(h, match, image_url, referrer)
+            return None
+        name = image_basename(image_url, suggested_name)
+        fname = store_file(tmp_path, DOWNLOAD_DIR, h, name)
+        path = os.path.join(DOWNLOAD_DIR, fname)
+        tmp_path = None
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _record_image(h, fname, image_url, referrer, provider, phash=ph, dims=dims, name=name)
+    stats.add(image_url, "images_saved")
+    stats.add(image_url, "bytes_kept", size)
+    return path
+
+def too_few_pixels(dims) -> bool:
+    return bool(dims) and (dims[0] < MIN_WIDTH or dims[1] < MIN_HEIGHT)
+
+def save_image_from_response(resp, image_url: str, referrer: str, suggested_name: str = None, provider: str = None,
+                             dims=None):
+    """Streaming save: hash chunks while writing a temp file in DOWNLOAD_DIR,
+    then rename it into place or drop it after the dedupe check.
+
+    Aborts before reading the body when Content-Length is below MIN_IMAGE_BYTES,
+    and after the first PROBE_BYTES when they aren't an image or their header shows
+    fewer than MIN_WIDTH x MIN_HEIGHT pixels. Memory stays at PROBE_BYTES + one chunk.
+    """
+    stats = crawl_stats()
+    length = resp.headers.get("Content-Length")
+    if length and length.isdigit() and int(length) < MIN_IMAGE_BYTES:
+        stats.add(image_url, "skip_small")
+        return None
+
+    def rejected(head: bytes) -> bool:
+        nonlocal dims
+        dims = dims or image_dimensions(head)
+        if too_few_pixels(dims):
+            stats.add(image_url, "skip_low_res")
+            return True
+        return not sniff_image(head)
+
+    hasher = hashlib.sha256()
+    total = 0
+    head = b""  # held back until PROBE_BYTES: a short first chunk can end before the JPEG SOF marker
+    fd, tmp_path = tempfile.mkstemp(prefix=".part-", dir=DOWNLOAD_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in resp.iter_content(STREAM_CHUNK):
+                if not chunk:
+                    continue
+                stats.add(image_url, "bytes_down", len(chunk))
+                hasher.update(chunk)
+                total += len(chunk)
+                if head is not None:
+                    head += chunk
+                    if len(head) < PROBE_BYTES:
+                        continue
+                    chunk, head = head, None
+                    if rejected(chunk):
+                        os.remove(tmp_path)
+                        return None
+                f.write(chunk)
+            if head:  # the whole body was shorter than PROBE_BYTES
+                if rejected(head):
+                    os.remove(tmp_path)
+                    return None
+                f.write(head)
+            f.flush()
+            os.fsync(f.fileno())  # the rename into the store must not expose a half-written file
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return _finalize_image_file(tmp_path, hasher.hexdigest(), total, image_url, referrer, suggested_name, provider, dims)
+
+def hash_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def save_image_from_file(path: str, image_url: str, referrer: str, suggested_name: str = None, provider: str = None):
+    """Save a file already on disk (same filesystem as DOWNLOAD_DIR); it is moved or deleted."""
+    return _finalize_image_file(path, hash_file(path), os.path.getsize(path), image_url, referrer,
+                                suggested_name or os.path.basename(path), provider)
+
+def looks_like_image(ct: str, url: str) -> bool:
+    return "image" in (ct or "").lower() or any(k in url.lower() for k in (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".webp"))
+
+def conditional_headers(url: str) -> dict:
+    """If-None-Match/If-Modified-Since built from the resources table."""
+    etag, last_mod, _ = get_resource_head(url)
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_mod:
+        headers["If-Modified-Since"] = last_mod
+    return headers
+
+def _suggested_name(img_url: str, ct: str) -> str:
+    # choose reasonable extension if missing
+    ext = detect_ext_from_content_type(ct)
+    base = os.path.basename(urlparse(img_url).path)
+    if base and not os.path.splitext(base)[1]:
+        return base + ext  # CDN ids like /media/AbC?format=jpg
+    return base or ("download" + (ext or ""))
+
+def _validators(resp, length=None):
+    size = length if length is not None else resp.headers.get("Content-Length")
+    return resp.headers.get("ETag"), resp.headers.get("Last-Modified"), int(size) if size else None
+
+def _range_total(resp):
+    """Full size from 'Content-Range: bytes 0-32767/123456', or None."""
+    total = (resp.headers.get("Content-Range") or "").rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
 def save_image_url(img_url: str, referrer: str):
-    """Download using HEAD->(optional skip)->GET, then save+dedupe."""
+    """Conditional Range probe of the first PROBE_BYTES (304 -> skip; too small
+    or too few pixels -> skip), then a streamed GET and save+dedupe. The caller
+    paces the probe; the GET waits for its own domain limiter slot. Servers that
+    ignore Range answer 200 and that response is streamed directly. URLs
+    fetched within REVALIDATE_SECONDS return before any request."""
+    known = known_images()
+    stats = crawl_stats()
+    if known.fresh(img_url):
+        stats.add(img_url, "skip_known")
+        return
     try:
-        hr = requests.head(img_url, headers=HEADERS, timeout=15, allow_redirects=True)
-        if hr.status_code != 200:
-            return
-        ct = hr.headers.get("Content-Type", "") or ""
-        if "image" not in ct.lower() and not any(k in img_url.lower() for k in (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".webp")):
-            return
-        size = hr.headers.get("Content-Length")
-        etag = hr.headers.get("ETag")
-        last_mod = hr.headers.get("Last-Modified")
-        # HEAD skip if unchanged
-        prev_etag, prev_lm, prev_len = get_resource_head(img_url)
-        if etag and last_mod and prev_etag == etag and prev_lm == last_mod:
-            # unchanged since last time; skip fetching
-            record_resource_head(img_url, etag, last_mod, int(size) if size else None)
+        session = http_session(img_url)
+        headers = conditional_headers(img_url)
+        if RANGE_PROBE:
+            headers["Range"] = f"bytes=0-{PROBE_BYTES - 1}"
+        with session.get(img_url, headers=headers, timeout=30, stream=True) as pr:
+            if pr.status_code == 304:
+                stats.add(img_url, "skip_304")
+                # unchanged since last time; just refresh last_checked
+                record_resource_head(img_url, *get_resource_head(img_url))
+                known.touch(img_url)
+                return
+            if pr.status_code not in (200, 206):
+                return
+            ct = pr.headers.get("Content-Type", "") or ""
+            if not looks_like_image(ct, img_url):
+                return
+            suggested = _suggested_name(img_url, ct)
+            if pr.status_code == 200:
+                # no Range support (or probe disabled): this is the whole body
+                save_image_from_response(pr, img_url, referrer, suggested_name=suggested)
+                record_resource_head(img_url, *_validators(pr))
+                known.touch(img_url)
+                return
+            head = b""
+            for chunk in pr.iter_content(STREAM_CHUNK):
+                head += chunk
+                if len(head) >= PROBE_BYTES:
+                    break
+            stats.add(img_url, "bytes_down", len(head))
+            total = _range_total(pr)
+            validators = _validators(pr, total)
+        dims = image_dimensions(head)
+        if (total is not None and total < MIN_IMAGE_BYTES) or too_few_pixels(dims):
+            stats.add(img_url, "skip_low_res" if too_few_pixels(dims) else "skip_small")
+            # remember the validators so the next run gets a cheap 304
+            record_resource_head(img_url, *validators)
+            known.touch(img_url)
             return
-        gr = requests.get(img_url, headers=HEADERS, timeout=30)
-        if gr.status_code != 200:
-            return
-        # choose reasonable extension if missing
-        ext = detect_ext_from_content_type(ct)
-        suggested = os.path.basename(urlparse(img_url).path) or ("download" + (ext or ""))
-        save_image_from_bytes(gr.content, img_url, referrer, suggested_name=suggested)
-        # record resource head for next time
-        record_resource_head(img_url, etag, last_mod, int(size) if size else None)
+        if total is not None and total <= len(head):
+            save_image_from_bytes(head[:total], img_url, referrer, suggested_name=suggested)
+        else:
+            # a second request to the host: it needs its own limiter slot, like any other
+            domain_limiter().wait(img_url)
+            with session.get(img_url, timeout=30, stream=True) as gr:
+                if gr.status_code != 200:
+                    return
+                save_image_from_response(gr, img_url, referrer, suggested_name=suggested, dims=dims)
+                validators = _validators(gr)
+        # record validators for the next conditional GET
+        record_resource_head(img_url, *validators)
+        known.touch(img_url)
     except Exception as e:
+        note_failure(img_url)
         print(f"[!] Img fail {img_url}: {e}")
 
-def extract_images_from_pdf(pdf_bytes: bytes, referrer: str):
-    """Use pdfimages to extract embedded images and store them in DB. Returns count saved."""
-    saved = 0
-    with tempfile.TemporaryDirectory() as td:
-        pdf_path = os.path.join(td, "tmp.pdf")
-        with open(pdf_path, "wb") as f:
-            f.write(pdf_bytes)
-        # -all to keep original encodings; -p to include page numbers in names
+# -------- PDF pipeline --------
+# Download streams to a temp dir under DOWNLOAD_DIR, the pdf_cache table skips
+# PDFs whose hash was already processed, and pdfimages runs in a bounded
+# process pool (pdf_stage.extract_large_images) so big reports don't stall
+# the HTML crawl. Workers are spawned, not forked: forking copies the locks
+# held by the writer and session threads. Finished jobs are ingested on the
+# "pdf-ingest" thread, never on the pool's own result-handling thread.
+
+_pdf_pool = None
+_pdf_jobs = set()
+_pdf_lock = threading.Lock()
+_pdf_done = queue.Queue()  # (future, ingest callable) of finished background jobs
+_pdf_ingest_thread = None
+
+def _pdf_executor() -> ProcessPoolExecutor:
+    global _pdf_pool
+    with _pdf_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=max(1, PDF_WORKERS), initializer=die_with_parent,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+def _pdf_ingest_loop():
+    while True:
+        fut, ingest = _pdf_done.get()
         try:
-            subprocess.run(["pdfimages", "-all", "-p", pdf_path, os.path.join(td, "pdfimg")],
-                           check=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        except FileNotFoundError:
-            print("[!] pdfimages not found. Install poppler-utils.")
-            return 0
-        # Collect all extracted files
-        for fp in glob.glob(os.path.join(td, "pdfimg*")):
+            ingest(fut)
+        except Exception as e:
+            print(f"[!] PDF ingest failed: {e}")
+        finally:
+            with _pdf_lock:
+                _pdf_jobs.discard(fut)
+
+def _start_pdf_ingest():
+    global _pdf_ingest_thread
+    with _pdf_lock:
+        if _pdf_ingest_thread is None:
+            _pdf_ingest_thread = threading.Thread(target=_pdf_ingest_loop, name="pdf-ingest", daemon=True)
+            _pdf_ingest_thread.start()
+
+def pdf_already_processed(pdf_hash: str) -> bool:
+    with _db_lock:
+        _cur.execute("SELECT 1 FROM pdf_cache WHERE hash=?", (pdf_hash,))
+        return _cur.fetchone() is not None
+
+def _ingest_pdf_images(paths, work_dir: str, pdf_url: str, pdf_hash: str, referrer: str, validators):
+    saved = 0
+    try:
+        for fp in paths:
             try:
-                with open(fp, "rb") as imf:
-                    content = imf.read()
-                    prior = image_already_saved(hash_bytes(content))
-                    if prior:
-                        continue
-                    res = save_image_from_bytes(content, image_url=f"{referrer}#pdf", referrer=referrer, suggested_name=os.path.basename(fp), provider="pdf")
-                    if res:
-                        saved += 1
+                if save_image_from_file(fp, image_url=f"{referrer}#pdf", referrer=referrer, provider="pdf"):
+                    saved += 1
             except Exception as exc:
                 print(f"[!] Failed to ingest {fp}: {exc}")
+        db_writer().execute("INSERT OR REPLACE INTO pdf_cache(hash, url, images, processed_at) VALUES (?,?,?,?)",
+                            (pdf_hash, pdf_url, saved, now_i()))
+        if validators:
+            record_resource_head(pdf_url, *validators)
+        if saved:
+            print(f"[+] Extracted {saved} images from PDF: {pdf_url}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
     return saved
+
+def submit_pdf(pdf_path: str, pdf_url: str, pdf_hash: str, referrer: str, validators=None, wait: bool = True):
+    """Extract a downloaded PDF (inside its own work dir) in the process pool.
+    With wait=False the images are ingested when the job finishes; see wait_pdf_jobs()."""
+    work_dir = os.path.dirname(pdf_path)
+    fut = _pdf_executor().submit(timed_extract_large_images, pdf_path, work_dir, PDF_MIN_PIXELS, PDF_MIN_BYTES)
+
+    def _done(f):
+        try:
+            paths, seconds = f.result()
+            crawl_stats().add(pdf_url, "pdf_s", seconds)
+        except Exception as e:
+            print(f"[!] PDF extraction failed {pdf_url}: {e}")
+            shutil.rmtree(work_dir, ignore_errors=True)
+            return 0
+        if paths is None:
+            print("[!] pdfimages not found. Install poppler-utils.")
+            shutil.rmtree(work_dir, ignore_errors=True)
+            return 0
+        return _ingest_pdf_images(paths, work_dir, pdf_url, pdf_hash, referrer, validators)
+
+    if wait:
+        return _done(fut)
+    _start_pdf_ingest()
+    with _pdf_lock:
+        _pdf_jobs.add(fut)
+    # the callback runs on the pool's management thread: hand off, don't ingest there
+    fut.add_done_callback(lambda f: _pdf_done.put((f, _done)))
+    return None
+
+def wait_pdf_jobs():
+    """Block until background PDF jobs are extracted and ingested."""
+    while True:
+        with _pdf_lock:
+            jobs = list(_pdf_jobs)
+        if not jobs:
+            return
+        for f in jobs:
+            try:
+                f.result()
+            except Exception:
+                pass
+        time.sleep(0.05)  # let the pdf-ingest thread catch up
+
+def ingest_pdf_response(resp, pdf_url: str, referrer: str, wait: bool = True):
+    """Stream a PDF response to disk and queue its extraction; unchanged PDFs
+    (same content hash as a processed one) are skipped without running pdfimages."""
+    work_dir = tempfile.mkdtemp(prefix=".pdf-", dir=DOWNLOAD_DIR)
+    pdf_path = os.path.join(work_dir, "doc.pdf")
+    hasher = hashlib.sha256()
+    total = 0
+    try:
+        with open(pdf_path, "wb") as f:
+            for chunk in resp.iter_content(STREAM_CHUNK):
+                hasher.update(chunk)
+                f.write(chunk)
+                total += len(chunk)
+    except Exception:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+    pdf_hash = hasher.hexdigest()
+    crawl_stats().add(pdf_url, "bytes_down", total)
+    length = resp.headers.get("Content-Length")
+    validators = (resp.headers.get("ETag"), resp.headers.get("Last-Modified"), int(length) if length and length.isdigit() else None)
+    if total <= 1024 or pdf_already_processed(pdf_hash):
+        if total > 1024:
+            crawl_stats().add(pdf_url, "skip_dup_hash")
+            record_resource_head(pdf_url, *validators)  # next time a 304, not another download
+        shutil.rmtree(work_dir, ignore_errors=True)
+        return 0
+    return submit_pdf(pdf_path, pdf_url, pdf_hash, referrer, validators=validators, wait=wait)
+
+def extract_images_from_pdf(pdf_bytes: bytes, referrer: str):
+    """Use pdfimages to extract embedded images and store them in DB. Returns count saved."""
+    work_dir = tempfile.mkdtemp(prefix=".pdf-", dir=DOWNLOAD_DIR)
+    pdf_path = os.path.join(work_dir, "doc.pdf")
+    with open(pdf_path, "wb") as f:
+        f.write(pdf_bytes)
+    return submit_pdf(pdf_path, f"{referrer}#pdf", hash_bytes(pdf_bytes), referrer) or 0
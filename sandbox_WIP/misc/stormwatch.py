@@ -1,9 +1,28 @@
 #!/usr/bin/env python3
 # StormWatch (Termux) — CAPE/Shear/LI + DWD thunderstorm polygons = Action ping
+# Model data: batched Open-Meteo requests, cached per GFS run in ~/.cache/stormwatch;
+# the DWD feed is fetched alongside. Warning areas are looked up through a grid index
+# (NumPy-vectorized if installed). Benchmarks: python stormwatch_bench.py fetch|poly|watch
+# Usage: python stormwatch.py                 one-shot report
+#        python stormwatch.py --watch [--notify] [--dwd-every 300] [--model-every 900]
+#   --watch keeps everything in memory, recomputes only locations touched by changed
+#   warnings or a new model run, and pings only when a location's state changes
 
-import requests
+import os
+import json
 import math
-from typing import List, Tuple, Dict, Any
+import time
+import shutil
+import argparse
+import subprocess
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple, Dict, Any, Optional
+try:
+    import numpy as np  # optional: vectorized warning-area tests for many locations
+except ImportError:
+    np = None
 
 # ---------------- CONFIG ----------------
 LOCATIONS = [
@@ -17,10 +36,29 @@ CAPE_THRESHOLD = 1500           # J/kg
 SHEAR_THRESHOLD = 20            # m/s (approx from 1km vs 6km wind)
 LI_THRESHOLD = -4               # Lifted Index
 NEAR_POLY_BUFFER_KM = 25        # count as “in polygon” if within this distance
+GRID_DEG = 0.5                  # warning index cell size (degrees)
+VECTOR_MIN_POINTS = 16          # use NumPy from this many locations on (if installed)
 
 # DWD warnings JSON (official public feed used by the WarnWetter app)
 DWD_WARN_URL = "https://www.dwd.de/DWD/warnungen/warnapp/json/warnings.json"
 
+# GFS via Open-Meteo; several coordinates go into one request (comma-separated lists)
+MODEL_URL = "https://api.open-meteo.com/v1/gfs"
+MODEL_BATCH = 25                # locations per request
+MODEL_WORKERS = 4               # requests in flight (plus one for the DWD feed)
+HTTP_TIMEOUT = 20
+# GFS runs every 6 h (00/06/12/18 UTC) and shows up on Open-Meteo ~4 h later;
+# cached model data is reused until the next run should be out
+MODEL_CYCLE_HOURS = 6
+MODEL_DELAY_HOURS = 4
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "stormwatch")
+
+# --watch: poll intervals (seconds, overridable on the command line); the DWD feed is
+# fetched conditionally (ETag / If-Modified-Since), model data once per GFS run
+DWD_POLL_SECONDS = 300
+MODEL_POLL_SECONDS = 900
+NOTIFY_CMD = "termux-notification"  # --notify (Termux:API)
+
 # ---------------- UTIL ----------------
 def haversine_km(lat1, lon1, lat2, lon2) -> float:
     R = 6371.0
@@ -45,28 +83,72 @@ def point_in_poly(lat: float, lon: float, poly: List[Tuple[float, float]]) -> bo
                 inside = not inside
     return inside
 
+KM_PER_DEG = 111.195
+
 def min_dist_to_poly_km(lat: float, lon: float, poly: List[Tuple[float, float]]) -> float:
-    # crude but fast: distance to vertices; cheap fallback for buffer logic
-    return min(haversine_km(lat, lon, p[0], p[1]) for p in poly)
+    # distance to the nearest edge (not just vertex), in a local equirectangular
+    # projection around the point; plenty accurate at buffer distances
+    kx = KM_PER_DEG * math.cos(math.radians(lat))
+    best = math.inf
+    for i in range(len(poly)):
+        ax, ay = (poly[i-1][1] - lon) * kx, (poly[i-1][0] - lat) * KM_PER_DEG
+        bx, by = (poly[i][1] - lon) * kx, (poly[i][0] - lat) * KM_PER_DEG
+        dx, dy = bx - ax, by - ay
+        seg2 = dx * dx + dy * dy
+        t = 0.0 if seg2 == 0 else min(1.0, max(0.0, -(ax * dx + ay * dy) / seg2))
+        best = min(best, math.hypot(ax + t * dx, ay + t * dy))
+    return best
 
 # ---------------- DATA FETCH ----------------
-def get_model_data(lat: float, lon: float):
-    # GFS via Open-Meteo — no API key, hourly CAPE, LI, winds at ~1km/6km to estimate deep-layer shear
-    url = (
-        "https://api.open-meteo.com/v1/gfs"
-        f"?latitude={lat}&longitude={lon}"
-        "&hourly=cape,wind_speed_6000m,wind_speed_1000m,lifted_index"
-        "&forecast_days=1"
-    )
-    r = requests.get(url, timeout=20)
-    if r.status_code != 200:
-        return None
-    data = r.json()
+_session = requests.Session()
+_session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=MODEL_WORKERS + 1))
+_session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=MODEL_WORKERS + 1))
+
+def model_run(now: Optional[datetime] = None) -> str:
+    """Newest GFS cycle that should be on Open-Meteo by now, e.g. '2025081206'."""
+    now = now or datetime.now(timezone.utc)
+    ready = now - timedelta(hours=MODEL_DELAY_HOURS)
+    run = ready.replace(hour=ready.hour - ready.hour % MODEL_CYCLE_HOURS, minute=0, second=0, microsecond=0)
+    return run.strftime("%Y%m%d%H")
+
+def _coord_key(lat: float, lon: float) -> str:
+    return f"{lat:.4f},{lon:.4f}"
+
+def _cache_path(run: str, day: str) -> Optional[str]:
+    # forecast_days=1 is "today (UTC)", so the day is part of the key too
+    return os.path.join(CACHE_DIR, f"gfs-{run}-{day}.json") if CACHE_DIR else None
+
+def load_model_cache(path: Optional[str]) -> Dict[str, Any]:
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_model_cache(path: Optional[str], points: Dict[str, Any]):
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(points, f)
+    os.replace(tmp, path)
+    for name in os.listdir(CACHE_DIR):  # older runs are never read again
+        if name.startswith("gfs-") and os.path.join(CACHE_DIR, name) != path:
+            try:
+                os.remove(os.path.join(CACHE_DIR, name))
+            except OSError:
+                pass
+
+def summarize_model(hourly: Dict[str, Any]):
+    """(max CAPE, max 1-6 km shear, min LI) from Open-Meteo hourly arrays, or "missing"."""
     try:
-        cape_vals = [c for c in data["hourly"]["cape"] if c is not None]
-        li_vals = [li for li in data["hourly"]["lifted_index"] if li is not None]
-        w6 = data["hourly"]["wind_speed_6000m"]
-        w1 = data["hourly"]["wind_speed_1000m"]
+        cape_vals = [c for c in hourly["cape"] if c is not None]
+        li_vals = [li for li in hourly["lifted_index"] if li is not None]
+        w6 = hourly["wind_speed_6000m"]
+        w1 = hourly["wind_speed_1000m"]
         shear_vals = [abs(a - b) for a, b in zip(w6, w1) if a is not None and b is not None]
         if not cape_vals or not li_vals or not shear_vals:
             return "missing"
@@ -74,9 +156,69 @@ def get_model_data(lat: float, lon: float):
         shear = max(shear_vals)
         li = min(li_vals)
         return cape, shear, li
-    except KeyError:
+    except (KeyError, TypeError):
         return "missing"
 
+def _fetch_model_batch(coords: List[Tuple[float, float]]) -> List[Optional[Dict[str, Any]]]:
+    """Hourly arrays for each (lat, lon), in order; None for all on an HTTP error."""
+    params = {
+        "latitude": ",".join(f"{lat}" for lat, _ in coords),
+        "longitude": ",".join(f"{lon}" for _, lon in coords),
+        "hourly": "cape,wind_speed_6000m,wind_speed_1000m,lifted_index",
+        "forecast_days": 1,
+    }
+    r = _session.get(MODEL_URL, params=params, timeout=HTTP_TIMEOUT)
+    if r.status_code != 200:
+        return [None] * len(coords)
+    data = r.json()
+    if isinstance(data, dict):
+        data = [data]  # a single coordinate comes back as one object, not a list
+    return [(d or {}).get("hourly") or {} for d in data] + [None] * (len(coords) - len(data))
+
+def get_model_data_batch(coords: List[Tuple[float, float]], pool: Optional[ThreadPoolExecutor] = None,
+                         stats: Optional[Dict[str, int]] = None) -> List[Any]:
+    """get_model_data for many points: cached points are not fetched again for the same
+    model run; the rest go out MODEL_BATCH per request, MODEL_WORKERS requests at once."""
+    now = datetime.now(timezone.utc)
+    path = _cache_path(model_run(now), now.strftime("%Y%m%d"))
+    cache = load_model_cache(path)
+    missing = []
+    for lat, lon in coords:
+        key = _coord_key(lat, lon)
+        if key not in cache and key not in missing:
+            missing.append(key)
+    batches = [missing[i:i + MODEL_BATCH] for i in range(0, len(missing), MODEL_BATCH)]
+    if batches:
+        own = pool is None
+        pool = pool or ThreadPoolExecutor(max_workers=MODEL_WORKERS)
+        try:
+            jobs = [(b, pool.submit(_fetch_model_batch, [tuple(map(float, k.split(","))) for k in b])) for b in batches]
+            for keys, job in jobs:
+                try:
+                    hourly = job.result()
+                except (requests.RequestException, ValueError) as e:
+                    print(f"⚠️ Model request failed ({len(keys)} locations): {e}")
+                    continue
+                for key, h in zip(keys, hourly):
+                    if h is not None:
+                        cache[key] = h
+        finally:
+            if own:
+                pool.shutdown()
+        save_model_cache(path, cache)
+    if stats is not None:
+        stats["requests"] = stats.get("requests", 0) + len(batches)
+        stats["cached"] = stats.get("cached", 0) + len(coords) - len(missing)
+    out = []
+    for lat, lon in coords:
+        h = cache.get(_coord_key(lat, lon))
+        out.append(None if h is None else summarize_model(h))
+    return out
+
+def get_model_data(lat: float, lon: float):
+    # GFS via Open-Meteo — no API key, hourly CAPE, LI, winds at ~1km/6km to estimate deep-layer shear
+    return get_model_data_batch([(lat, lon)])[0]
+
 def fetch_dwd_warning_polygons() -> List[Dict[str, Any]]:
     """
     Returns a list of thunderstorm warning areas:
@@ -88,11 +230,31 @@ def fetch_dwd_warning_polygons() -> List[Dict[str, Any]]:
       }, ...
     ]
     """
-    r = requests.get(DWD_WARN_URL, timeout=20)
+    r = _session.get(DWD_WARN_URL, timeout=HTTP_TIMEOUT)
     if r.status_code != 200:
         return []
+    return parse_dwd_warnings(r.text)
 
-    data = r.json()
+def fetch_dwd_if_changed(etag: Optional[str] = None, modified: Optional[str] = None):
+    """Conditional GET of the DWD feed: (areas, ETag, Last-Modified), with areas None
+    when the feed is unchanged since the given validators (304, no body sent)."""
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if modified:
+        headers["If-Modified-Since"] = modified
+    r = _session.get(DWD_WARN_URL, headers=headers, timeout=HTTP_TIMEOUT)
+    if r.status_code == 304:
+        return None, etag, modified
+    r.raise_for_status()
+    return parse_dwd_warnings(r.text), r.headers.get("ETag"), r.headers.get("Last-Modified")
+
+def parse_dwd_warnings(text: str) -> List[Dict[str, Any]]:
+    """Thunderstorm areas (see fetch_dwd_warning_polygons) from the feed body."""
+    text = text.strip()
+    if text.startswith("warnWetter.loadWarnings("):  # the app feed is JSONP
+        text = text[len("warnWetter.loadWarnings("):].rstrip(");")
+    data = json.loads(text)
     areas = []
     # The JSON is split by state keys, then have "warnings" lists
     for state_key, state_payload in data.items():
@@ -152,6 +314,102 @@ def fetch_dwd_warning_polygons() -> List[Dict[str, Any]]:
     return areas
 
 # ---------------- LOGIC ----------------
+class WarnIndex:
+    """Warning areas prepared once per feed for many lookups.
+
+    Each polygon gets a bounding box grown by the buffer, registered in a
+    GRID_DEG grid, so a location only tests the few polygons near it. With
+    NumPy, lookup_many() instead runs ray casting and point-to-edge distance
+    for all locations in a box at once, highest warning level first.
+    Results match location_in_warn_area().
+    """
+
+    CHUNK = 1 << 20  # points x edges per NumPy step (bounds temporary arrays)
+
+    def __init__(self, areas: List[Dict[str, Any]], buffer_km: float = NEAR_POLY_BUFFER_KM):
+        self.areas = areas
+        self.buffer_km = buffer_km
+        self.boxes = []  # (lat_min, lat_max, lon_min, lon_max) incl. buffer
+        self.grid = {}   # (row, col) -> polygon ids, in feed order
+        dlat = buffer_km / KM_PER_DEG
+        for i, a in enumerate(areas):
+            lats = [p[0] for p in a["poly"]]
+            lons = [p[1] for p in a["poly"]]
+            far = min(89.0, max(abs(min(lats)), abs(max(lats))) + dlat)
+            dlon = buffer_km / (KM_PER_DEG * math.cos(math.radians(far)))
+            box = (min(lats) - dlat, max(lats) + dlat, min(lons) - dlon, max(lons) + dlon)
+            self.boxes.append(box)
+            for row in range(math.floor(box[0] / GRID_DEG), math.floor(box[1] / GRID_DEG) + 1):
+                for col in range(math.floor(box[2] / GRID_DEG), math.floor(box[3] / GRID_DEG) + 1):
+                    self.grid.setdefault((row, col), []).append(i)
+        if np is not None:
+            # edge i runs from vertex i-1 to vertex i, as in point_in_poly
+            self._edges = []
+            for a in areas:
+                v = np.asarray(a["poly"], dtype=float)
+                self._edges.append((np.roll(v[:, 0], 1), np.roll(v[:, 1], 1), v[:, 0], v[:, 1]))
+            self._box_arr = np.asarray(self.boxes, dtype=float).reshape(-1, 4)
+            self._order = sorted(range(len(areas)), key=lambda i: -areas[i]["level"])
+
+    def lookup(self, lat: float, lon: float) -> Tuple[bool, int, str]:
+        best = (False, 0, "")
+        for i in self.grid.get((math.floor(lat / GRID_DEG), math.floor(lon / GRID_DEG)), ()):
+            a = self.areas[i]
+            b = self.boxes[i]
+            if a["level"] <= best[1] or not (b[0] <= lat <= b[1] and b[2] <= lon <= b[3]):
+                continue
+            if point_in_poly(lat, lon, a["poly"]) or min_dist_to_poly_km(lat, lon, a["poly"]) <= self.buffer_km:
+                best = (True, a["level"], a["regionName"])
+        return best
+
+    def near(self, lat: float, lon: float) -> bool:
+        """True if (lat, lon) lies in the buffered bounding box of any area, i.e. one
+        of them could cover it."""
+        for i in self.grid.get((math.floor(lat / GRID_DEG), math.floor(lon / GRID_DEG)), ()):
+            b = self.boxes[i]
+            if b[0] <= lat <= b[1] and b[2] <= lon <= b[3]:
+                return True
+        return False
+
+    def lookup_many(self, coords: List[Tuple[float, float]]) -> List[Tuple[bool, int, str]]:
+        """lookup() for every (lat, lon)."""
+        if np is None or len(coords) < VECTOR_MIN_POINTS or not self.areas:
+            return [self.lookup(lat, lon) for lat, lon in coords]
+        pts = np.asarray(coords, dtype=float).reshape(-1, 2)
+        lat, lon = pts[:, 0], pts[:, 1]
+        kx = KM_PER_DEG * np.cos(np.radians(lat))
+        level = np.zeros(len(pts), dtype=int)
+        owner = np.full(len(pts), -1)
+        for i in self._order:
+            lvl = self.areas[i]["level"]
+            b = self._box_arr[i]
+            idx = np.nonzero((level < lvl) & (lat >= b[0]) & (lat <= b[1]) & (lon >= b[2]) & (lon <= b[3]))[0]
+            step = max(1, self.CHUNK // len(self._edges[i][0]))
+            for s in range(0, len(idx), step):
+                sel = idx[s:s + step]
+                hit = sel[self._covered(i, lat[sel], lon[sel], kx[sel])]
+                level[hit] = lvl
+                owner[hit] = i
+        return [(True, int(level[k]), self.areas[owner[k]]["regionName"]) if owner[k] >= 0 else (False, 0, "")
+                for k in range(len(pts))]
+
+    def _covered(self, i: int, lat, lon, kx):
+        """Boolean array: inside polygon i or within the buffer of its outline."""
+        y1, x1, y2, x2 = self._edges[i]
+        Y, X = lat[:, None], lon[:, None]
+        dy = y2 - y1
+        xin = (x2 - x1) * (Y - y1) / np.where(dy != 0, dy, 1e-12) + x1
+        inside = np.count_nonzero(((y1 > Y) != (y2 > Y)) & (X < xin), axis=1) % 2 == 1
+        out = ~inside
+        if out.any():
+            K, Yo, Xo = kx[out][:, None], Y[out], X[out]
+            ax, ay = (x1 - Xo) * K, (y1 - Yo) * KM_PER_DEG
+            ex, ey = (x2 - Xo) * K - ax, (y2 - Yo) * KM_PER_DEG - ay
+            seg2 = ex * ex + ey * ey
+            t = np.clip(-(ax * ex + ay * ey) / np.where(seg2 > 0, seg2, 1.0), 0.0, 1.0)
+            inside[out] = np.hypot(ax + t * ex, ay + t * ey).min(axis=1) <= self.buffer_km
+        return inside
+
 def location_in_warn_area(lat: float, lon: float, areas: List[Dict[str, Any]]) -> Tuple[bool, int, str]:
     """
     Return (covered, level, regionName) — covered True if inside or within NEAR_POLY_BUFFER_KM.
@@ -170,44 +428,224 @@ def location_in_warn_area(lat: float, lon: float, areas: List[Dict[str, Any]]) -
                     best = (True, a["level"], a["regionName"])
     return best
 
+def fetch_all(locations: List[Dict[str, Any]], stats: Optional[Dict[str, int]] = None):
+    """(model result per location, DWD warning areas); the DWD feed and the model
+    batches are fetched at the same time."""
+    with ThreadPoolExecutor(max_workers=MODEL_WORKERS + 1) as pool:
+        dwd = pool.submit(fetch_dwd_warning_polygons)
+        models = get_model_data_batch([(loc["lat"], loc["lon"]) for loc in locations], pool, stats)
+        try:
+            warn_areas = dwd.result()
+        except Exception as e:
+            warn_areas = []
+            print(f"⚠️ DWD warnings fetch failed: {e}")
+    return models, warn_areas
+
+def assess(model, cover: Tuple[bool, int, str], dwd_ok: bool) -> Optional[Tuple[str, int, str]]:
+    """Alert state of one location: ("GO", level, region), ("READY", 0, "") or None."""
+    if not model or model == "missing":
+        return None
+    cape, shear, li = model
+    if not (cape >= CAPE_THRESHOLD and shear >= SHEAR_THRESHOLD and li <= LI_THRESHOLD):
+        return None
+    covered, lvl, region = cover
+    if covered:
+        return ("GO", lvl, region)
+    if not dwd_ok:
+        # If DWD feed is down, still tell you ingredients are there
+        return ("READY", 0, "")
+    return None
+
+def alert_text(loc: Dict[str, Any], model, state: Tuple[str, int, str], mark: str = "⚡") -> str:
+    cape, shear, li = model
+    what = (f"GO (DWD Gewitter Warnstufe {state[1]} / {state[2]})" if state[0] == "GO"
+            else "Ingredients READY (DWD feed unavailable)")
+    return f"{mark} {loc['name']}: CAPE {cape:.0f}, Shear {shear:.1f} m/s, LI {li:.1f} — {what}"
+
+# ---------------- WATCH ----------------
+def _area_key(a: Dict[str, Any]):
+    return (a["level"], a["regionName"], tuple(a["poly"]))
+
+class Watcher:
+    """Long-running --watch state: warning areas, model results, coverage and the last
+    alert state per location stay in memory between cycles.
+
+    A cycle polls what is due: the DWD feed conditionally (a 304 costs no body and no
+    work), the model only when a new GFS run should be out (or for locations whose
+    last request failed). Only locations inside the buffered box of an added or
+    removed warning area get a new coverage lookup, and only those plus locations
+    with new model numbers are re-assessed. Alerts go out on a state change only:
+    new, upgraded (higher Warnstufe) or expired.
+    """
+
+    def __init__(self, locations: List[Dict[str, Any]], notify: bool = False):
+        self.locations = locations
+        self.coords = [(loc["lat"], loc["lon"]) for loc in locations]
+        n = len(locations)
+        self.notify = notify and shutil.which(NOTIFY_CMD) is not None
+        if notify and not self.notify:
+            print(f"⚠️ {NOTIFY_CMD} not found (pkg install termux-api) — alerts are printed only")
+        self.etag = self.modified = None
+        self.dwd_ok = False              # had at least one good DWD feed
+        self.areas = {}                  # _area_key -> area, in feed order
+        self.index = WarnIndex([])
+        self.model_key = None            # (GFS run, UTC day) of the model results
+        self.pending = set(range(n))     # locations still without model numbers for model_key
+        self.models = [None] * n
+        self.covers = [(False, 0, "")] * n
+        self.states = [None] * n
+        self.cycles = 0
+        self.recomputed = 0              # locations re-assessed in the last cycle
+
+    def poll_dwd(self) -> Tuple[str, set]:
+        """(status, locations whose coverage may have changed)."""
+        try:
+            areas, self.etag, self.modified = fetch_dwd_if_changed(self.etag, self.modified)
+        except (requests.RequestException, ValueError) as e:
+            # keep the last good areas: a flaky feed shouldn't expire every alert
+            print(f"⚠️ DWD warnings fetch failed: {e}")
+            return "failed", set()
+        if areas is None:
+            return "304", set()
+        new = {_area_key(a): a for a in areas}
+        changed = [a for k, a in self.areas.items() if k not in new] + \
+                  [a for k, a in new.items() if k not in self.areas]
+        first = not self.dwd_ok
+        self.dwd_ok = True
+        self.areas = new
+        if not changed and not first:
+            return "unchanged", set()
+        self.index = WarnIndex(list(new.values()))
+        if first:
+            return f"{len(new)} areas", set(range(len(self.coords)))
+        touched = WarnIndex(changed)
+        return (f"{len(changed)} areas changed",
+                {k for k, (lat, lon) in enumerate(self.coords) if touched.near(lat, lon)})
+
+    def poll_model(self, pool: ThreadPoolExecutor, stats: Dict[str, int]) -> Tuple[str, set]:
+        """(status, locations whose model numbers changed)."""
+        now = datetime.now(timezone.utc)
+        key = (model_run(now), now.strftime("%Y%m%d"))
+        if key != self.model_key:
+            self.model_key = key
+            self.pending = set(range(len(self.coords)))
+        if not self.pending:
+            return f"run {key[0]}", set()
+        todo = sorted(self.pending)
+        changed = set()
+        for k, m in zip(todo, get_model_data_batch([self.coords[k] for k in todo], pool, stats)):
+            if m is None:
+                continue  # request failed: keep the old numbers, retry next poll
+            self.pending.discard(k)
+            if m != self.models[k]:
+                self.models[k] = m
+                changed.add(k)
+        return f"run {key[0]} ({stats.get('requests', 0)} requests)", changed
+
+    def cycle(self, dwd_due: bool = True, model_due: bool = True) -> List[str]:
+        """Poll what is due, re-assess affected locations; returns the alerts sent."""
+        t0 = time.perf_counter()
+        stats = {}
+        dwd_status = model_status = "-"
+        near, remodelled = set(), set()
+        with ThreadPoolExecutor(max_workers=MODEL_WORKERS + 1) as pool:
+            dwd = pool.submit(self.poll_dwd) if dwd_due else None
+            if model_due:
+                model_status, remodelled = self.poll_model(pool, stats)
+            if dwd is not None:
+                dwd_status, near = dwd.result()
+        t1 = time.perf_counter()
+        if near:
+            ks = sorted(near)
+            for k, cover in zip(ks, self.index.lookup_many([self.coords[k] for k in ks])):
+                self.covers[k] = cover
+        alerts = []
+        for k in sorted(near | remodelled):
+            msg = self._update(k)
+            if msg:
+                alerts.append(msg)
+                self._send(msg)
+        self.cycles += 1
+        self.recomputed = len(near | remodelled)
+        print(f"⏱ {datetime.now():%H:%M:%S} cycle {self.cycles}: DWD {dwd_status}, model {model_status} — "
+              f"{self.recomputed}/{len(self.coords)} locations recomputed, {len(alerts)} alerts "
+              f"(fetch {t1 - t0:.2f}s, compute {(time.perf_counter() - t1) * 1000:.0f} ms)")
+        return alerts
+
+    def _update(self, k: int) -> Optional[str]:
+        loc, model = self.locations[k], self.models[k]
+        old, new = self.states[k], assess(model, self.covers[k], self.dwd_ok)
+        self.states[k] = new
+        if new == old:
+            return None
+        if new is None:
+            was = f"Warnstufe {old[1]} / {old[2]}" if old[0] == "GO" else "ingredients READY"
+            return f"✅ {loc['name']}: expired (was {was})"
+        if old is None or old[0] != new[0]:
+            return alert_text(loc, model, new)
+        if new[1] > old[1]:
+            return alert_text(loc, model, new, mark="⬆️")
+        return None  # same or lower level (or another region at it): no ping
+
+    def _send(self, msg: str):
+        print(msg)
+        if self.notify:
+            try:
+                subprocess.run([NOTIFY_CMD, "--title", "StormWatch", "--content", msg], timeout=30, check=False)
+            except (OSError, subprocess.SubprocessError) as e:
+                print(f"⚠️ {NOTIFY_CMD} failed: {e}")
+
+    def run(self, dwd_every: float = DWD_POLL_SECONDS, model_every: float = MODEL_POLL_SECONDS):
+        print(f"👀 Watching {len(self.coords)} locations: DWD every {dwd_every:g}s, "
+              f"model every {model_every:g}s (Ctrl-C to stop)")
+        next_dwd = next_model = time.monotonic()
+        try:
+            while True:
+                now = time.monotonic()
+                dwd_due, model_due = now >= next_dwd, now >= next_model
+                self.cycle(dwd_due, model_due)
+                if dwd_due:
+                    next_dwd = now + dwd_every
+                if model_due:
+                    next_model = now + model_every
+                time.sleep(max(0.0, min(next_dwd, next_model) - time.monotonic()))
+        except KeyboardInterrupt:
+            print("Stopped.")
+
+def _args():
+    ap = argparse.ArgumentParser(description="CAPE/shear/LI + DWD thunderstorm warnings for LOCATIONS")
+    ap.add_argument("--watch", action="store_true", help="keep running, alert only when a location's state changes")
+    ap.add_argument("--dwd-every", type=float, default=DWD_POLL_SECONDS, metavar="S",
+                    help=f"--watch: DWD poll interval (default {DWD_POLL_SECONDS}s)")
+    ap.add_argument("--model-every", type=float, default=MODEL_POLL_SECONDS, metavar="S",
+                    help=f"--watch: model check interval (default {MODEL_POLL_SECONDS}s)")
+    ap.add_argument("--notify", action="store_true", help=f"--watch: also send alerts via {NOTIFY_CMD}")
+    return ap.parse_args()
+
 def main():
-    try:
-        warn_areas = fetch_dwd_warning_polygons()
-    except Exception as e:
-        warn_areas = []
-        print(f"⚠️ DWD warnings fetch failed: {e}")
+    args = _args()
+    if args.watch:
+        Watcher(LOCATIONS, notify=args.notify).run(args.dwd_every, args.model_every)
+        return
+    t0 = time.perf_counter()
+    stats = {}
+    models, warn_areas = fetch_all(LOCATIONS, stats)
+    print(f"⏱ Data for {len(LOCATIONS)} locations in {time.perf_counter() - t0:.1f}s "
+          f"({stats.get('requests', 0)} model requests, {stats.get('cached', 0)} cached, GFS run {model_run()})")
+
+    covers = WarnIndex(warn_areas).lookup_many([(loc["lat"], loc["lon"]) for loc in LOCATIONS])
 
     alerts = []
-    for loc in LOCATIONS:
-        model = get_model_data(loc["lat"], loc["lon"])
+    for loc, model, cover in zip(LOCATIONS, models, covers):
         if model == "missing":
             print(f"⚠️ Skipping {loc['name']} — missing model fields")
             continue
         if not model:
             print(f"⚠️ Error retrieving model data for {loc['name']}")
             continue
-
-        cape, shear, li = model
-        meets = (cape >= CAPE_THRESHOLD and shear >= SHEAR_THRESHOLD and li <= LI_THRESHOLD)
-
-        covered, lvl, region = (False, 0, "")
-        if warn_areas:
-            covered, lvl, region = location_in_warn_area(loc["lat"], loc["lon"], warn_areas)
-
-        if meets and covered:
-            alerts.append(
-                f"⚡ {loc['name']}: CAPE {cape:.0f}, Shear {shear:.1f} m/s, LI {li:.1f} — "
-                f"GO (DWD Gewitter Warnstufe {lvl} / {region})"
-            )
-        elif meets and not warn_areas:
-            # If DWD feed is down, still tell you ingredients are there
-            alerts.append(
-                f"⚡ {loc['name']}: CAPE {cape:.0f}, Shear {shear:.1f} m/s, LI {li:.1f} — "
-                f"Ingredients READY (DWD feed unavailable)"
-            )
-        else:
-            # stay quiet unless you want verbose
-            pass
+        state = assess(model, cover, dwd_ok=bool(warn_areas))
+        if state:
+            alerts.append(alert_text(loc, model, state))
 
     if alerts:
         print("\n".join(alerts))
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# stormwatch_bench.py — stormwatch.py against a local stand-in for Open-Meteo + DWD
+# Usage: python stormwatch_bench.py fetch [--locations 50] [--latency 0.5]
+#        python stormwatch_bench.py poly [--points 100,1000,5000] [--polygons 300] [--vertices 60]
+#        python stormwatch_bench.py watch [--locations 2000] [--polygons 40] [--latency 0.2]
+#   fetch: one request per location (old behaviour) vs batched + parallel, then a cached rerun
+#   poly:  warning-area lookups, brute force vs WarnIndex (grid) vs WarnIndex + NumPy
+#   watch: --watch cycles (nothing new, warning added / upgraded / expired, new GFS run)
+#          vs a one-shot run each time; alert states must match a full recompute
+
+import os
+import io
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import contextlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import stormwatch as sw  # noqa: E402
+
+# ---------------- STAND-IN SERVER ----------------
+def fake_hourly(lat: float, lon: float) -> dict:
+    rnd = random.Random(f"{lat:.4f},{lon:.4f}")
+    return {
+        "time": [f"2025-08-12T{h:02d}:00" for h in range(24)],
+        "cape": [round(rnd.uniform(0, 2500)) for _ in range(24)],
+        "lifted_index": [round(rnd.uniform(-7, 4), 1) for _ in range(24)],
+        "wind_speed_6000m": [round(rnd.uniform(5, 45), 1) for _ in range(24)],
+        "wind_speed_1000m": [round(rnd.uniform(0, 20), 1) for _ in range(24)],
+    }
+
+def fake_warnings(areas: list) -> bytes:
+    """WarnWetter-style JSONP with one state holding the given areas."""
+    warnings = [{"event": "STARKES GEWITTER", "level": a["level"], "regionName": a["regionName"],
+                 "polygon": " ".join(f"{lat} {lon}" for lat, lon in a["poly"])} for a in areas]
+    return ("warnWetter.loadWarnings(" + json.dumps({"HE": {"warnings": warnings}}) + ");").encode()
+
+class StandIn:
+    """Open-Meteo /v1/gfs (comma-separated coordinates) and a DWD warnings feed (with an
+    ETag; 304 on If-None-Match) on 127.0.0.1, each response delayed by `latency`
+    seconds; counts requests and DWD body bytes."""
+
+    def __init__(self, latency: float = 0.5, areas: list = None):
+        self.latency = latency
+        self.areas = areas or []
+        self.requests = {"model": 0, "dwd": 0, "dwd_304": 0, "dwd_bytes": 0}
+        self.lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                u = urlparse(self.path)
+                time.sleep(stand_in.latency)
+                if u.path == "/v1/gfs":
+                    q = parse_qs(u.query)
+                    lats = [float(x) for x in q["latitude"][0].split(",")]
+                    lons = [float(x) for x in q["longitude"][0].split(",")]
+                    out = [{"latitude": a, "longitude": b, "hourly": fake_hourly(a, b)} for a, b in zip(lats, lons)]
+                    body = json.dumps(out[0] if len(out) == 1 else out).encode()
+                    kind = "model"
+                elif u.path == "/warnings.json":
+                    body, kind = fake_warnings(stand_in.areas), "dwd"
+                    etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+                    if self.headers.get("If-None-Match") == etag:
+                        with stand_in.lock:
+                            stand_in.requests["dwd_304"] += 1
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.end_headers()
+                        return
+                    with stand_in.lock:
+                        stand_in.requests["dwd_bytes"] += len(body)
+                else:
+                    self.send_error(404)
+                    return
+                with stand_in.lock:
+                    stand_in.requests[kind] += 1
+                self.send_response(200)
+                if kind == "dwd":
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def use(self):
+        """Point stormwatch at this server."""
+        sw.MODEL_URL = self.base + "/v1/gfs"
+        sw.DWD_WARN_URL = self.base + "/warnings.json"
+
+def synthetic_locations(n: int, seed: int = 0) -> list:
+    rnd = random.Random(seed)
+    return [{"name": f"P{i}", "lat": round(rnd.uniform(47.5, 54.5), 4), "lon": round(rnd.uniform(6.0, 14.5), 4)}
+            for i in range(n)]
+
+# ---------------- FETCH ----------------
+def bench_fetch(args) -> bool:
+    srv = StandIn(latency=args.latency)
+    srv.use()
+    locs = synthetic_locations(args.locations)
+    sw.CACHE_DIR = None
+    t0 = time.perf_counter()
+    old = [sw.get_model_data(loc["lat"], loc["lon"]) for loc in locs]
+    sw.fetch_dwd_warning_polygons()
+    t_old = time.perf_counter() - t0
+
+    sw.CACHE_DIR = tempfile.mkdtemp(prefix="stormwatch-bench-")
+    runs = {}
+    for name in ("batched", "cached"):
+        before = dict(srv.requests)
+        stats = {}
+        t0 = time.perf_counter()
+        models, _ = sw.fetch_all(locs, stats)
+        runs[name] = {"s": time.perf_counter() - t0, "models": models,
+                      "model_requests": srv.requests["model"] - before["model"]}
+    print(f"{'sequential':<12} {t_old:6.2f}s  {len(locs)} model requests + DWD after them")
+    for name, r in runs.items():
+        print(f"{name:<12} {r['s']:6.2f}s  {r['model_requests']} model requests, DWD alongside")
+    checks = {
+        "same_results": runs["batched"]["models"] == old and runs["cached"]["models"] == old,
+        # a handful of requests in parallel with DWD: about one round trip (+ slack for the host)
+        "batched_about_one_request": runs["batched"]["s"] < 2.5 * args.latency + 0.5,
+        "cached_no_model_requests": runs["cached"]["model_requests"] == 0,
+    }
+    for k, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {k}")
+    return all(checks.values())
+
+# ---------------- POLY ----------------
+def synthetic_areas(n: int, vertices: int, seed: int = 0) -> list:
+    """County-sized star-shaped polygons over Germany, levels 2-4, some overlapping."""
+    rnd = random.Random(seed)
+    areas = []
+    for i in range(n):
+        clat, clon = rnd.uniform(47.5, 54.5), rnd.uniform(6.0, 14.5)
+        r = rnd.uniform(0.08, 0.35)
+        poly = []
+        for k in range(vertices):
+            ang = 2 * math.pi * k / vertices
+            rr = r * rnd.uniform(0.6, 1.0)
+            poly.append((round(clat + rr * math.sin(ang), 4), round(clon + rr * 1.6 * math.cos(ang), 4)))
+        areas.append({"level": rnd.choice((2, 2, 3, 3, 4)), "regionName": f"Kreis {i}", "poly": poly})
+    return areas
+
+def _timed(fn, *a):
+    t0 = time.perf_counter()
+    out = fn(*a)
+    return out, time.perf_counter() - t0
+
+def bench_poly(args) -> bool:
+    ok = True
+    np_mod = sw.np
+    areas = synthetic_areas(args.polygons, args.vertices)
+    index, t_build = _timed(sw.WarnIndex, areas)
+    print(f"{args.polygons} polygons x {args.vertices} vertices, index built in {t_build * 1000:.1f} ms"
+          f" (NumPy {'yes' if np_mod is not None else 'not installed'})")
+    print(f"{'points':>7} {'brute/pt':>10} {'grid':>9} {'numpy':>9} {'brute est':>10}  same")
+    for n in (int(x) for x in args.points.split(",")):
+        coords = [(loc["lat"], loc["lon"]) for loc in synthetic_locations(n, seed=n)]
+        sample = coords[:args.brute_max]
+        brute, t_brute = _timed(lambda c: [sw.location_in_warn_area(lat, lon, areas) for lat, lon in c], sample)
+        sw.np = None
+        grid, t_grid = _timed(index.lookup_many, coords)
+        sw.np = np_mod
+        vec, t_vec = _timed(index.lookup_many, coords) if np_mod is not None else (grid, None)
+        same = grid[:len(sample)] == brute and vec == grid
+        ok &= same
+        per = t_brute / max(1, len(sample))
+        vec_s = f"{t_vec * 1000:7.1f}ms" if t_vec is not None else f"{'n/a':>9}"
+        print(f"{n:>7} {per * 1000:8.2f}ms {t_grid * 1000:7.1f}ms {vec_s} {per * n:9.2f}s  {'✅' if same else '❌'}")
+    return ok
+
+# ---------------- WATCH ----------------
+def _oneshot(locs: list) -> tuple:
+    """What a cron'd one-shot run does: fetch everything, recompute every location."""
+    models, areas = sw.fetch_all(locs)
+    covers = sw.WarnIndex(areas).lookup_many([(loc["lat"], loc["lon"]) for loc in locs])
+    return [sw.assess(m, c, bool(areas)) for m, c in zip(models, covers)]
+
+def bench_watch(args) -> bool:
+    srv = StandIn(latency=args.latency)
+    srv.use()
+    sw.CACHE_DIR = tempfile.mkdtemp(prefix="stormwatch-bench-")
+    sw.CAPE_THRESHOLD, sw.SHEAR_THRESHOLD, sw.LI_THRESHOLD = 0, 0, 10  # warnings decide every state
+    locs = synthetic_locations(args.locations)
+    srv.areas = synthetic_areas(args.polygons, 30)
+    storm = {"level": 2, "regionName": "Neue Zelle", "poly": []}
+
+    def new_cell():
+        # a small cell over a location no warning covers yet
+        k = watcher.states.index(None)
+        lat, lon = locs[k]["lat"], locs[k]["lon"]
+        storm["poly"] = [(lat - 0.05, lon - 0.08), (lat - 0.05, lon + 0.08), (lat + 0.05, lon + 0.08), (lat + 0.05, lon - 0.08)]
+        srv.areas.append(storm)
+
+    real_run = sw.model_run
+    steps = [
+        ("cold", None),
+        ("no change", None),
+        ("new cell", new_cell),
+        ("upgraded", lambda: storm.update(level=4)),
+        ("expired", lambda: srv.areas.remove(storm)),
+        ("new GFS run", lambda: setattr(sw, "model_run", lambda now=None: "2099010100")),
+    ]
+    watcher = sw.Watcher(locs)
+    ok = True
+    print(f"{len(locs)} locations, {len(srv.areas)} warning areas, {args.latency:.2f}s latency")
+    print(f"{'step':<12} {'watch':>8} {'recomp':>7} {'alerts':>6} {'DWD bytes':>10} {'model req':>9} "
+          f"{'one-shot':>9} {'DWD bytes':>10}  same")
+    try:
+        for name, change in steps:
+            if change:
+                change()
+            before = dict(srv.requests)
+            with contextlib.redirect_stdout(io.StringIO()):
+                t0 = time.perf_counter()
+                alerts = watcher.cycle()
+                t_watch = time.perf_counter() - t0
+            recomputed = watcher.recomputed
+            mid = dict(srv.requests)
+            sw.CACHE_DIR, cache = None, sw.CACHE_DIR  # one-shot as if cron'd on a cold cache
+            with contextlib.redirect_stdout(io.StringIO()):
+                t0 = time.perf_counter()
+                expected = _oneshot(locs)
+                t_once = time.perf_counter() - t0
+            sw.CACHE_DIR = cache
+            same = watcher.states == expected
+            ok &= same
+            print(f"{name:<12} {t_watch:7.2f}s {recomputed:>7} {len(alerts):>6} "
+                  f"{mid['dwd_bytes'] - before['dwd_bytes']:>10} {mid['model'] - before['model']:>9} "
+                  f"{t_once:8.2f}s {srv.requests['dwd_bytes'] - mid['dwd_bytes']:>10}  {'✅' if same else '❌'}")
+            if name == "no change":
+                ok &= recomputed == 0 and not alerts and mid["dwd_304"] > before["dwd_304"] \
+                    and mid["model"] == before["model"]
+            elif name in ("new cell", "upgraded", "expired"):
+                mark = {"new cell": "⚡", "upgraded": "⬆️", "expired": "✅"}[name]
+                ok &= 0 < recomputed < len(locs) // 10 and bool(alerts) and all(a.startswith(mark) for a in alerts)
+            elif name == "new GFS run":
+                ok &= mid["model"] > before["model"] and not alerts  # same numbers: nothing to say
+    finally:
+        sw.model_run = real_run
+    print(f"{'✅' if ok else '❌'} watch cycles")
+    return ok
+
+def main():
+    ap = argparse.ArgumentParser(description="stormwatch.py benchmarks against a local stand-in server")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    f = sub.add_parser("fetch", help="model + DWD fetch: sequential vs batched vs cached")
+    f.add_argument("--locations", type=int, default=50)
+    f.add_argument("--latency", type=float, default=0.5, help="stand-in response delay (s)")
+    p = sub.add_parser("poly", help="warning-area lookups on synthetic polygons")
+    p.add_argument("--points", default="100,1000,5000", help="comma-separated location counts")
+    p.add_argument("--polygons", type=int, default=300)
+    p.add_argument("--vertices", type=int, default=60)
+    p.add_argument("--brute-max", type=int, default=200, help="brute force only on this many points (extrapolated)")
+    w = sub.add_parser("watch", help="--watch cycles vs one-shot runs as warnings change")
+    w.add_argument("--locations", type=int, default=2000)
+    w.add_argument("--polygons", type=int, default=40)
+    w.add_argument("--latency", type=float, default=0.2, help="stand-in response delay (s)")
+    args = ap.parse_args()
+    ok = {"fetch": bench_fetch, "poly": bench_poly, "watch": bench_watch}[args.cmd](args)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()